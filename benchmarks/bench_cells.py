@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Benchmark for creating table cells of an image folder. Measures the
+latency of FileDataSource.tableview_cell_for_row with synchronous
+thumbnails (with an empty and a filled thumbnail cache) and with the
+background thumbnail pipeline.
+"""
+
+from __future__ import division, print_function
+
+import os        # For path operations
+import PIL.Image # To generate images
+import sys       # For runtime arguments
+import time      # For timing
+
+import benchutil
+benchutil.use_stubs()
+
+from filenav import common
+from filenav import thumbnails
+
+def make_images(root, count, size=(1024, 768)):
+    u"""Write count PNG and JPEG images of the given size into root.
+    """
+    img = PIL.Image.new("RGB", size, (200, 100, 50))
+    for i in range(count):
+        ext = u"png" if i % 2 else u"jpg"
+        img.save(os.path.join(root, u"image{:05d}.{}".format(i, ext)))
+
+def cell_latency(root, pipeline):
+    u"""Return the average time in seconds to create a cell for every
+    row of a fresh file list of root.
+    """
+    ds = common.FileDataSource(None, common.FileItem(root, lazy=True), None)
+    ds.thumbnails = pipeline
+    rows = len(ds.files)
+    start = time.time()
+    for row in range(rows):
+        ds.tableview_cell_for_row(None, 1, row)
+    return (time.time() - start) / rows
+
+def main(args):
+    count = int(args[0]) if args else 100
+    with benchutil.TempTree() as root:
+        os.mkdir(os.path.join(root, u"images"))
+        make_images(os.path.join(root, u"images"), count)
+        images = common.full_path(os.path.join(root, u"images"))
+        
+        # Use a temporary thumbnail cache, so the real one isn't touched
+        old_cache = common.thumbnail_cache
+        common.thumbnail_cache = thumbnails.ThumbnailCache(os.path.join(root, u"thumbnails"))
+        try:
+            benchutil.report(u"cell_for_row, synchronous", cell_latency(images, None) * 1000, u"ms/row")
+            benchutil.report(u"cell_for_row, synchronous, cached", cell_latency(images, None) * 1000, u"ms/row")
+            common.thumbnail_cache.clear()
+            pipeline = thumbnails.ThumbnailPipeline(common.get_cached_thumbnail_data)
+            benchutil.report(u"cell_for_row, pipeline", cell_latency(images, pipeline) * 1000, u"ms/row")
+            pipeline.cancel_all()
+        finally:
+            common.thumbnail_cache = old_cache
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Benchmark for file type classification. Measures the throughput of
+core.get_fileinfo in files per second, compared to the original
+implementation that built a complete FileInfo for every path. That
+both return the same results is checked in tests/test_filetypes.py.
+"""
+
+from __future__ import division, print_function
+
+import collections # For the original FileInfo
+import os          # For path operations
+import sys         # For runtime arguments
+
+import benchutil
+
+from filenav import core
+from filenav import filetypes
+
+LegacyFileInfo = collections.namedtuple(
+    "LegacyFileInfo",
+    "dir name nameparts ext group desc icon"
+)
+
+def legacy_get_fileinfo(path, isdir):
+    # The original get_fileinfo, minus the os.path.isdir call.
+    dir, name = os.path.split(path)
+    nameparts = name.lower().split(os.extsep)
+    ext = None
+    group = basegroup = "folder" if isdir else "file"
+    desc, icon = filetypes.GROUP_ICONS[group]
+    
+    for part in nameparts:
+        if part in filetypes.TYPE_GROUPS:
+            ext = part
+    
+    if ext:
+        group = filetypes.TYPE_GROUPS.get(ext, group)
+        desc = filetypes.FILE_EXTS.get(ext, filetypes.GROUP_ICONS[group][0])
+        icon = filetypes.GROUP_ICONS[group][1]
+        if desc is None:
+            desc = filetypes.GROUP_ICONS[basegroup][0]
+    
+    if basegroup == "folder" and ext not in filetypes.FOLDERS_WITH_ICONS:
+        desc, icon = filetypes.GROUP_ICONS[basegroup]
+    
+    return LegacyFileInfo(dir, name, nameparts, ext, group, desc, icon)
+
+def make_paths(count):
+    u"""Return a list of (path, isdir) pairs with a mix of known and
+    unknown extensions, multi-part names and folders.
+    """
+    exts = benchutil.MIXED_EXTS + [u"unknown", u"tar.unknown", u"py.bak", u"app", u"git"]
+    return [
+        (u"/synthetic/name.part{}.{}".format(i, exts[i % len(exts)]), i % 7 == 0)
+        for i in range(count)
+    ]
+
+def main(args):
+    count = int(args[0]) if args else 100000
+    paths = make_paths(count)
+    
+    for label, func in (
+        (u"legacy get_fileinfo", legacy_get_fileinfo),
+        (u"get_fileinfo", core.get_fileinfo),
+        (u"filetypes.classify (type only)", filetypes.classify),
+    ):
+        elapsed, ret = benchutil.timeit(lambda: [func(path, isdir) for path, isdir in paths])
+        benchutil.report(u"{}: throughput".format(label), count / elapsed, u"files/s")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
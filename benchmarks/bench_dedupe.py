@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Benchmark for comparing and deduplicating FileItems. Lists a folder of
+files twice and removes the duplicates with a set, counting the stat
+calls made while doing so, and compares that to os.path.samefile.
+"""
+
+from __future__ import division, print_function
+
+import os   # For stat, which is counted
+import sys  # For runtime arguments
+import time # For timing
+
+import benchutil
+benchutil.use_stubs()
+
+from filenav import common
+
+class CountStats(object):
+    u"""Context manager that counts the calls of os.stat.
+    """
+    def __enter__(self):
+        self.calls = 0
+        self._stat = os.stat
+        def _counting(*args, **kwargs):
+            self.calls += 1
+            return self._stat(*args, **kwargs)
+        os.stat = _counting
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        os.stat = self._stat
+
+def main(args):
+    count = int(args[0]) if args else 50000
+    with benchutil.TempTree(count) as root:
+        root = common.full_path(root)
+        items = common.scan_dir(root) + common.scan_dir(root)
+        for fi in items:
+            fi.stat
+        
+        with CountStats() as stats:
+            start = time.time()
+            unique = set(items)
+            elapsed = time.time() - start
+        assert len(unique) == count
+        benchutil.report(u"dedupe {} FileItems".format(len(items)), elapsed * 1000, u"ms")
+        benchutil.report(u"stat calls while deduplicating", stats.calls, u"calls")
+        
+        start = time.time()
+        for fi in items[:1000]:
+            os.path.samefile(fi.path, items[0].path)
+        elapsed = time.time() - start
+        benchutil.report(u"os.path.samefile, per comparison", elapsed * 1000000 / 1000, u"us")
+        start = time.time()
+        for fi in items[:1000]:
+            fi == items[0]
+        elapsed = time.time() - start
+        benchutil.report(u"FileItem ==, per comparison", elapsed * 1000000 / 1000, u"us")
+        
+        start = time.time()
+        changed = sum(not fi.revalidate() for fi in items[:count])
+        benchutil.report(u"revalidate {} FileItems".format(count), (time.time() - start) * 1000, u"ms")
+        benchutil.report(u"changed", changed, u"files")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
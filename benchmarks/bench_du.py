@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Benchmark for the folder size calculation. Generates a nested tree and
+calculates its size with an empty cache (cold), with a filled cache
+(warm), and after adding a file to a single folder.
+"""
+
+from __future__ import division, print_function
+
+import os   # For path operations
+import sys  # For runtime arguments
+import time # For timing
+
+import benchutil
+benchutil.use_stubs()
+
+from bench_search import make_nested_tree
+from filenav import du
+
+def run(root, cache, workers=4):
+    u"""Calculate the size of root and return the elapsed time and the
+    DirSize.
+    """
+    dirsize = du.DirSize(root, cache, workers=workers)
+    start = time.time()
+    dirsize.start()
+    dirsize.wait()
+    return time.time() - start, dirsize
+
+def main(args):
+    files = int(args[0]) if args else 200000
+    with benchutil.TempTree() as root:
+        start = time.time()
+        folders = make_nested_tree(root, files)
+        benchutil.report(u"generate {} files, {} folders".format(files, folders), time.time() - start, u"s")
+        
+        for workers in (1, 4):
+            elapsed = min(run(root, du.SizeCache(), workers)[0] for i in range(3))
+            benchutil.report(u"cold, {} workers".format(workers), elapsed, u"s")
+        
+        cache = du.SizeCache()
+        _, dirsize = run(root, cache)
+        assert dirsize.result.files == files, dirsize.result
+        elapsed, dirsize = min((run(root, cache) for i in range(3)), key=lambda r: r[0])
+        benchutil.report(u"warm", elapsed, u"s")
+        benchutil.report(u"folders scanned when warm", dirsize.scanned, u"folders")
+        
+        with open(os.path.join(root, u"folder3", u"new.txt"), "wb") as f:
+            f.write(b"x" * 1000)
+        elapsed, dirsize = run(root, cache)
+        benchutil.report(u"after adding a file", elapsed, u"s")
+        benchutil.report(u"folders scanned after adding a file", dirsize.scanned, u"folders")
+        assert dirsize.result.size == 1000 and dirsize.result.files == files + 1, dirsize.result
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Benchmark for filtering a large file list as a query is typed. Types a
+query one character at a time (and then deletes it again) into the
+filter of a compact listing, and reports the time from each keystroke
+until the shown lists are updated. Uses a synthetic listing that never
+touches the filesystem. Building the name index, which happens when
+the filter is shown, is reported separately.
+"""
+
+from __future__ import division, print_function
+
+import sys  # For runtime arguments
+import time # For timing
+
+import benchutil
+benchutil.use_stubs()
+
+from filenav import common
+
+import bench_sort
+
+# Frame budget at 60 Hz, in seconds
+FRAME = 1 / 60
+
+def make_source(count):
+    u"""Return a FileDataSource showing a synthetic compact listing of
+    count entries.
+    """
+    ds = common.FileDataSource.__new__(common.FileDataSource)
+    ds.tableview = None
+    ds.filter_query = u""
+    ds.filter_mode = "substring"
+    ds.listing = bench_sort.make_listing(count)
+    ds._set_lists(*ds.listing.sections())
+    return ds
+
+def type_query(ds, query, mode):
+    u"""Type query into the filter of ds one character at a time, then
+    delete it again. Returns a list of the times for each keystroke.
+    """
+    steps = [query[:i] for i in range(1, len(query) + 1)]
+    steps += steps[-2::-1] + [u""]
+    times = []
+    for step in steps:
+        start = time.time()
+        ds.filter(step, mode)
+        times.append(time.time() - start)
+    return times
+
+def main(args):
+    count = int(args[0]) if args else 100000
+    queries = [
+        (u"report 12 final", "substring"),
+        (u"img_1*.jpg", "glob"),
+        (u"rprt2fnl", "fuzzy"),
+    ]
+    for query, mode in queries:
+        ds = make_source(count)
+        label = u"{} entries, {} {!r}".format(count, mode, query)
+        elapsed, _ = benchutil.timeit(ds.prepare_filter, repeat=1)
+        benchutil.report(label + u", index", elapsed * 1000, u"ms")
+        times = type_query(ds, query, mode)
+        benchutil.report(label + u", mean", sum(times) / len(times) * 1000, u"ms")
+        benchutil.report(label + u", max", max(times) * 1000, u"ms")
+        benchutil.report(label + u", over budget", sum(t > FRAME for t in times), u"keystrokes")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
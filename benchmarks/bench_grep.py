@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Benchmark for the content search. Generates a corpus of source-like
+text files (plus some binary files that should be skipped quickly) and
+reports the throughput of searching it in MB/s, for different patterns
+and numbers of worker threads.
+"""
+
+from __future__ import division, print_function
+
+import os     # For path operations
+import random # To generate the corpus
+import sys    # For runtime arguments
+import time   # For timing
+
+import benchutil
+benchutil.use_stubs()
+
+from filenav import grep
+
+# Words that the generated lines are made of
+WORDS = (
+    u"def class return import self if else for while in not and or None True False"
+    u" value result index path name data item list dict count total"
+).split()
+
+def make_corpus(root, megabytes, file_size=256*1024, binary_every=10, seed=0):
+    u"""Fill root with about megabytes MiB of text files of file_size
+    bytes each, in a few subfolders. Every binary_every-th file is a
+    binary file with a .txt extension instead. Returns the number of
+    files written.
+    """
+    rnd = random.Random(seed)
+    lines = [
+        u"    " * rnd.randint(0, 3) + u" ".join(rnd.choice(WORDS) for i in range(rnd.randint(3, 12)))
+        for i in range(2000)
+    ]
+    text = u"\n".join(lines).encode("utf-8")
+    text = (text * (file_size // len(text) + 1))[:file_size]
+    binary = bytes(bytearray(rnd.randint(0, 255) for i in range(file_size)))
+    
+    count = megabytes * 1024 * 1024 // file_size
+    for i in range(count):
+        folder = os.path.join(root, u"pkg{}".format(i % 8))
+        if not os.path.isdir(folder):
+            os.mkdir(folder)
+        ext = (u"py", u"txt", u"md", u"json")[i % 4]
+        with open(os.path.join(folder, u"file{:05d}.{}".format(i, ext)), "wb") as f:
+            f.write(binary if i % binary_every == 0 else text)
+    return count
+
+def run(root, pattern, workers):
+    u"""Search root for pattern and return the elapsed time and the
+    ContentSearch.
+    """
+    found = []
+    srch = grep.ContentSearch(root, pattern, found.extend, workers=workers, max_matches=None)
+    start = time.time()
+    srch.start()
+    srch.wait()
+    return time.time() - start, srch
+
+def main(args):
+    megabytes = int(args[0]) if args else 64
+    with benchutil.TempTree() as root:
+        files = make_corpus(root, megabytes)
+        benchutil.report(u"corpus", files, u"files")
+        
+        patterns = [
+            (u"rare literal", grep.compile_pattern(u"no such text here")),
+            (u"common literal", grep.compile_pattern(u"return value")),
+            (u"regex", grep.compile_pattern(u"def \\w+ index", regex=True)),
+        ]
+        for name, pattern in patterns:
+            for workers in (1, 4):
+                elapsed, srch = min(
+                    (run(root, pattern, workers) for i in range(3)),
+                    key=lambda result: result[0],
+                )
+                label = u"{}, {} workers".format(name, workers)
+                benchutil.report(label, srch.bytes / elapsed / 1024 / 1024, u"MB/s")
+        benchutil.report(u"text files searched", srch.files, u"files")
+        benchutil.report(u"binary files skipped", srch.binary, u"files")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Benchmark for the file name index. Measures building the index for a
+generated tree, updating it when nothing or a single folder has
+changed, and the latency of prefix, substring and type queries.
+"""
+
+from __future__ import division, print_function
+
+import os       # For path operations
+import sys      # For runtime arguments
+import tempfile # To place the database
+
+import benchutil
+benchutil.use_stubs()
+
+from filenav import index
+
+import bench_search
+
+def main(args):
+    files = int(args[0]) if args else 100000
+    with benchutil.TempTree() as root:
+        bench_search.make_nested_tree(root, files)
+        fd, dbpath = tempfile.mkstemp(suffix=u".sqlite3")
+        os.close(fd)
+        try:
+            idx = index.FileIndex(dbpath, [root])
+            
+            elapsed, stats = benchutil.timeit(idx.rebuild, repeat=1)
+            benchutil.report(u"rebuild, {} entries".format(idx.count()), elapsed, u"s")
+            elapsed, stats = benchutil.timeit(idx.update)
+            benchutil.report(u"update, nothing changed", elapsed, u"s")
+            
+            def _touch_and_update():
+                open(os.path.join(root, u"folder3", u"new.txt"), "wb").close()
+                stats = idx.update()
+                os.remove(os.path.join(root, u"folder3", u"new.txt"))
+                return stats
+            elapsed, stats = benchutil.timeit(_touch_and_update)
+            benchutil.report(u"update, one folder changed", elapsed, u"s")
+            
+            queries = [
+                (u"prefix", lambda: idx.query(u"file00012")),
+                (u"substring", lambda: idx.query(u"0012", "substring")),
+                (u"group", lambda: idx.query(group=u"image", limit=100)),
+                (u"group and prefix", lambda: idx.query(u"file0001", group=u"image")),
+            ]
+            for name, query in queries:
+                elapsed, results = benchutil.timeit(query, repeat=5)
+                benchutil.report(u"query, {} ({} results)".format(name, len(results)), elapsed * 1000, u"ms")
+            idx.close()
+        finally:
+            os.remove(dbpath)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
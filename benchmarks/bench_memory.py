@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Benchmark for the memory used by directory listings. Measures the bytes
+per entry of a compact FileListing and of fully loaded FileItems, using
+synthetic entries that never touch the filesystem.
+
+Requires Python 3 (for tracemalloc).
+"""
+
+from __future__ import division, print_function
+
+import gc          # To get stable measurements
+import os          # For stat_result
+import stat        # For file modes
+import sys         # For runtime arguments
+import tracemalloc # To measure allocations
+
+import benchutil
+
+from filenav import core
+
+class FakeEntry(object):
+    # Minimal DirEntry replacement that doesn't touch the filesystem.
+    def __init__(self, dir, name, isdir, size):
+        self.name = name
+        self.path = os.path.join(dir, name)
+        self._isdir = isdir
+        self._stat = os.stat_result((
+            (stat.S_IFDIR if isdir else stat.S_IFREG) | 0o644,
+            0, 0, 1, 0, 0, size, 0, 1234567890, 0,
+        ))
+    
+    def is_dir(self):
+        return self._isdir
+    
+    def is_symlink(self):
+        return False
+    
+    def stat(self):
+        return self._stat
+
+def names(count):
+    # Synthetic entry names with mixed extensions.
+    exts = benchutil.MIXED_EXTS
+    for i in range(count):
+        yield u"entry{:07d}.{}".format(i, exts[i % len(exts)]), i % 10 == 0
+
+def make_listing(count):
+    listing = core.FileListing(u"/synthetic")
+    for name, isdir in names(count):
+        listing.append(
+            name,
+            (0 if isdir else core.LISTING_FILE) | core.LISTING_STAT,
+            len(name) * 1000,
+            1234567890.0,
+        )
+    sections = listing.sections()
+    return listing, sections
+
+def make_fileitems(count):
+    items = []
+    for name, isdir in names(count):
+        fi = core.FileItem.from_entry(FakeEntry(u"/synthetic", name, isdir, len(name) * 1000))
+        # Load everything a table row would show
+        fi.stat, fi.constants
+        items.append(fi)
+    return items
+
+def measure(func, count):
+    u"""Return the bytes allocated per entry by func(count) that are
+    still alive afterwards.
+    """
+    gc.collect()
+    tracemalloc.start()
+    ret = func(count)
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del ret
+    return current / count
+
+def main(args):
+    counts = [int(arg) for arg in args] or [100000, 1000000]
+    for count in counts:
+        benchutil.report(u"FileListing, {} entries".format(count), measure(make_listing, count), u"bytes/entry")
+    # Full FileItems are too large to build a million of on a phone
+    count = min(counts)
+    benchutil.report(u"FileItem, {} entries".format(count), measure(make_fileitems, count), u"bytes/entry")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
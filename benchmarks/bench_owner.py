@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Benchmark for resolving the owners and groups of files, as it would be
+done for every row of a list, with and without the shared name caches.
+"""
+
+from __future__ import division, print_function
+
+import grp # For uncached group lookups
+import os  # For stat
+import pwd # For uncached user lookups
+import sys # For runtime arguments
+
+import benchutil
+benchutil.use_stubs()
+
+from filenav import common
+
+def uncached_owner(st):
+    u"""Like common.format_owner, but without caching.
+    """
+    try:
+        user = pwd.getpwuid(st.st_uid).pw_name
+    except KeyError:
+        user = st.st_uid
+    try:
+        group = grp.getgrgid(st.st_gid).gr_name
+    except KeyError:
+        group = st.st_gid
+    return u"{}:{}".format(user, group)
+
+def main(args):
+    count = int(args[0]) if args else 20000
+    with benchutil.TempTree(count) as root:
+        stats = [os.stat(os.path.join(root, name)) for name in os.listdir(root)]
+        # An unknown user and group, for negative caching
+        stats.append(os.stat_result((0, 0, 0, 0, 54321, 54321, 0, 0, 0, 0)))
+        for label, func in ((u"uncached", uncached_owner), (u"cached", common.format_owner)):
+            elapsed, _ = benchutil.timeit(lambda: [func(st) for st in stats])
+            benchutil.report(u"owners of {} files, {}".format(len(stats), label), elapsed * 1000, u"ms")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Benchmark for revisiting a folder through the shared FileItem cache,
+compared to the first visit and to a visit without the cache, for a
+small folder (a FileItem per entry) and a large one (compact listing).
+"""
+
+from __future__ import division, print_function
+
+import os   # For path operations
+import sys  # For runtime arguments
+import time # For timing
+
+import benchutil
+benchutil.use_stubs()
+
+from filenav import common
+
+def visit(root, cached=True):
+    u"""Open a file list for root like make_file_list does, sort it by
+    size and create the cell for its first row. Returns the elapsed
+    time in seconds.
+    """
+    start = time.time()
+    fi = common.item_cache.get(root) if cached else common.FileItem(root, lazy=True)
+    ds = common.FileDataSource(None, fi, None)
+    ds.thumbnails = None
+    ds.sort("size")
+    ds.tableview_cell_for_row(None, 1, 0)
+    return time.time() - start
+
+def main(args):
+    sizes = [int(arg) for arg in args] or [1000, 20000]
+    for size in sizes:
+        with benchutil.TempTree(size) as root:
+            root = common.full_path(root)
+            common.item_cache.clear()
+            benchutil.report(u"{} entries, uncached".format(size), min(visit(root, False) for i in range(3)) * 1000, u"ms")
+            benchutil.report(u"{} entries, first visit".format(size), visit(root) * 1000, u"ms")
+            benchutil.report(u"{} entries, revisit".format(size), min(visit(root) for i in range(3)) * 1000, u"ms")
+            open(os.path.join(root, u"new.txt"), "w").close()
+            benchutil.report(u"{} entries, after a change".format(size), visit(root) * 1000, u"ms")
+    benchutil.report(u"cache hits", common.item_cache.hits, u"lookups")
+    benchutil.report(u"cache misses", common.item_cache.misses, u"lookups")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Benchmark for directory scanning. Counts the filesystem calls made per
+directory entry when building a listing, once by constructing a
+FileItem for every path (the old FileDataSource.reload behavior, using
+a copy of the original FileItem) and once using core.scan_dir (with
+and without accessing the data needed for a table row).
+
+Only calls made through the os module are counted, so the numbers
+approximate the number of syscalls issued from Python.
+"""
+
+from __future__ import division, print_function
+
+import collections # For call counters
+import os          # The calls to count
+import sys         # For runtime arguments
+
+import benchutil
+
+from filenav import core
+from filenav import filetypes
+from filenav import scan
+
+class _CountingEntry(object):
+    # Wraps a DirEntry to count stat calls on it.
+    def __init__(self, entry, counter):
+        self._entry = entry
+        self._counter = counter
+        self.name = entry.name
+        self.path = entry.path
+    
+    def is_dir(self):
+        return self._entry.is_dir()
+    
+    def is_symlink(self):
+        return self._entry.is_symlink()
+    
+    def stat(self):
+        self._counter["DirEntry.stat"] += 1
+        return self._entry.stat()
+
+class CallCounter(object):
+    u"""Context manager that counts calls to the os functions used by
+    filenav while it is active.
+    """
+    FUNCS = ("stat", "lstat", "listdir")
+    
+    def __init__(self):
+        # Init
+        self.counts = collections.Counter()
+        self._saved = {}
+    
+    def _wrap(self, name, func):
+        def _counting(*args, **kwargs):
+            self.counts[name] += 1
+            return func(*args, **kwargs)
+        return _counting
+    
+    def __enter__(self):
+        for name in self.FUNCS:
+            self._saved[name] = getattr(os, name)
+            setattr(os, name, self._wrap(name, self._saved[name]))
+        
+        self._saved_scandir = scan.scandir
+        if scan.scandir is not None:
+            def _scandir(path):
+                self.counts["scandir"] += 1
+                return [_CountingEntry(e, self.counts) for e in self._saved_scandir(path)]
+            scan.scandir = _scandir
+        return self.counts
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        for name, func in self._saved.items():
+            setattr(os, name, func)
+        scan.scandir = self._saved_scandir
+
+def legacy_get_fileinfo(path):
+    # The original get_fileinfo, which checked os.path.isdir itself.
+    dir, name = os.path.split(path)
+    nameparts = name.lower().split(os.extsep)
+    ext = None
+    group = basegroup = "folder" if os.path.isdir(path) else "file"
+    desc, icon = filetypes.GROUP_ICONS[group]
+    
+    for part in nameparts:
+        if part in filetypes.TYPE_GROUPS:
+            ext = part
+    
+    if ext:
+        group = filetypes.TYPE_GROUPS.get(ext, group)
+        desc = filetypes.FILE_EXTS.get(ext, filetypes.GROUP_ICONS[group][0])
+        icon = filetypes.GROUP_ICONS[group][1]
+        if desc is None:
+            desc = filetypes.GROUP_ICONS[basegroup][0]
+    
+    if basegroup == "folder" and ext not in filetypes.FOLDERS_WITH_ICONS:
+        desc, icon = filetypes.GROUP_ICONS[basegroup]
+    
+    return (dir, name, nameparts, ext, group, desc, icon)
+
+class LegacyFileItem(object):
+    # The original FileItem, which resolved its path, stat'ed it, checked
+    # os.path.isdir twice and listed folders as soon as it was created.
+    def __init__(self, path):
+        self.path = os.path.realpath(os.path.expandvars(os.path.expanduser(path)))
+        self.reload()
+    
+    def reload(self):
+        self.constants = legacy_get_fileinfo(self.path)
+        
+        try:
+            self.stat = os.stat(self.path)
+        except OSError as err:
+            self.stat = None
+        
+        if os.path.isdir(self.path):
+            self.basetype = 0
+            try:
+                self.contents = os.listdir(self.path)
+            except OSError as err:
+                self.contents = []
+        else:
+            self.basetype = 1
+            self.contents = None
+
+def scan_per_path(path):
+    # The old approach: one (original) FileItem per listed name.
+    return [LegacyFileItem(os.path.join(path, name)) for name in os.listdir(path)]
+
+def scan_rows(path):
+    # scan_dir plus what a table row needs without its subtitle.
+    items = core.scan_dir(path)
+    for fi in items:
+        fi.basename(), fi.isdir()
+    return items
+
+def main(args):
+    entries = int(args[0]) if args else 20000
+    with benchutil.TempTree(entries * 9 // 10, entries // 10) as root:
+        # Give every folder one child so listing them has a cost
+        for name in os.listdir(root):
+            if name.startswith(u"folder"):
+                os.mkdir(os.path.join(root, name, u"child"))
+        root = core.full_path(root)
+        
+        for label, func in (
+            (u"per-path FileItem", scan_per_path),
+            (u"scan_dir", core.scan_dir),
+            (u"scan_dir + basename/isdir", scan_rows),
+        ):
+            with CallCounter() as counts:
+                items = func(root)
+            total = sum(counts.values())
+            benchutil.report(u"{}: calls per entry".format(label), total / len(items), u"calls")
+            for name, count in sorted(counts.items()):
+                benchutil.report(u"  {}".format(name), count / len(items), u"per entry")
+            elapsed, items = benchutil.timeit(lambda: func(root))
+            benchutil.report(u"{}: time per entry".format(label), elapsed / len(items) * 1e6, u"us")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Benchmark for scrolling through a file list. Requests a cell for every
+row, first scrolling down and then back up, and counts how many cells
+are created, how often sizes are formatted and how many memory blocks
+are still allocated afterwards, per scrolled row. Runs headless using
+the stub modules if Pythonista's aren't available.
+"""
+
+from __future__ import division, print_function
+
+import sys         # For runtime arguments
+import time        # For timing
+import tracemalloc # To count allocations
+
+import benchutil
+benchutil.use_stubs()
+
+import ui
+
+from filenav import common
+
+# Extensions without thumbnails, so only cell handling is measured.
+EXTS = u"py txt md json zip mp3 html csv".split()
+
+class CallCounter(object):
+    u"""Wraps a function and counts how often it is called.
+    """
+    
+    def __init__(self, func):
+        # Init
+        self.func = func
+        self.calls = 0
+    
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self.func(*args, **kwargs)
+
+def scroll(ds, rows):
+    u"""Request a cell for every row of the files section of ds, in
+    order. rows is an iterable of row numbers.
+    """
+    for row in rows:
+        ds.tableview_cell_for_row(None, 1, row)
+
+def measure(ds, label, rows, counter):
+    u"""Scroll ds through rows and report the costs per row. counter
+    is the CallCounter installed as common.format_size.
+    """
+    rows = list(rows)
+    counter.calls = 0
+    cells = ui.TableViewCell.created
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    start = time.time()
+    scroll(ds, rows)
+    elapsed = time.time() - start
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    benchutil.report(label + u", cells", (ui.TableViewCell.created - cells) / len(rows), u"per row")
+    benchutil.report(label + u", format_size", counter.calls / len(rows), u"per row")
+    benchutil.report(label + u", blocks kept", blocks / len(rows), u"per row")
+    benchutil.report(label + u", time", elapsed / len(rows) * 1000000, u"us/row")
+
+def main(args):
+    size = int(args[0]) if args else 10000
+    counter = common.format_size = CallCounter(common.format_size)
+    with benchutil.TempTree(size, exts=EXTS) as root:
+        root = common.full_path(root)
+        for compact in (False, True):
+            ds = common.FileDataSource(None, common.FileItem(root, lazy=True), None, compact=compact)
+            ds.thumbnails = None
+            name = u"compact" if compact else u"FileItems"
+            measure(ds, u"{}, down".format(name), range(len(ds.files)), counter)
+            measure(ds, u"{}, up".format(name), reversed(range(len(ds.files))), counter)
+    common.format_size = counter.func
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
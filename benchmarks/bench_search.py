@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Benchmark for the recursive file search. Generates a nested tree of
+empty files and searches it with different numbers of worker threads.
+The first search after generating the tree may be faster than usual,
+as the tree is still in the filesystem cache.
+"""
+
+from __future__ import division, print_function
+
+import os   # For path operations
+import sys  # For runtime arguments
+import time # For timing
+
+import benchutil
+benchutil.use_stubs()
+
+from filenav import search
+
+def make_nested_tree(root, files, per_dir=500, fanout=8):
+    u"""Fill root with a tree of about files empty files, per_dir in
+    every folder, where every folder has up to fanout subfolders.
+    Returns the number of folders created.
+    """
+    queue = [root]
+    made = 0
+    folders = 0
+    while made < files:
+        folder = queue.pop(0)
+        for i in range(min(per_dir, files - made)):
+            name = u"file{:07d}.{}".format(made, benchutil.MIXED_EXTS[made % len(benchutil.MIXED_EXTS)])
+            open(os.path.join(folder, name), "wb").close()
+            made += 1
+        for i in range(fanout):
+            sub = os.path.join(folder, u"folder{}".format(i))
+            os.mkdir(sub)
+            queue.append(sub)
+            folders += 1
+    return folders
+
+def run(root, matcher, workers):
+    u"""Search root with the given number of workers and return the
+    elapsed time and the Search.
+    """
+    srch = search.Search(root, matcher, lambda entries: None, workers=workers)
+    start = time.time()
+    srch.start()
+    srch.wait()
+    return time.time() - start, srch
+
+def main(args):
+    files = int(args[0]) if args else 500000
+    with benchutil.TempTree() as root:
+        start = time.time()
+        folders = make_nested_tree(root, files)
+        benchutil.report(u"generate {} files, {} folders".format(files, folders), time.time() - start, u"s")
+        
+        matcher = search.make_matcher(u"*6.png")
+        for workers in (1, 2, 4, 8):
+            elapsed = min(run(root, matcher, workers)[0] for i in range(3))
+            benchutil.report(u"search, {} workers".format(workers), elapsed, u"s")
+        _, srch = run(root, matcher, 4)
+        benchutil.report(u"matches", srch.matches, u"entries")
+        benchutil.report(u"folders searched", srch.dirs, u"folders")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Benchmark for sorting a compact listing by each of the sort orders.
+Measures the first sort, which computes the sort keys, and sorting
+again after switching orders, which only uses the cached keys. Uses a
+synthetic listing that never touches the filesystem.
+"""
+
+from __future__ import division, print_function
+
+import random # To generate names, sizes and mtimes
+import sys    # For runtime arguments
+
+import benchutil
+benchutil.use_stubs()
+
+from filenav import core
+
+def make_listing(count, seed=0):
+    u"""Return a FileListing with count entries with random names,
+    sizes and mtimes. About a tenth of the entries are folders.
+    """
+    rnd = random.Random(seed)
+    exts = benchutil.MIXED_EXTS
+    listing = core.FileListing(u"/synthetic")
+    for i in range(count):
+        name = u"{}{} {}.{}".format(
+            rnd.choice([u"IMG_", u"img", u"Report ", u"track"]),
+            rnd.randint(0, 99999),
+            rnd.choice([u"final", u"Copy", u"v2", u""]),
+            rnd.choice(exts),
+        )
+        listing.append(
+            name,
+            (0 if rnd.random() < 0.1 else core.LISTING_FILE) | core.LISTING_STAT,
+            rnd.randint(0, 1 << 30),
+            rnd.uniform(1e9, 1.5e9),
+        )
+    return listing
+
+def sort_all(sections, order):
+    u"""Sort both sections by order.
+    """
+    for section in sections:
+        section.sort(order)
+
+def main(args):
+    count = int(args[0]) if args else 200000
+    listing = make_listing(count)
+    sections = listing.sections()
+    
+    for order in core.SORT_ORDERS:
+        elapsed, _ = benchutil.timeit(lambda: sort_all(sections, order), repeat=1)
+        benchutil.report(u"{} entries, by {}, first".format(count, order), elapsed * 1000, u"ms")
+    for order in core.SORT_ORDERS:
+        elapsed, _ = benchutil.timeit(lambda: sort_all(sections, order))
+        benchutil.report(u"{} entries, by {}, cached".format(count, order), elapsed * 1000, u"ms")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
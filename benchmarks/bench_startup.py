@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Benchmark for startup time. Runs slim.main and full.main with the
+favorites list in fresh processes, and reports the time to import them
+and the time until the first view is presented. The slowest imports
+are listed in the style of `python -X importtime`.
+"""
+
+from __future__ import division, print_function
+
+import os         # For path operations
+import subprocess # To measure in fresh processes
+import sys        # For runtime arguments
+import time       # For timing
+
+import benchutil
+benchutil.use_stubs()
+
+# Number of slowest imports to list per script.
+TOP_IMPORTS = 8
+
+def child(name):
+    # Run in a separate process, print the import time and the time to
+    # the first view in seconds.
+    start = time.time()
+    module = getattr(__import__("filenav." + name), name)
+    imported = time.time()
+    try:
+        module.main([])
+    except SystemExit:
+        pass
+    print(imported - start, time.time() - start)
+
+def run(args):
+    u"""Run Python with args in a fresh process, from the filenav folder
+    so the favorites list is found, and with the same sys.path as this
+    process. Returns its stdout and stderr.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(path for path in sys.path if path)
+    proc = subprocess.Popen(
+        [sys.executable] + args,
+        cwd=benchutil.PACKAGE_DIR, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    out, err = proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(err.decode("utf-8", "replace"))
+    return out.decode("ascii"), err.decode("utf-8", "replace")
+
+def slowest_imports(report, count):
+    u"""Return the count (cumulative microseconds, module) pairs with the
+    highest cumulative time from a -X importtime report.
+    """
+    imports = []
+    for line in report.splitlines():
+        if not line.startswith(u"import time:") or u"cumulative" in line:
+            continue
+        self_us, cumulative, module = line[len(u"import time:"):].split(u"|")
+        imports.append((int(cumulative), module.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+def main(args):
+    if args and args[0] == u"--child":
+        return child(args[1])
+    
+    repeat = int(args[0]) if args else 5
+    for name in (u"slim", u"full"):
+        results = [run([os.path.abspath(__file__), u"--child", name])[0].split() for i in range(repeat)]
+        benchutil.report(u"{}: import".format(name), min(float(r[0]) for r in results) * 1000, u"ms")
+        benchutil.report(u"{}: first view".format(name), min(float(r[1]) for r in results) * 1000, u"ms")
+        
+        # -X importtime is only available on Python 3.7 and up
+        if sys.version_info >= (3, 7):
+            _, report = run([u"-X", u"importtime", u"-c", u"import filenav." + name])
+            for cumulative, module in slowest_imports(report, TOP_IMPORTS):
+                benchutil.report(u"  import " + module, cumulative / 1000, u"ms")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
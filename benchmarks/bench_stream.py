@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Benchmark for the time until the first row of a file list can be shown,
+depending on the directory size, with and without streaming.
+"""
+
+from __future__ import division, print_function
+
+import sys  # For runtime arguments
+import time # For timing
+
+import benchutil
+benchutil.use_stubs()
+
+from filenav import common
+
+def time_to_first_row(root, stream):
+    u"""Return the time in seconds from creating a FileDataSource for
+    root until the cell for its first row has been created.
+    """
+    start = time.time()
+    ds = common.FileDataSource(None, common.FileItem(root, lazy=True), None, stream=stream)
+    ds.thumbnails = None
+    section = 0 if len(ds.folders) else 1
+    ds.tableview_cell_for_row(None, section, 0)
+    elapsed = time.time() - start
+    ds.stop_stream()
+    return elapsed
+
+def main(args):
+    sizes = [int(arg) for arg in args] or [1000, 10000, 100000]
+    for size in sizes:
+        with benchutil.TempTree(size, size // 20) as root:
+            root = common.full_path(root)
+            for stream in (False, True):
+                best = min(time_to_first_row(root, stream) for i in range(3))
+                label = u"{} entries, {}".format(size, u"streamed" if stream else u"blocking")
+                benchutil.report(label, best * 1000, u"ms to first row")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
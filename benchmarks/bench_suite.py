@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Benchmark suite for filenav's hot paths. Generates wide, deep and image
+trees with mixed extensions and measures format_size, get_fileinfo,
+FileItem construction, FileDataSource.reload, file_cell and
+get_thumbnail, with the stand-in Pythonista modules if the real ones
+are not available.
+
+Results are reported as time per operation, and can be saved as JSON
+with --json. With --save-baseline they are stored as the baseline,
+otherwise they are compared against the baseline (if there is one) and
+every case that is more than --threshold slower is flagged as a
+regression, in which case the exit status is 1. The baseline is
+machine-specific, so it is not part of the repository.
+"""
+
+from __future__ import division, print_function
+
+import argparse # For runtime arguments
+import io       # To read and write JSON files
+import json     # For results and the baseline
+import os       # For path operations
+import platform # To describe the machine in results
+import sys      # For the exit status
+
+import benchutil
+benchutil.use_stubs()
+
+from filenav import common
+from filenav import core
+from filenav import thumbnails
+
+# Default location of the baseline results.
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), u"baseline.json")
+
+# Sizes of the generated trees, multiplied by --scale.
+WIDE_FILES = 5000
+SMALL_FILES = 500
+DEEP_LEVELS = 64
+IMAGE_COUNT = 20
+
+# Cases
+########################################################################.......
+
+def bench_format_size(trees, scale):
+    sizes = [7 ** (i % 20) for i in range(int(10000 * scale))]
+    elapsed, _ = benchutil.timeit(lambda: [core.format_size(size) for size in sizes])
+    return elapsed / len(sizes)
+
+def bench_get_fileinfo(trees, scale):
+    paths = [os.path.join(trees["wide"], name) for name in os.listdir(trees["wide"])]
+    elapsed, _ = benchutil.timeit(lambda: [core.get_fileinfo(path, False) for path in paths])
+    return elapsed / len(paths)
+
+def bench_scan_dir(trees, scale):
+    elapsed, items = benchutil.timeit(lambda: core.scan_dir(trees["wide"]))
+    return elapsed / len(items)
+
+def bench_fileitem_scan(trees, scale):
+    # Construction from a scan, including what a file list row needs
+    def run():
+        items = core.scan_dir(trees["wide"])
+        for fi in items:
+            fi.constants
+            fi.stat
+        return items
+    elapsed, items = benchutil.timeit(run)
+    return elapsed / len(items)
+
+def bench_fileitem_path(trees, scale):
+    # Construction from a path, which has to resolve every parent folder
+    elapsed, _ = benchutil.timeit(lambda: core.FileItem(trees["deep"]), repeat=20)
+    return elapsed
+
+def reload_case(tree, compact):
+    # Return a benchmark for a FileDataSource reload of one of the trees.
+    def bench(trees, scale):
+        def run():
+            fi = core.FileItem(trees[tree], lazy=True)
+            ds = common.FileDataSource(None, fi, None, compact=compact)
+            return len(ds.files) + len(ds.folders) if ds.listing is None else len(ds.listing)
+        elapsed, count = benchutil.timeit(run)
+        return elapsed / count
+    return bench
+
+def bench_file_cell(trees, scale):
+    items = core.scan_dir(trees["small"])
+    pool = common.CellPool()
+    elapsed, _ = benchutil.timeit(lambda: [common.file_cell(fi, None, pool) for fi in items])
+    return elapsed / len(items)
+
+def thumbnail_case(cached):
+    # Return a benchmark for get_thumbnail with an empty or filled
+    # thumbnail cache. A temporary cache is used, so the real one isn't
+    # touched.
+    def bench(trees, scale):
+        if trees["images"] is None:
+            return None
+        paths = [os.path.join(trees["images"], name) for name in sorted(os.listdir(trees["images"]))]
+        old_cache = common.thumbnail_cache
+        common.thumbnail_cache = thumbnails.ThumbnailCache(os.path.join(trees["root"], u"thumbnails"))
+        try:
+            def run():
+                if not cached:
+                    common.thumbnail_cache.clear()
+                return [common.get_thumbnail(path) for path in paths]
+            run()
+            elapsed, _ = benchutil.timeit(run)
+        finally:
+            common.thumbnail_cache = old_cache
+        return elapsed / len(paths)
+    return bench
+
+# (name, function) of all benchmarks, in the order they are run. Each
+# function is called with the dict of tree paths and the scale, and
+# returns the time per operation in seconds, or None if it can't run.
+CASES = [
+    (u"format_size", bench_format_size),
+    (u"get_fileinfo", bench_get_fileinfo),
+    (u"scan_dir, wide", bench_scan_dir),
+    (u"FileItem from scan, wide", bench_fileitem_scan),
+    (u"FileItem from path, deep", bench_fileitem_path),
+    (u"FileDataSource.reload, small", reload_case("small", False)),
+    (u"FileDataSource.reload, wide", reload_case("wide", False)),
+    (u"FileDataSource.reload, wide compact", reload_case("wide", True)),
+    (u"file_cell, small", bench_file_cell),
+    (u"get_thumbnail, uncached", thumbnail_case(False)),
+    (u"get_thumbnail, cached", thumbnail_case(True)),
+]
+
+# Running
+########################################################################.......
+
+def make_trees(root, scale):
+    u"""Generate the trees used by CASES in root, and return a dict
+    mapping their names to their paths. "images" is None if PIL is not
+    available.
+    """
+    trees = {"root": root}
+    trees["wide"] = benchutil.make_tree(os.path.join(root, u"wide"), int(WIDE_FILES * scale), int(WIDE_FILES * scale) // 20)
+    trees["small"] = benchutil.make_tree(os.path.join(root, u"small"), SMALL_FILES, SMALL_FILES // 10)
+    trees["deep"] = benchutil.make_deep_tree(os.path.join(root, u"deep"), DEEP_LEVELS)
+    images = os.path.join(root, u"images")
+    trees["images"] = images if benchutil.make_image_tree(images, IMAGE_COUNT) else None
+    return {name: path and core.full_path(path) for name, path in trees.items()}
+
+def run_cases(trees, scale, only=None):
+    u"""Run CASES (or only those whose names contain only) and return a
+    dict mapping their names to the time per operation in seconds.
+    """
+    results = {}
+    for name, func in CASES:
+        if only and only not in name:
+            continue
+        elapsed = func(trees, scale)
+        if elapsed is None:
+            print(u"{:<48} {:>14} skipped".format(name, u"-"))
+        else:
+            results[name] = elapsed
+            benchutil.report(name, elapsed * 1000000, u"us/op")
+    return results
+
+def load_json(path):
+    with io.open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_json(path, data):
+    with io.open(path, "w", encoding="utf-8") as f:
+        # json.dumps returns a byte string on Python 2
+        f.write(u"{}".format(json.dumps(data, indent=2, sort_keys=True)))
+
+def compare(results, baseline, threshold):
+    u"""Print how results compare to the baseline results and return the
+    names of the cases that are more than threshold slower.
+    """
+    print()
+    regressions = []
+    for name, _ in CASES:
+        if name not in results or name not in baseline:
+            continue
+        ratio = results[name] / baseline[name] if baseline[name] else 1.0
+        flag = u""
+        if ratio > 1 + threshold:
+            flag = u"REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = u"faster"
+        print(u"{:<48} {:>13.2f}x {}".format(name, ratio, flag).rstrip())
+    return regressions
+
+def main(args):
+    parser = argparse.ArgumentParser(description=u"Run the filenav benchmark suite.")
+    parser.add_argument("--json", metavar="PATH", help=u"save the results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", default=BASELINE_PATH, help=u"baseline results (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help=u"save the results as the baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=0.2, help=u"slowdown that counts as a regression (default: %(default)s)")
+    parser.add_argument("--scale", type=float, default=1.0, help=u"multiplier for the size of the wide tree (default: %(default)s)")
+    parser.add_argument("--only", metavar="TEXT", help=u"only run cases whose names contain TEXT")
+    opts = parser.parse_args(args)
+    
+    common.item_cache.clear()
+    with benchutil.TempTree() as root:
+        results = run_cases(make_trees(root, opts.scale), opts.scale, opts.only)
+    
+    data = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": opts.scale,
+        "results": results,
+    }
+    if opts.json:
+        save_json(opts.json, data)
+    
+    if opts.save_baseline:
+        save_json(opts.baseline, data)
+        print(u"Saved baseline to {}".format(opts.baseline))
+    elif os.path.exists(opts.baseline):
+        baseline = load_json(opts.baseline)
+        if baseline.get("scale") != opts.scale:
+            print(u"Warning: the baseline was recorded with --scale {}".format(baseline.get("scale")))
+        if compare(results, baseline["results"], opts.threshold):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
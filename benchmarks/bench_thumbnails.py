@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Benchmark for thumbnail decoding. Generates large JPEG (with and
+without an embedded EXIF thumbnail) and PNG files and reports the time
+per thumbnail and the peak memory use, for a full decode and for
+common._thumb_for_path.
+
+Each measurement runs in its own process, so the peak RSS values don't
+influence each other. The images are generated in a separate process as
+well, as some systems keep the peak RSS across exec. Requires the
+resource module (not available on Windows).
+"""
+
+from __future__ import division, print_function
+
+import io         # For BytesIO
+import os         # For path operations
+import PIL.Image  # To generate and decode images
+import resource   # To measure peak RSS
+import struct     # To build EXIF data
+import subprocess # To run measurements in separate processes
+import sys        # For runtime arguments
+import time       # For timing
+
+import benchutil
+benchutil.use_stubs()
+
+from filenav import common
+
+def exif_with_thumbnail(size=(160, 120)):
+    u"""Return raw EXIF data containing only a JPEG thumbnail of the
+    given size in IFD1.
+    """
+    with io.BytesIO() as buf:
+        PIL.Image.new("RGB", size, (50, 100, 200)).save(buf, "JPEG")
+        thumb = buf.getvalue()
+    # Little-endian TIFF header, empty IFD0, IFD1 with offset and length
+    ifd1 = 8 + 6
+    data_offset = ifd1 + 2 + 2*12 + 4
+    tiff = (
+        b"II*\x00" + struct.pack("<I", 8)
+        + struct.pack("<HI", 0, ifd1)
+        + struct.pack("<H", 2)
+        + struct.pack("<HHII", 0x0201, 4, 1, data_offset)
+        + struct.pack("<HHII", 0x0202, 4, 1, len(thumb))
+        + struct.pack("<I", 0)
+        + thumb
+    )
+    return b"Exif\x00\x00" + tiff
+
+def corpus_paths(root):
+    u"""Return a dict mapping image kind names to paths in root.
+    """
+    return {
+        u"jpeg": os.path.join(root, u"large.jpg"),
+        u"jpeg+exif": os.path.join(root, u"large-exif.jpg"),
+        u"png": os.path.join(root, u"large.png"),
+    }
+
+def make_corpus(root, size=(4000, 3000)):
+    u"""Write one image of each kind in corpus_paths into root.
+    """
+    img = PIL.Image.radial_gradient("L").resize(size).convert("RGB")
+    paths = corpus_paths(root)
+    img.save(paths[u"jpeg"])
+    img.save(paths[u"jpeg+exif"], exif=exif_with_thumbnail())
+    img.save(paths[u"png"])
+
+def full_decode(path):
+    # Decode the whole image before shrinking it.
+    img = PIL.Image.open(path)
+    img.load()
+    return common._thumb_for_image(img)
+
+DECODERS = {
+    u"full decode": full_decode,
+    u"_thumb_for_path": common._thumb_for_path,
+}
+
+def child(decoder, path, repeat):
+    # Run in a separate process, print time per thumbnail and peak RSS.
+    func = DECODERS[decoder]
+    start = time.time()
+    for i in range(repeat):
+        func(path)
+    elapsed = (time.time() - start) / repeat
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on iOS/macOS, but in KiB on Linux
+    if sys.platform.startswith("linux"):
+        rss *= 1024
+    print(elapsed, rss)
+
+def main(args):
+    if args and args[0] == u"--child":
+        return child(args[1], args[2], int(args[3]))
+    elif args and args[0] == u"--corpus":
+        return make_corpus(args[1])
+    
+    repeat = int(args[0]) if args else 5
+    with benchutil.TempTree() as root:
+        subprocess.check_call([sys.executable, os.path.abspath(__file__), u"--corpus", root])
+        for kind, path in sorted(corpus_paths(root).items()):
+            for decoder in sorted(DECODERS):
+                out = subprocess.check_output([
+                    sys.executable, os.path.abspath(__file__),
+                    u"--child", decoder, path, str(repeat),
+                ])
+                elapsed, rss = out.split()
+                label = u"{}, {}".format(kind, decoder)
+                benchutil.report(label + u": time", float(elapsed) * 1000, u"ms/thumbnail")
+                benchutil.report(label + u": peak RSS", int(rss) / 1024 / 1024, u"MiB")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
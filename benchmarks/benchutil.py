@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+This module provides helpers shared by the benchmark scripts in this
+folder. It makes the filenav package importable and can generate
+synthetic directory trees to measure against: wide folders with mixed
+extensions (make_tree), deep chains of folders (make_deep_tree) and
+folders of images (make_image_tree).
+
+The benchmarks are meant to be run from Pythonista like any other
+script, e. g. `benchmarks/bench_scan.py`.
+"""
+
+from __future__ import division, print_function
+
+import os       # For path operations and tree generation
+import shutil   # To remove generated trees
+import sys      # To make the filenav package importable
+import tempfile # To place generated trees
+import time     # For timing
+
+# The filenav package folder is the parent of this folder, so its own
+# parent needs to be on sys.path for "from filenav import ..." to work.
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if os.path.dirname(PACKAGE_DIR) not in sys.path:
+    sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+
+# Folder with stand-ins for the Pythonista modules, see use_stubs.
+STUBS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), u"stubs")
+
+def use_stubs():
+    u"""Make filenav importable outside of Pythonista, by adding simple
+    stand-ins for the Pythonista-specific modules to sys.path. They are
+    added at the end, so in Pythonista the real modules are still used.
+    """
+    if STUBS_DIR not in sys.path:
+        sys.path.append(STUBS_DIR)
+
+# A mix of common extensions, used to name generated files.
+MIXED_EXTS = u"py txt md json png jpg zip mp3 html pyc csv tar.gz".split()
+
+def make_tree(root, files, folders=0, exts=MIXED_EXTS, size=0):
+    u"""Populate root with the given number of files and (empty)
+    folders. File extensions cycle through exts, and every file gets
+    size bytes of content.
+    """
+    if not os.path.exists(root):
+        os.makedirs(root)
+    data = b"x" * size
+    for i in range(files):
+        name = u"file{:07d}.{}".format(i, exts[i % len(exts)])
+        with open(os.path.join(root, name), "wb") as f:
+            f.write(data)
+    for i in range(folders):
+        os.mkdir(os.path.join(root, u"folder{:07d}".format(i)))
+    return root
+
+def make_deep_tree(root, depth, files=4, exts=MIXED_EXTS):
+    u"""Populate root with a chain of depth nested folders, each of
+    which contains the given number of files. Returns the path of the
+    deepest folder.
+    """
+    folder = root
+    for level in range(depth):
+        make_tree(folder, files, exts=exts)
+        folder = os.path.join(folder, u"level{:03d}".format(level))
+    return make_tree(folder, 0)
+
+def make_image_tree(root, count, size=(640, 480)):
+    u"""Populate root with count JPEG and PNG images of the given size.
+    Returns False without creating anything if PIL is not available.
+    """
+    try:
+        import PIL.Image
+    except ImportError:
+        return False
+    
+    if not os.path.exists(root):
+        os.makedirs(root)
+    img = PIL.Image.radial_gradient("L").resize(size).convert("RGB")
+    for i in range(count):
+        ext = u"jpg" if i % 2 else u"png"
+        img.save(os.path.join(root, u"image{:05d}.{}".format(i, ext)))
+    return True
+
+class TempTree(object):
+    u"""Context manager that creates a temporary folder, optionally
+    populated using make_tree, and removes it again afterwards.
+    """
+    def __init__(self, *args, **kwargs):
+        # Init
+        self.args = args
+        self.kwargs = kwargs
+        self.root = None
+    
+    def __enter__(self):
+        self.root = tempfile.mkdtemp(prefix=u"filenav-bench-")
+        if self.args or self.kwargs:
+            make_tree(self.root, *self.args, **self.kwargs)
+        return self.root
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+def timeit(func, repeat=3):
+    u"""Call func repeat times and return the best wall clock time in
+    seconds, along with the last return value.
+    """
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        ret = func()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, ret
+
+def report(name, value, unit):
+    u"""Print a single benchmark result line.
+    """
+    print(u"{:<48} {:>14.3f} {}".format(name, value, unit))
@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Minimal stand-in for Pythonista's console module, so the benchmarks can
+run headless on a desktop Python. All functions do nothing.
+"""
+
+from __future__ import division, print_function
+
+def _ignore(*args, **kwargs):
+    # Accept any arguments and do nothing.
+    pass
+
+hide_activity = _ignore
+hide_output = _ignore
+hud_alert = _ignore
+open_in = _ignore
+print_image = _ignore
+quicklook = _ignore
+show_activity = _ignore
+show_image = _ignore
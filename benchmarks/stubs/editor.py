@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Minimal stand-in for Pythonista's editor module, so the benchmarks can
+run headless on a desktop Python. All functions do nothing.
+"""
+
+from __future__ import division, print_function
+
+def _ignore(*args, **kwargs):
+    # Accept any arguments and do nothing.
+    pass
+
+open_file = _ignore
+reload_files = _ignore
@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Minimal stand-in for Pythonista's sound module, so the benchmarks can
+run headless on a desktop Python. All functions do nothing.
+"""
+
+from __future__ import division, print_function
+
+def _ignore(*args, **kwargs):
+    # Accept any arguments and do nothing.
+    pass
+
+load_effect = _ignore
+play_effect = _ignore
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Minimal stand-in for Pythonista's ui module, so the benchmarks can run
+headless on a desktop Python. Views accept and remember any attribute,
+and nothing is ever displayed. TableViewCell counts its instances, so
+benchmarks can check how many cells were created.
+"""
+
+from __future__ import division, print_function
+
+AUTOCAPITALIZE_NONE = 0
+
+class _Stub(object):
+    u"""Object that accepts any attribute. Unknown attributes are
+    created on first access as further _Stubs, so e. g.
+    view.text_label.text can be assigned without setup.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        # Init
+        self.__dict__.update(kwargs)
+    
+    def __getattr__(self, name):
+        # self.name, only called for missing attributes
+        if name.startswith("__"):
+            raise AttributeError(name)
+        value = _Stub()
+        setattr(self, name, value)
+        return value
+    
+    def __call__(self, *args, **kwargs):
+        # self(*args, **kwargs)
+        return None
+
+class View(_Stub):
+    u"""Stand-in for ui.View. Views start with an empty frame.
+    """
+    
+    x = y = width = height = 0.0
+    bounds = (0.0, 0.0, 0.0, 0.0)
+    # Only used by ScrollView, but harmless elsewhere
+    content_size = content_offset = (0.0, 0.0)
+    
+    def add_subview(self, view):
+        u"""Ignored.
+        """
+        pass
+    
+    def remove_subview(self, view):
+        u"""Ignored.
+        """
+        pass
+    
+    def present(self, *args, **kwargs):
+        u"""Ignored.
+        """
+        pass
+    
+    def close(self):
+        u"""Ignored.
+        """
+        pass
+
+class Button(View):
+    u"""Stand-in for ui.Button.
+    """
+    pass
+
+class ButtonItem(_Stub):
+    u"""Stand-in for ui.ButtonItem.
+    """
+    pass
+
+class Image(_Stub):
+    u"""Stand-in for ui.Image. Images only remember how they were
+    created.
+    """
+    
+    @classmethod
+    def named(cls, name):
+        u"""Return an image for the given name.
+        """
+        return cls(name=name)
+    
+    @classmethod
+    def from_data(cls, data):
+        u"""Return an image for the given data.
+        """
+        return cls(data=data)
+
+class NavigationView(View):
+    u"""Stand-in for ui.NavigationView.
+    """
+    
+    def __init__(self, view=None, *args, **kwargs):
+        # Init
+        View.__init__(self, *args, **kwargs)
+        self.views = [view]
+    
+    def push_view(self, view):
+        u"""Remember view as the topmost view.
+        """
+        self.views.append(view)
+    
+    def pop_view(self):
+        u"""Forget the topmost view.
+        """
+        self.views.pop()
+
+class ScrollView(View):
+    u"""Stand-in for ui.ScrollView.
+    """
+    pass
+
+class SegmentedControl(View):
+    u"""Stand-in for ui.SegmentedControl.
+    """
+    pass
+
+class TableView(View):
+    u"""Stand-in for ui.TableView. Row changes are ignored.
+    """
+    
+    def reload_data(self):
+        u"""Ignored.
+        """
+        pass
+    
+    def insert_rows(self, rows):
+        u"""Ignored.
+        """
+        pass
+    
+    def delete_rows(self, rows):
+        u"""Ignored.
+        """
+        pass
+
+class TableViewCell(View):
+    u"""Stand-in for ui.TableViewCell. The number of cells created so
+    far is counted in TableViewCell.created.
+    """
+    
+    created = 0
+    
+    def __init__(self, style="default"):
+        # Init
+        View.__init__(self)
+        TableViewCell.created += 1
+        self.style = style
+        self.text_label = _Stub(text=None)
+        self.detail_text_label = _Stub(text=None) if style != "default" else None
+        self.image_view = _Stub(image=None)
+        self.accessory_type = "none"
+
+class TextField(View):
+    u"""Stand-in for ui.TextField.
+    """
+    
+    def begin_editing(self):
+        u"""Ignored.
+        """
+        pass
+    
+    def end_editing(self):
+        u"""Ignored.
+        """
+        pass
+
+def delay(func, seconds):
+    u"""Call func immediately, there is no main thread to wait for.
+    """
+    func()
+
+def cancel_delays():
+    u"""Ignored.
+    """
+    pass
+
+def in_background(func):
+    u"""Return func unchanged, calls are not moved to another thread.
+    """
+    return func
+
+def get_screen_size():
+    u"""Return the size of an iPhone screen.
+    """
+    return (320, 568)
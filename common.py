@@ -2,7 +2,9 @@
 ########################################################################.......
 u"""filenav for Pythonista, version 2, by dgelessus.
 This module only provides classes and functions required to run the main
-scripts, it has no direct functionality on its own.
+scripts, it has no direct functionality on its own. It contains the UI
+layer (thumbnails, table cells, data sources and the app controller),
+the file model it is built on is in `core.py`.
 
 To run filenav, use either `slim.py` (for iPhone/iPod touch/popover use)
 or `full.py` (for panel view use on iPad).
@@ -10,25 +12,35 @@ or `full.py` (for panel view use on iPad).
 
 from __future__ import division, print_function
 
-import collections # For namedtuple, used to store file metadata
+import array       # For compact listing columns
+import collections # For namedtuple and OrderedDict
 import console     # For various file actions
-import datetime    # For timestamp formatting
 import editor      # To open files in the editor
-import errno       # For OSError codes
+import functools   # For partial, to pass arguments to ui.delay
 import io          # For BytesIO
 import json        # To read the favorites list
 import os          # For various path operations
-import PIL.Image   # For thumbnail creation
-import pwd         # For user information and UID resolution
-import sound       # To play sound files
-import shutil      # To copy files
+import re          # For regex errors in filters
 import stat        # To understand stat results and flags
-import sys         # To access runtime args
+import struct      # To read EXIF data
+import threading   # To read listings in the background
 import time        # Need to sleep a few times
 import ui          # For various utility functions
-import webbrowser  # To display HTML files
+import zlib        # To convert Apple-style PNG files
 
-from filenav import filetypes # File type names and mappings
+from filenav import du         # Folder sizes
+from filenav import filetypes  # File type names and mappings
+from filenav import grep       # Content search
+from filenav import scan       # Directory reading
+from filenav import search     # Recursive file search
+from filenav import thumbnails # Background thumbnail loading
+
+# The headless core, re-exported so common.FileItem etc. keep working
+from filenav.core import *
+
+# Modules that are slow to import and not needed to show the first view
+# (PIL, shutil, sound, webbrowser, index and watcher) are imported by the
+# functions that use them.
 
 try:
     import objc_util
@@ -37,319 +49,385 @@ except ImportError:
 else:
     NEW_EDITOR_MODULE = True
 
-def full_path(path):
-    u"""Return absolute path with expanded ~s, envvars and symlinks.
-    Input path is assumed to be relative to cwd.
-    """
-    return os.path.realpath(os.path.expandvars(os.path.expanduser(path)))
-
 # Constants
 ########################################################################.......
 
-u"""Tuple of data size suffixes, ranging from bytes to Yottabytes. These
-use IEEE-style naming (e. g. KiB instead of KB) to differentiate real
-sizes (multiples of 1024) from approximates ones (multiples of 1000).
-"""
-SIZE_SUFFIXES = u"bytes KiB MiB GiB TiB PiB EiB ZiB YiB".split()
+# Size of the thumbnails shown for images in file lists.
+THUMBNAIL_SIZE = (32, 32)
 
 # Delay (in seconds) to wait between conflicting animations that would
 # otherwise cause Pythonista to hang. This happens for example when a view
 # fades out while the quick look window appears.
 ANIM_DELAY = 0.7
 
-HOME_DIR = full_path(u"~")
-DOCS_DIR = os.path.join(HOME_DIR, u"Documents")
-TEMP_DIR = os.path.join(DOCS_DIR, u"temp")
-RESOURCE_DIR = full_path(os.path.join(os.path.dirname(os.__file__), u".."))
-APP_DIR = full_path(os.path.dirname(sys.executable))
-
-APP_GROUP_DIR = (
-    os.path.dirname(HOME_DIR)
-    if os.path.basename(HOME_DIR) == u"Pythonista3"
-    else HOME_DIR
-)
-
-if not "RESOURCEDIR" in os.environ:
-    os.environ["RESOURCEDIR"] = RESOURCE_DIR
-
-if not "APPDIR" in os.environ:
-    os.environ["APPDIR"] = APP_DIR
-
-if not "APPGROUPDIR" in os.environ:
-    os.environ["APPGROUPDIR"] = APP_GROUP_DIR
-
-if not os.path.exists(TEMP_DIR):
-    os.mkdir(TEMP_DIR)
-
 # Simple Utility Functions
 ########################################################################.......
 
-def has_flags(num, flags):
-    u"""Check if all flags are set in num. This only checks "on" bits,
-    any bits that are "off" in flags may have any state in num.
+def open_path(path):
+    u"""Open the given file in the Pythonista editor, if possible
     """
-    return num & flags == flags
+    editor.open_file(path if NEW_EDITOR_MODULE else rel_to_docs(path))
+    console.hide_output()
 
-def format_size(size, longf=True):
-    u"""Return the given data size shortened to the smallest unit where
-    size < 1024. If longf is true, the original size in bytes is also
-    appended in parentheses.
+def _exif_thumbnail_data(exif):
+    u"""Return the JPEG thumbnail embedded in raw EXIF data (as found
+    in a PIL image's info["exif"]), or None if there is none.
     """
-    if size < 1024:
-        return u"{} bytes".format(size)
+    if exif.startswith(b"Exif\x00\x00"):
+        exif = exif[6:]
+    
+    if exif.startswith(b"II"):
+        order = "<"
+    elif exif.startswith(b"MM"):
+        order = ">"
     else:
-        size, bsize = float(size), int(size)
-        for suffix in SIZE_SUFFIXES[1:]:
-            size /= 1024.0
-            if size < 1024.0:
-                break
-        return (
-            u"{size:02.2f} {suffix} ({bsize} bytes)"
-            if longf else
-            u"{size:02.2f} {suffix}"
-        ).format(size=size, suffix=suffix, bsize=bsize)
-
-def format_utc(timestamp):
-    u"""Convert a timestamp to a human-readable UTC date and time.
-    """
-    return u"{} UTC".format(datetime.datetime.fromtimestamp(timestamp))
-
-def rel_to_docs(path):
-    u"""Return path relative to script library (~/Documents).
-    """
-    return os.path.relpath(full_path(path), os.path.expanduser(u"~/Documents"))
+        return None
+    
+    offset = length = None
+    try:
+        # The thumbnail is referenced from IFD1, which follows IFD0
+        ifd0 = struct.unpack_from(order + "I", exif, 4)[0]
+        count = struct.unpack_from(order + "H", exif, ifd0)[0]
+        ifd1 = struct.unpack_from(order + "I", exif, ifd0 + 2 + 12*count)[0]
+        if not ifd1:
+            return None
+        
+        count = struct.unpack_from(order + "H", exif, ifd1)[0]
+        for i in range(count):
+            pos = ifd1 + 2 + 12*i
+            tag, type = struct.unpack_from(order + "HH", exif, pos)
+            # Values are either a SHORT (3) or a LONG (4)
+            value = struct.unpack_from(order + ("H" if type == 3 else "I"), exif, pos + 8)[0]
+            if tag == 0x0201: # JPEGInterchangeFormat
+                offset = value
+            elif tag == 0x0202: # JPEGInterchangeFormatLength
+                length = value
+    except struct.error as err:
+        return None
+    
+    if offset and length and offset + length <= len(exif):
+        return exif[offset:offset+length]
+    else:
+        return None
 
-def rel_to_app(path):
-    u"""Return path relative to app bundle (~/Pythonista.app).
-    """
-    return os.path.relpath(full_path(path), os.path.expanduser(u"~/Pythonista.app"))
+def _thumb_for_image(img):
+    # Shrink img to a thumbnail and return its encoded data.
+    import PIL.Image
+    img.thumbnail(THUMBNAIL_SIZE, PIL.Image.NEAREST)
+    with io.BytesIO() as buf:
+        img.save(buf, img.format)
+        return buf.getvalue()
 
-def open_path(path):
-    u"""Open the given file in the Pythonista editor, if possible
+def _fast_thumb_for_path(path):
+    u"""Like _thumb_for_path, but avoid decoding the full image where
+    possible. For JPEG files, an embedded EXIF thumbnail is used if it
+    is large enough, otherwise the image is decoded at a reduced scale
+    using draft mode. Returns None for other formats.
     """
-    editor.open_file(path if NEW_EDITOR_MODULE else rel_to_docs(path))
-    console.hide_output()
+    import PIL.Image
+    img = PIL.Image.open(path)
+    if img.format != "JPEG":
+        return None
+    
+    data = _exif_thumbnail_data(img.info.get("exif", b""))
+    if data is not None:
+        thumb = PIL.Image.open(io.BytesIO(data))
+        if min(thumb.size) >= min(THUMBNAIL_SIZE):
+            return _thumb_for_image(thumb)
+    
+    # Let the JPEG decoder scale down by up to 8x while decoding
+    img.draft(img.mode, THUMBNAIL_SIZE)
+    return _thumb_for_image(img)
 
 def _thumb_for_path(path):
     u"""Open the given image file using the PIL library, generate
-    a 32*32px thumbnail, and return it as a ui.Image.
-    """
-    thumb = PIL.Image.open(path)
-    thumb.thumbnail((32, 32), PIL.Image.NEAREST)
-    with io.BytesIO() as buf:
-        thumb.save(buf, thumb.format)
-        data = buf.getvalue()
-    return ui.Image.from_data(data)
-
-def get_thumbnail(path):
-    u"""More robust version of _path_to_thumbnail. When an Apple-
-    style PNG file is encountered that confuses PIL, the ui module
-    is used to convert it to a "normal" PNG file, which is then
-    passed back into _path_to_thumbnail.
+    a 32*32px thumbnail, and return its encoded data.
     """
+    import PIL.Image
     try:
-        return _thumb_for_path(path)
-    except IOError as err:
-        if not err.args[0] == "broken data stream when reading image file":
-            return None
-        tmp_file = os.path.join(TEMP_DIR, u"filenav-tmp.png")
-        # Write image as png using ui module
-        with open(tmp_file, "wb") as f:
-            f.write(ui.Image.named(path).to_png())
-        return _thumb_for_path(tmp_file)
+        data = _fast_thumb_for_path(path)
+    except Exception as err:
+        # Anything the fast path can't handle gets a second chance below
+        data = None
+    
+    return _thumb_for_image(PIL.Image.open(path)) if data is None else data
 
-# File Metadata Classes
-########################################################################.......
+# The first eight bytes of every PNG file.
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
 
-# namedtuple for quick access to file metadata that is (practically) guaranteed
-# to remain constant for a specific path.
-FileInfo = collections.namedtuple(
-    "FileInfo",
-    "dir name nameparts ext group desc icon"
-)
+def _png_chunk(type, body):
+    # Encode a single PNG chunk.
+    return (
+        struct.pack(">I", len(body)) + type + body
+        + struct.pack(">I", zlib.crc32(type + body) & 0xffffffff)
+    )
 
-def get_fileinfo(path):
-    u"""Construct a FileInfo instance for path and populate it with
-    appropriate metadata.
+def is_crushed_png(data):
+    u"""Check if data is an Apple-optimized ("CgBI") PNG file, as used
+    in iOS app bundles. These are not readable by PIL.
     """
-    # Initialize variables with default values
-    dir, name = os.path.split(path)
-    nameparts = name.lower().split(os.extsep)
-    ext = None
-    group = basegroup = "folder" if os.path.isdir(path) else "file"
-    desc, icon = filetypes.GROUP_ICONS[group]
-    
-    # Find last known file extension
-    for part in nameparts:
-        if part in filetypes.TYPE_GROUPS:
-            ext = part
-    
-    # Update group, desc, icon accordingly
-    if ext:
-        group = filetypes.TYPE_GROUPS.get(ext, group)
-        desc = filetypes.FILE_EXTS.get(ext, filetypes.GROUP_ICONS[group][0])
-        icon = filetypes.GROUP_ICONS[group][1]
-        
-        # Special case - if desc is None, use default file/folder description
-        if desc is None:
-            desc = filetypes.GROUP_ICONS[basegroup][0]
-    
-    # Folders should only get certain file types applied
-    if basegroup == "folder" and ext not in filetypes.FOLDERS_WITH_ICONS:
-        desc, icon = filetypes.GROUP_ICONS[basegroup]
-    
-    return FileInfo(dir, name, nameparts, ext, group, desc, icon)
-
-class FileItem(object):
-    u"""Class representing a path and associated properties.
-    All data that should remain constant for a specific path,
-    except the path itself, is stored in self.constants as an
-    instance of FileInfo.
+    return data.startswith(PNG_SIGNATURE) and data[12:16] == b"CgBI"
+
+def uncrush_png(data):
+    u"""Convert the data of an Apple-optimized PNG file to a standard
+    PNG file in memory. Such files have a headerless deflate stream and
+    BGR(A) instead of RGB(A) pixels. Only non-interlaced 8-bit RGB(A)
+    images are supported, others raise a ValueError. Alpha remains
+    premultiplied.
     """
-    def __new__(cls, path):
-        # Constructor
-        assert issubclass(cls, FileItem)
-        
-        if isinstance(path, FileItem):
-            # Allow efficient "conversion" of a FileItem to its own type
-            return path
-        else:
-            # Create a new FileItem from path
-            self = super(FileItem, cls).__new__(cls)
-            self.path = full_path(path)
-            self.reload()
-            return self
+    ihdr = None
+    idat = []
+    chunks = []
+    pos = len(PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length, type = struct.unpack_from(">I4s", data, pos)
+        body = data[pos+8:pos+8+length]
+        pos += 12 + length
+        if type == b"IHDR":
+            ihdr = body
+        elif type == b"IDAT":
+            idat.append(body)
+        elif type == b"IEND":
+            break
+        elif type != b"CgBI":
+            chunks.append(_png_chunk(type, body))
     
-    def reload(self):
-        u"""Reload the FileItem's non-constant data by re-
-        examining the location referenced by self.path.
-        """
-        self.constants = get_fileinfo(self.path)
-        self.icon = self.constants.icon
-        self.icon_cached = False
-        
+    if ihdr is None:
+        raise ValueError("PNG data has no IHDR chunk")
+    width, height, depth, ctype, comp, filt, interlace = struct.unpack(">IIBBBBB", ihdr)
+    if depth != 8 or ctype not in (2, 6) or interlace:
+        raise ValueError("Unsupported PNG format for un-crushing")
+    
+    try:
+        pixels = bytearray(zlib.decompress(b"".join(idat), -15))
+    except zlib.error as err:
+        raise ValueError("Invalid PNG image data: {}".format(err))
+    
+    # Swap blue and red in every row. PNG filters only ever combine bytes
+    # of the same channel, so this can be done without unfiltering.
+    bpp = 3 if ctype == 2 else 4
+    stride = 1 + width*bpp
+    for start in range(1, min(len(pixels), stride*height), stride):
+        row = pixels[start:start+stride-1]
+        row[0::bpp], row[2::bpp] = row[2::bpp], row[0::bpp]
+        pixels[start:start+stride-1] = row
+    
+    return b"".join([
+        PNG_SIGNATURE,
+        _png_chunk(b"IHDR", ihdr),
+    ] + chunks + [
+        _png_chunk(b"IDAT", zlib.compress(bytes(pixels))),
+        _png_chunk(b"IEND", b""),
+    ])
+
+def _thumb_for_crushed_png(data):
+    # Un-crush an Apple-optimized PNG and return its thumbnail data.
+    import PIL.Image
+    img = PIL.Image.open(io.BytesIO(uncrush_png(data)))
+    if img.mode == "RGBA":
         try:
-            self.stat = os.stat(self.path)
-        except OSError as err:
-            self.stat = None
+            # Undo the alpha premultiplication
+            img = PIL.Image.frombytes("RGBa", img.size, img.tobytes()).convert("RGBA")
+        except ValueError as err:
+            # Not supported by old PIL versions, keep premultiplied colors
+            pass
+        img.format = "PNG"
+    return _thumb_for_image(img)
 
-        if os.path.isdir(self.path):
-            self.basetype = 0
-            try:
-                self.contents = os.listdir(self.path)
-            except OSError as err:
-                self.contents = []
-        else:
-            self.basetype = 1
-            self.contents = None
-    
-    def __repr__(self):
-        # repr(self) and str(self)
-        return "{}.FileItem({})".format(type(self).__module__, self.path)
-    
-    def __eq__(self, other):
-        # self == other
-        return (
-            os.path.samefile(self.path, other.path)
-            if isinstance(other, FileItem)
-            else False
-        )
+def _on_main_thread(func):
+    # Call func on the main thread and return its result. objc_util is
+    # only available in Pythonista, elsewhere func is called directly.
+    if NEW_EDITOR_MODULE:
+        return objc_util.on_main_thread(func)()
+    else:
+        return func()
+
+def get_thumbnail_data(path):
+    u"""More robust version of _thumb_for_path. When an Apple-
+    style PNG file is encountered that confuses PIL, it is converted to
+    a "normal" PNG file in memory, with the ui module as a last resort,
+    and then passed back into PIL. Returns None if no thumbnail can be
+    created. This does not touch any shared state or files other than
+    path, and the ui module is only used on the main thread, so it is
+    safe to call from multiple threads.
+    """
+    import PIL.Image
+    try:
+        return _thumb_for_path(path)
+    except IOError as err:
+        message = err.args[0] if err.args else None
     
-    def basename(self):
-        u"""Like os.path.basename(self.path).
-        """
-        return self.constants.name
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        if is_crushed_png(data):
+            try:
+                return _thumb_for_crushed_png(data)
+            except (IOError, ValueError) as err:
+                pass
+        if message == "broken data stream when reading image file":
+            # Let the ui module convert the image to a normal PNG file.
+            # This may run on a thumbnail worker, but ui.Image must only
+            # be used on the main thread.
+            data = _on_main_thread(lambda: ui.Image.named(path).to_png())
+            return _thumb_for_image(PIL.Image.open(io.BytesIO(data)))
+    except (IOError, ValueError) as err:
+        pass
     
-    def commonprefix(self, others):
-        u"""Like os.path.commonprefix([self.path] + others).
-        """
-        return os.path.commonprefix([self.path] + [
-            fi.path
-            if isinstance(fi, FileItem)
-            else fi
-            for fi in others
-        ])
+    return None
+
+# Persistent cache for thumbnail data, see get_thumbnail.
+thumbnail_cache = thumbnails.ThumbnailCache(os.path.join(TEMP_DIR, u".filenav-thumbnails"))
+
+def get_cached_thumbnail_data(path, st=None):
+    u"""Return the thumbnail data for the given image file, or None if
+    no thumbnail can be created. The data is stored in thumbnail_cache,
+    keyed by path, size and mtime, so an unchanged image is only decoded
+    once. st may be given to avoid stat'ing path again. Like
+    get_thumbnail_data, this is safe to call from multiple threads.
+    """
+    if st is None:
+        try:
+            st = os.stat(path)
+        except OSError as err:
+            return None
     
-    def dirname(self):
-        u"""Like os.path.dirname(self.path).
-        """
-        return self.constants.dir
+    data = thumbnail_cache.get(path, st)
+    if data is None:
+        data = get_thumbnail_data(path)
+        # Failures are cached as empty data, so they aren't retried
+        thumbnail_cache.put(path, st, data or b"")
     
-    def isdir(self):
-        u"""Like os.path.isdir(self.path).
-        """
-        return self.basetype == 0
+    return data or None
+
+def get_thumbnail(path, st=None):
+    u"""Like get_cached_thumbnail_data, but return the thumbnail as a
+    ui.Image. This must be called on the main thread.
+    """
+    data = get_cached_thumbnail_data(path, st)
+    return ui.Image.from_data(data) if data else None
+
+# Shared pipeline that loads thumbnail data in the background for file
+# lists. It only returns bytes, the ui.Images are created by file_cell
+# on the main thread.
+thumbnail_pipeline = thumbnails.ThumbnailPipeline(get_cached_thumbnail_data)
+
+# Number of most recently shown rows of a file list whose thumbnails are
+# still loaded, requests for older rows are assumed to have scrolled off
+# and are cancelled.
+THUMBNAIL_WINDOW = 48
+
+# Table Cells
+########################################################################.......
+
+# Number of cells a CellPool keeps per style. This needs to be larger than
+# the number of rows that can be visible at once.
+CELL_POOL_SIZE = 64
+
+# Cache for named_image, maps names to ui.Image instances.
+_images = {}
+
+def named_image(name):
+    u"""Like ui.Image.named(name), but every image is only loaded once.
+    """
+    try:
+        return _images[name]
+    except KeyError:
+        image = _images[name] = ui.Image.named(name)
+        return image
+
+class CellPool(object):
+    u"""Bounded pool of ui.TableViewCells for a single table view.
+    Up to size cells are created per style, after that the least
+    recently used cell of that style is reused. Every table view needs
+    its own pool, as a cell can't be shown in two places at once.
+    """
     
-    def isfile(self):
-        u"""Like os.path.isfile(self.path).
-        """
-        return self.basetype == 1
+    def __init__(self, size=CELL_POOL_SIZE):
+        # Init
+        self.size = size
+        # Maps styles to deques of cells, least recently used first
+        self._cells = {}
+        # Maps cells to the key they were last used for
+        self._keys = {}
+        # Number of cells created, for statistics
+        self.created = 0
     
-    def join(self, *args):
-        u"""Like os.path.join(self.path, *args).
+    @staticmethod
+    def apply(cell, model):
+        u"""Show the contents of a CellModel in a cell of the same style.
+        Images given by name are loaded with named_image.
         """
-        return os.path.join(self.path, *args)
+        cell.text_label.text = model.text
+        if cell.detail_text_label is not None:
+            cell.detail_text_label.text = model.detail
+        if cell.image_view is not None:
+            image = model.image
+            if image is not None and not isinstance(image, ui.Image):
+                image = named_image(image)
+            cell.image_view.image = image
+        cell.accessory_type = model.accessory
+        return cell
     
-    def listdir(self):
-        u"""Like os.listdir(self.path).
+    def cell(self, model, key=None):
+        u"""Return a cell showing model. key identifies what the cell is
+        used for, see the key method.
         """
-        if self.isdir():
-            return self.contents
+        cells = self._cells.setdefault(model.style, collections.deque())
+        if len(cells) < self.size:
+            cell = ui.TableViewCell(model.style)
+            self.created += 1
         else:
-            err = OSError()
-            err.errno = errno.ENOTDIR
-            err.strerror = os.strerror(err.errno)
-            err.filename = self.path
-            raise err
-    
-    def relpath(self, start):
-        u"""Like os.path.relpath(self.path, start).
-        """
-        return os.path.relpath(
-            self.path,
-            (start.path if isinstance(start, FileItem) else start),
-        )
+            cell = cells.popleft()
+        cells.append(cell)
+        self._keys[cell] = key
+        return self.apply(cell, model)
     
-    def samefile(self, other):
-        u"""Like os.path.samefile(self.path, other). other may be
-        a FileItem instance or a string.
+    def key(self, cell):
+        u"""Return the key that cell was last returned for.
         """
-        if isinstance(other, FileItem):
-            return self == other
-        else:
-            return os.path.samefile(self.path, other)
+        return self._keys.get(cell)
+
+def file_cell(fi, pipeline=None, pool=None):
+    u"""Create a ui.TableViewCell for a FileItem, as described by its
+    cell_model(). If a CellPool is given, the cell is taken from it. If
+    a ThumbnailPipeline is given, thumbnail data is loaded in the
+    background and the generic icon is shown until it is done. The
+    pipeline's loader must return bytes, like get_cached_thumbnail_data.
+    """
+    wants_thumb = not fi.icon_cached and fi.constants.group == "image"
+    if wants_thumb and pipeline is None:
+        # Just-in-time creation of thumbnails
+        fi.set_thumbnail(get_thumbnail(fi.path, fi.stat))
     
-    def split(self):
-        u"""Like os.path.split(self.path).
-        """
-        return (self.constants.dir, self.constants.name)
+    if pool is None:
+        cell = CellPool.apply(ui.TableViewCell("subtitle"), fi.cell_model())
+    else:
+        cell = pool.cell(fi.cell_model(), fi.path)
     
-    def as_cell(self):
-        u"""Create a ui.TableViewCell for this FileItem. It will
-        include the name, icon (or thumbnail if an image), type,
-        size, info button, and a disclosure arrow if a directory.
-        """
-        cell = ui.TableViewCell("subtitle")
-        cell.text_label.text = self.basename()
-        
-        if not self.icon_cached and self.constants.group == "image":
-            thumb = get_thumbnail(self.path)
-            if thumb:  # Just-in-time creation of thumbnails
-                self.icon = thumb
-                self.icon_cached = True
-        cell.image_view.image = self.icon
-        
-        cell.detail_text_label.text = self.constants.desc
-        if self.stat is not None: # If available, add size to subtitle
-            cell.detail_text_label.text += " ({})".format(format_size(self.stat.st_size, False))
+    if wants_thumb and pipeline is not None:
+        def _show(path, data):
+            # Runs on the main thread. The cell may have been reused for
+            # another row since.
+            if fi.set_thumbnail(ui.Image.from_data(data)) and (pool is None or pool.key(cell) == path):
+                cell.image_view.image = fi.icon
         
-        cell.accessory_type = "detail_disclosure_button" if self.isdir() else "detail_button"
-        
-        return cell
+        def _done(path, data):
+            # Runs on a pipeline worker, which only loads the data
+            if data:
+                ui.delay(lambda: _show(path, data), 0)
+        pipeline.request(fi.path, _done)
+    
+    return cell
 
 # Data Sources
 ########################################################################.......
 
+# namedtuple describing how a FileDataSource's rows changed during a refresh.
+# Each field is a list of (section, row) tuples. deleted refers to rows
+# before the refresh, inserted and updated to rows after it.
+ListingChanges = collections.namedtuple("ListingChanges", "deleted inserted updated")
+
 class FavoritesDataSource(object):
     u"""ui.TableView data source that displays a list of favorites read
     from a JSON file.
@@ -360,6 +438,7 @@ class FavoritesDataSource(object):
         self.app = app
         self.src = full_path(src)
         self.tableview = tableview
+        self.cells = CellPool()
         self.reload()
     
     def reload(self):
@@ -381,12 +460,13 @@ class FavoritesDataSource(object):
     def tableview_cell_for_row(self, tableview, section, row):
         u"""Create and return a cell for the given section/row.
         """
-        cell = ui.TableViewCell("subtitle")
-        cell.text_label.text = self.entries[row][0]
-        cell.detail_text_label.text = self.entries[row][1]
-        cell.image_view.image = ui.Image.named("ionicons-folder-32")
-        cell.accessory_type = "detail_disclosure_button"
-        return cell
+        return self.cells.cell(CellModel(
+            "subtitle",
+            self.entries[row][0],
+            self.entries[row][1],
+            named_image("ionicons-folder-32"),
+            "detail_disclosure_button",
+        ))
     
     def tableview_title_for_header(self, tableview, section):
         u"""Return a title for the given section.
@@ -427,14 +507,14 @@ class FavoritesDataSource(object):
         """
         if not tableview.editing:
             console.show_activity("Loading file list...")
-            self.app.push_view(self.app.make_file_list(FileItem(self.entries[row][0])))
+            self.app.push_view(self.app.make_file_list(item_cache.get(self.entries[row][0])))
             console.hide_activity()
     
     def tableview_accessory_button_tapped(self, tableview, section, row):
         u"""Called when the user taps a row's accessory (i) button.
         """
         if not tableview.editing:
-            self.app.push_view(self.app.make_stat_view(FileItem(self.entries[row][0])))
+            self.app.push_view(self.app.make_stat_view(FileItem(self.entries[row][0], lazy=True)))
     
     def add_favorite(self, sender):
         root = ui.View(name=u"Add Favorite")
@@ -470,7 +550,7 @@ class FavoritesDataSource(object):
         def _action(sender):
             self.entries.append([path.text, desc.text])
             self.tableview.insert_rows([len(self.entries) - 1])
-        
+            
             with open(self.src, "w") as f:
                 json.dump(self.entries, f, indent=4)
             
@@ -484,31 +564,467 @@ class FileDataSource(object):
     u"""ui.TableView data source that generates a directory listing.
     """
     
-    def __init__(self, app, fi, tableview):
+    def __init__(self, app, fi, tableview, compact=None, stream=False, folder_sizes=False):
         # Init
         self.app = app
         self.fi = fi
         self.tableview = tableview
+        # True or False to force or disable a compact listing, None to
+        # decide based on the number of entries
+        self.compact = compact
+        # Whether to show the listing while it is still being read
+        self.stream = stream
+        # Whether to calculate the total sizes of the folders in the
+        # background once the listing is loaded
+        self.folder_sizes = folder_sizes
+        # The running or last du.DirSize
+        self.sizes = None
+        # Incremented to make running streams stop
+        self._stream_id = 0
+        # Order of the rows in each section, one of SORT_ORDERS
+        self.sort_order = "name"
+        self.sort_reverse = False
+        # Only rows matching the query are shown, see filter
+        self.filter_query = u""
+        self.filter_mode = "substring"
+        # NameFilters for folders and files, None until needed
+        self._filters = None
+        # Set to None to load thumbnails synchronously
+        self.thumbnails = thumbnail_pipeline
+        # Paths of recently shown rows, oldest first
+        self._shown = collections.OrderedDict()
+        self.cells = CellPool()
+        # FileItems for recently shown rows of a compact listing, by index
+        self._wrapped = collections.OrderedDict()
         self.reload()
-        self.lists = [self.folders, self.files]
+    
+    def _set_lists(self, folders, files):
+        # Replace the lists of folders and files. self.folders and
+        # self.files contain all rows, self.lists only the shown ones.
+        self.folders = folders
+        self.files = files
+        self._lists_changed()
+    
+    def _lists_changed(self):
+        # Called whenever self.folders or self.files have changed.
+        self._filters = None
+        self._apply_filter()
+    
+    def _apply_filter(self):
+        # Set self.lists to the rows matching the current filter.
+        if not self.filter_query:
+            self.lists = [self.folders, self.files]
+            return
+        
+        self.prepare_filter()
+        self.lists = [
+            self._subset(lst, flt.match(self.filter_query, self.filter_mode))
+            for lst, flt in zip((self.folders, self.files), self._filters)
+        ]
+    
+    def prepare_filter(self):
+        u"""Build the name index used for filtering, unless it exists
+        already. Called when the filter is shown, so the first keystroke
+        doesn't have to wait for it.
+        """
+        if self._filters is None:
+            self._filters = [NameFilter(self._names(lst)) for lst in (self.folders, self.files)]
+    
+    @staticmethod
+    def _names(lst):
+        # Return the entry names of the rows in lst.
+        if isinstance(lst, ListingSection):
+            names = lst.listing.names
+            return [names[index] for index in lst.indices]
+        else:
+            return [fi.entryname() for fi in lst]
+    
+    @staticmethod
+    def _subset(lst, positions):
+        # Return the rows of lst at the given positions, as a list of
+        # the same kind as lst.
+        if isinstance(lst, ListingSection):
+            indices = lst.indices
+            return ListingSection(
+                lst.listing,
+                array.array(indices.typecode, [indices[pos] for pos in positions]),
+            )
+        else:
+            return [lst[pos] for pos in positions]
+    
+    def filter(self, query, mode=None):
+        u"""Only show rows whose names match query, see NameFilter.match
+        for details. mode is one of FILTER_MODES, or None to keep the
+        current mode. An empty query shows all rows again.
+        """
+        if mode is not None:
+            if mode not in FILTER_MODES:
+                raise ValueError(u"Unknown filter mode: {!r}".format(mode))
+            self.filter_mode = mode
+        self.filter_query = query
+        
+        self._apply_filter()
+        if self.tableview is not None:
+            self.tableview.reload_data()
+    
+    def show_filter(self, sender):
+        u"""Show a popover with a text field that filters the list as
+        the query is typed, and a control to choose the filter mode.
+        """
+        root = ui.View(name=u"Filter")
+        root.width, root.height = 300, 90
+        
+        query = ui.TextField()
+        query.autocapitalization_type = ui.AUTOCAPITALIZE_NONE
+        query.autocorrection_type = False
+        query.clear_button_mode = "while_editing"
+        query.spellchecking_type = False
+        query.placeholder = u"Filter"
+        query.text = self.filter_query
+        query.delegate = self
+        root.add_subview(query)
+        query.flex = "W"
+        query.x, query.y = 10, 10
+        query.width, query.height = root.width - 20, 30
+        
+        modes = ui.SegmentedControl()
+        modes.segments = list(FILTER_MODES.values())
+        modes.selected_index = list(FILTER_MODES).index(self.filter_mode)
+        modes.action = lambda sender: self.filter(
+            self.filter_query,
+            list(FILTER_MODES)[sender.selected_index],
+        )
+        root.add_subview(modes)
+        modes.flex = "W"
+        modes.x, modes.y = 10, query.y + query.height + 10
+        modes.width, modes.height = root.width - 20, 30
+        
+        self.prepare_filter()
+        root.present("popover")
+        query.begin_editing()
+    
+    def textfield_did_change(self, textfield):
+        u"""Called when the text in the filter popover changes.
+        """
+        self.filter(textfield.text)
     
     def reload(self):
         u"""Reload the list of files and folders.
         """
         assert isinstance(self.fi, FileItem)
         
-        self.folders = []
-        self.files = []
+        self.stop_stream()
+        self.listing = None
+        self._wrapped.clear()
         
-        for i, name in enumerate(self.fi.contents):
-            if not isinstance(name, FileItem):
-                # If they aren't already, convert contents to FileItems
-                name = self.fi.contents[i] = FileItem(self.fi.join(name))
-
-            if name.isdir():
-                self.folders.append(name)
+        if self.compact is not False and not self.fi.has_items():
+            if self.fi.listing is not None:
+                # Listed on an earlier visit
+                self.listing = self.fi.listing
+                self._set_lists(*self.listing.sections())
+                self._sort_lists()
+                self._start_sizes()
+                return
+            if self.stream:
+                self._start_stream()
+                return
+            listing = FileListing.scan(self.fi.path)
+            if self.compact or len(listing) >= COMPACT_LISTING_THRESHOLD:
+                self.listing = self.fi.listing = listing
+                self._set_lists(*listing.sections())
+                self._sort_lists()
+                self._start_sizes()
+                return
+            # Small enough for FileItems, which are then kept by self.fi
+            self.fi.contents = listing.items()
+        
+        folders = []
+        files = []
+        
+        for fi in self.fi.listitems() or ():
+            if fi.isdir():
+                folders.append(fi)
+            else:
+                files.append(fi)
+        
+        self._set_lists(folders, files)
+        self._sort_lists()
+        self._start_sizes()
+    
+    def _sort_lists(self):
+        # Sort both sections by the current order.
+        for lst in (self.folders, self.files):
+            if isinstance(lst, ListingSection):
+                lst.sort(self.sort_order, self.sort_reverse)
+            else:
+                order = self.sort_order
+                lst.sort(key=lambda fi: fi.sort_key(order), reverse=self.sort_reverse)
+        self._lists_changed()
+    
+    def sort(self, order=None, reverse=None):
+        u"""Sort the lists by order (one of SORT_ORDERS) and reload the
+        table view. If order or reverse are None, they are unchanged.
+        Sort keys are cached, so switching between orders is cheap.
+        """
+        if order is not None:
+            if order not in SORT_ORDERS:
+                raise ValueError(u"Unknown sort order: {!r}".format(order))
+            self.sort_order = order
+        if reverse is not None:
+            self.sort_reverse = reverse
+        
+        self._sort_lists()
+        if self.tableview is not None:
+            self.tableview.reload_data()
+    
+    def next_sort_order(self, sender):
+        u"""Sort by the order after the current one in SORT_ORDERS and
+        briefly show which one it is.
+        """
+        orders = list(SORT_ORDERS)
+        self.sort(orders[(orders.index(self.sort_order) + 1) % len(orders)])
+        console.hud_alert(u"Sorted by " + SORT_ORDERS[self.sort_order])
+    
+    def _item(self, section, row):
+        # Return the FileItem for the given section/row. Rows of compact
+        # listings are wrapped on demand, and the most recent ones are
+        # kept so their cell models and thumbnails are reused.
+        item = self.lists[section][row]
+        if isinstance(item, FileItem):
+            return item
+        
+        fi = self._wrapped.pop(item.index, None)
+        if fi is None:
+            fi = FileItem(item)
+        self._wrapped[item.index] = fi
+        while len(self._wrapped) > self.cells.size:
+            self._wrapped.popitem(last=False)
+        return fi
+    
+    def _start_stream(self):
+        # Show the first chunk of the listing now, and read the rest in
+        # the background. The listing is compact while it is streamed.
+        listing = self.listing = FileListing(self.fi.path)
+        self._set_lists(
+            ListingSection(listing, array.array("i")),
+            ListingSection(listing, array.array("i")),
+        )
+        
+        try:
+            chunks = iter_chunks(scan.iter_entries(self.fi.path), STREAM_CHUNK_SIZE)
+            first = next(chunks, None)
+        except OSError as err:
+            first = None
+        
+        if first is None:
+            self._finish_stream(self._stream_id)
+            return
+        self._add_chunk(self._stream_id, first, False)
+        
+        def _read(stream_id):
+            try:
+                for chunk in chunks:
+                    if stream_id != self._stream_id:
+                        return
+                    ui.delay(functools.partial(self._add_chunk, stream_id, chunk), 0)
+            except OSError as err:
+                pass
+            ui.delay(functools.partial(self._finish_stream, stream_id), 0)
+        
+        thread = threading.Thread(target=_read, args=(self._stream_id,), name=u"filenav-stream")
+        thread.daemon = True
+        thread.start()
+    
+    def _add_chunk(self, stream_id, entries, update=True):
+        # Add a chunk of entries to a streamed listing.
+        if stream_id != self._stream_id:
+            return
+        
+        rows = []
+        sections = (self.folders, self.files)
+        for index in self.listing.add_entries(entries):
+            section = 1 if self.listing.types[index] & LISTING_FILE else 0
+            rows.append((section, len(sections[section])))
+            sections[section].indices.append(index)
+        
+        if self.filter_query:
+            # Only some of the new rows may be shown
+            self._lists_changed()
+            if update and self.tableview is not None:
+                self.tableview.reload_data()
+        elif update and self.tableview is not None and rows:
+            self.tableview.insert_rows(rows)
+    
+    def _finish_stream(self, stream_id):
+        # Called once a streamed listing is complete. Rows are shown in
+        # directory order until then, and sorted now. If the listing is
+        # small enough, it is replaced by FileItems.
+        if stream_id != self._stream_id:
+            return
+        
+        self._stream_id += 1
+        if not self.compact and len(self.listing) < COMPACT_LISTING_THRESHOLD:
+            # Rows that were already shown keep their FileItems
+            wrapped = self._wrapped
+            folders = [wrapped.get(row.index) or FileItem(row) for row in self.folders]
+            files = [wrapped.get(row.index) or FileItem(row) for row in self.files]
+            self.fi.contents = folders + files
+            self.listing = None
+            self._wrapped.clear()
+            self._set_lists(folders, files)
+        else:
+            self.fi.listing = self.listing
+        
+        self._sort_lists()
+        if self.tableview is not None:
+            self.tableview.reload_data()
+        self._start_sizes()
+    
+    def stop_stream(self):
+        u"""Stop reading a streamed listing and calculating folder
+        sizes. The entries read so far remain in the lists.
+        """
+        self._stream_id += 1
+        if self.sizes is not None:
+            self.sizes.cancel()
+            self.sizes = None
+    
+    def _start_sizes(self):
+        # Calculate the total size of this folder in the background,
+        # which also calculates the sizes of all folders in it. Cached
+        # folders aren't scanned again, so this is cheap on later visits.
+        if not self.folder_sizes or not len(self.folders):
+            return
+        
+        sizes = self.sizes = du.DirSize(
+            self.fi.path, size_cache,
+            done=lambda dirsize: ui.delay(functools.partial(self._sizes_done, dirsize), 0),
+            workers=2,
+        )
+        sizes.start()
+    
+    def calculate_sizes(self, sender=None):
+        u"""Calculate the total sizes of the folders in the background,
+        and show them once they are known. They are calculated again
+        whenever the list is reloaded.
+        """
+        self.folder_sizes = True
+        if self.sizes is None or self.sizes.finished:
+            self._start_sizes()
+    
+    def _sizes_done(self, dirsize):
+        # Called once the folder sizes are known, to show them.
+        if dirsize is not self.sizes or dirsize.cancelled:
+            return
+        
+        for fi in self.folders:
+            if isinstance(fi, FileItem):
+                fi.reset_cell_model()
+        self._wrapped.clear()
+        if self.tableview is not None:
+            self.tableview.reload_data()
+    
+    def refresh(self):
+        u"""Rescan the directory and update the lists and the table view
+        incrementally. Entries are matched by name, and unchanged
+        entries keep their FileItems (and thus cached thumbnails).
+        Remaining rows keep their order, new ones are added at the end
+        of their section until the list is sorted again. Returns a
+        ListingChanges instance (with rows of the unfiltered lists), or
+        None if the directory is shown as a compact listing, which is
+        reloaded completely.
+        """
+        if self.listing is not None:
+            self.fi.listing = None
+            self.reload()
+            if self.tableview is not None:
+                self.tableview.reload_data()
+            return None
+        
+        # Maps entry names to (section, FileItem)
+        old = {}
+        for section, lst in enumerate((self.folders, self.files)):
+            for fi in lst:
+                old[fi.entryname()] = (section, fi)
+        
+        # Maps entry names of all current entries to their FileItems
+        found = {}
+        # Names of entries that changed, but stay in the same section
+        changed = set()
+        # New FileItems for each section
+        added = ([], [])
+        
+        try:
+            entries = list(scan.iter_entries(self.fi.path))
+        except OSError as err:
+            entries = []
+        
+        for entry in entries:
+            section, fi = old.get(entry.name, (None, None))
+            if fi is not None and fi.same_entry(entry):
+                found[entry.name] = fi
             else:
-                self.files.append(name)
+                fi = found[entry.name] = FileItem.from_entry(entry)
+                if section == fi.basetype:
+                    changed.add(entry.name)
+                else:
+                    added[fi.basetype].append(fi)
+        
+        deleted = []
+        inserted = []
+        updated = []
+        removed = [] # Rows of updated entries before the refresh
+        lists = []
+        
+        for section, lst in enumerate((self.folders, self.files)):
+            new = []
+            for row, fi in enumerate(lst):
+                name = fi.entryname()
+                if name in changed:
+                    removed.append((section, row))
+                    updated.append((section, len(new)))
+                    new.append(found[name])
+                elif found.get(name) is fi:
+                    new.append(fi)
+                else:
+                    deleted.append((section, row))
+            for fi in added[section]:
+                inserted.append((section, len(new)))
+                new.append(fi)
+            lists.append(new)
+        
+        changes = ListingChanges(deleted, inserted, updated)
+        self.fi.contents = lists[0] + lists[1]
+        
+        if self.filter_query:
+            # Row numbers don't match the shown rows, so reload everything
+            self._set_lists(*lists)
+            if self.tableview is not None:
+                self.tableview.reload_data()
+        elif self.tableview is not None and (deleted or inserted or updated):
+            # The table view checks the row counts after every call, so
+            # first remove all deleted and updated rows, then insert the
+            # inserted and updated rows again.
+            pending = set(inserted + updated)
+            self._set_lists(*[
+                [fi for row, fi in enumerate(lst) if (section, row) not in pending]
+                for section, lst in enumerate(lists)
+            ])
+            if deleted or removed:
+                self.tableview.delete_rows(deleted + removed)
+            self._set_lists(*lists)
+            if inserted or updated:
+                self.tableview.insert_rows(inserted + updated)
+        else:
+            self._set_lists(*lists)
+        
+        return changes
+    
+    def filesystem_changed(self, paths):
+        u"""Called by the app's watcher.Watcher when the directory has
+        changed. The refresh is done on the main thread.
+        """
+        ui.delay(self.refresh, 0)
     
     def tableview_number_of_sections(self, tableview):
         u"""Return the number of sections.
@@ -523,7 +1039,15 @@ class FileDataSource(object):
     def tableview_cell_for_row(self, tableview, section, row):
         u"""Create and return a cell for the given section/row.
         """
-        return self.lists[section][row].as_cell()
+        fi = self._item(section, row)
+        
+        if self.thumbnails is not None:
+            self._shown.pop(fi.path, None)
+            self._shown[fi.path] = True
+            while len(self._shown) > THUMBNAIL_WINDOW:
+                self.thumbnails.cancel(self._shown.popitem(last=False)[0])
+        
+        return file_cell(fi, self.thumbnails, self.cells)
     
     def tableview_title_for_header(self, tableview, section):
         u"""Return a title for the given section.
@@ -557,44 +1081,303 @@ class FileDataSource(object):
         """
         pass
     
-    @ui.in_background # Necessary to avoid hangs with console module
     def tableview_did_select(self, tableview, section, row):
-        u"""Called when the user selects a row.
+        u"""Called when the user selects a row. The FileItem is looked up
+        here, as _item updates caches that are also used by the main
+        thread, and then opened in the background.
         """
         if not tableview.editing:
-            fi = self.lists[section][row]
-            if section == 0:
-                console.show_activity("Loading file list...")
-                self.app.push_view(self.app.make_file_list(fi))
-                console.hide_activity()
-            elif section == 1:
-                group = fi.constants.group
-                if fi.constants.ext in (u"htm", u"html"):
-                    webbrowser.open(u"file://" + fi.path)
-                    self.app.close()
-                elif group in ("code", "code_tags", "text"):
-                    open_path(fi.path)
-                    self.app.close()
-                elif group == "audio":
-                    spath = rel_to_app(fi.path.rsplit(u".", 1)[0])
-                    sound.load_effect(spath)
-                    sound.play_effect(spath)
-                elif group == "image":
-                    console.show_image(fi.path)
-                else:
-                    self.app.close()
-                    time.sleep(ANIM_DELAY)
-                    console.quicklook(fi.path)
+            self.open_item(self._item(section, row))
+    
+    @ui.in_background # Necessary to avoid hangs with console module
+    def open_item(self, fi):
+        u"""Open a FileItem: folders in a new file list, files in the
+        editor or a viewer, depending on their type.
+        """
+        if fi.isdir():
+            console.show_activity("Loading file list...")
+            self.app.push_view(self.app.make_file_list(fi))
+            console.hide_activity()
+        else:
+            group = fi.constants.group
+            if fi.constants.ext in (u"htm", u"html"):
+                import webbrowser
+                webbrowser.open(u"file://" + fi.path)
+                self.app.close()
+            elif group in ("code", "code_tags", "text"):
+                open_path(fi.path)
+                self.app.close()
+            elif group == "audio":
+                import sound
+                spath = rel_to_app(fi.path.rsplit(u".", 1)[0])
+                sound.load_effect(spath)
+                sound.play_effect(spath)
+            elif group == "image":
+                console.show_image(fi.path)
+            else:
+                self.app.close()
+                time.sleep(ANIM_DELAY)
+                console.quicklook(fi.path)
     
     def tableview_accessory_button_tapped(self, tableview, section, row):
         u"""Called when the user taps a row's accessory (i) button.
         """
         if not tableview.editing:
-            self.app.push_view(self.app.make_stat_view(self.lists[section][row]))
+            self.app.push_view(self.app.make_stat_view(self._item(section, row)))
+    
+    def show_search(self, sender):
+        u"""Show a popover to search this folder and its subfolders. The
+        results are shown in a new file list.
+        """
+        root = ui.View(name=u"Search")
+        root.width, root.height = 300, 90
+        
+        pattern = ui.TextField()
+        pattern.autocapitalization_type = ui.AUTOCAPITALIZE_NONE
+        pattern.autocorrection_type = False
+        pattern.clear_button_mode = "while_editing"
+        pattern.spellchecking_type = False
+        pattern.placeholder = u"Name, regex or kind"
+        root.add_subview(pattern)
+        pattern.flex = "W"
+        pattern.x, pattern.y = 10, 10
+        pattern.width, pattern.height = root.width - 20, 30
+        
+        kinds = ui.SegmentedControl()
+        # The last segment searches file contents instead of names
+        kinds.segments = list(search.PATTERN_KINDS.values()) + [u"Contents"]
+        kinds.selected_index = 0
+        root.add_subview(kinds)
+        kinds.flex = "W"
+        kinds.x, kinds.y = 10, pattern.y + pattern.height + 10
+        kinds.width, kinds.height = root.width - 20, 30
+        
+        def _action(sender):
+            if kinds.selected_index == len(search.PATTERN_KINDS):
+                root.close()
+                self.app.push_view(self.app.make_grep_list(self.fi, pattern.text))
+                return
+            
+            kind = list(search.PATTERN_KINDS)[kinds.selected_index]
+            try:
+                matcher = search.make_matcher(pattern.text, kind)
+            except (ValueError, re.error) as err:
+                console.hud_alert(u"Invalid {}".format(search.PATTERN_KINDS[kind]), "error")
+                return
+            root.close()
+            self.app.push_view(self.app.make_search_list(self.fi, pattern.text, matcher))
+        
+        pattern.action = _action
+        root.present("popover")
+        pattern.begin_editing()
     
     def create_new(self, sender):
         pass
 
+class SearchDataSource(FileDataSource):
+    u"""FileDataSource that shows the entries below a folder that match
+    a search.Search matcher, instead of the folder's contents. Results
+    are added while the search is running, and sorted once it is done.
+    """
+    
+    def __init__(self, app, fi, tableview, matcher, max_depth=None):
+        # Init
+        self.matcher = matcher
+        self.max_depth = max_depth
+        # The running or last search.Search
+        self.search = None
+        FileDataSource.__init__(self, app, fi, tableview)
+    
+    def reload(self):
+        u"""Start searching again.
+        """
+        self.stop_stream()
+        self.listing = None
+        self._wrapped.clear()
+        self._set_lists([], [])
+        
+        stream_id = self._stream_id
+        self.search = search.Search(
+            self.fi.path,
+            self.matcher,
+            lambda entries: ui.delay(functools.partial(self._add_results, stream_id, entries), 0),
+            lambda srch: ui.delay(functools.partial(self._search_done, stream_id), 0),
+            max_depth=self.max_depth,
+        )
+        self.search.start()
+    
+    def _add_results(self, stream_id, entries):
+        # Add a batch of results to the lists.
+        if stream_id != self._stream_id:
+            return
+        
+        rows = []
+        sections = (self.folders, self.files)
+        for entry in entries:
+            fi = FileItem.from_entry(entry)
+            rows.append((fi.basetype, len(sections[fi.basetype])))
+            sections[fi.basetype].append(fi)
+        
+        if self.filter_query:
+            self._lists_changed()
+            if self.tableview is not None:
+                self.tableview.reload_data()
+        elif self.tableview is not None:
+            self.tableview.insert_rows(rows)
+    
+    def _search_done(self, stream_id):
+        # Called once the search is complete.
+        if stream_id != self._stream_id:
+            return
+        
+        self._sort_lists()
+        if self.tableview is not None:
+            self.tableview.reload_data()
+    
+    def stop_stream(self):
+        u"""Cancel the running search. The results found so far remain
+        in the lists.
+        """
+        FileDataSource.stop_stream(self)
+        if self.search is not None:
+            self.search.cancel()
+    
+    def refresh(self):
+        u"""Search again, see reload.
+        """
+        self.reload()
+        if self.tableview is not None:
+            self.tableview.reload_data()
+
+class GrepDataSource(object):
+    u"""ui.TableView data source that shows the lines in the text files
+    below a folder that contain a string, as they are found.
+    """
+    
+    def __init__(self, app, fi, tableview, text):
+        # Init
+        self.app = app
+        self.fi = fi
+        self.tableview = tableview
+        self.text = text
+        self.cells = CellPool()
+        # The running or last grep.ContentSearch
+        self.search = None
+        # Incremented to ignore results of old searches
+        self._search_id = 0
+        self.reload()
+    
+    def reload(self):
+        u"""Start searching again.
+        """
+        self.stop()
+        self.matches = []
+        
+        search_id = self._search_id
+        self.search = grep.ContentSearch(
+            self.fi.path,
+            grep.compile_pattern(self.text),
+            lambda matches: ui.delay(functools.partial(self._add_matches, search_id, matches), 0),
+            lambda srch: ui.delay(functools.partial(self._search_done, search_id), 0),
+        )
+        self.search.start()
+    
+    def refresh(self):
+        u"""Search again and reload the table view.
+        """
+        self.reload()
+        if self.tableview is not None:
+            self.tableview.reload_data()
+    
+    def stop(self):
+        u"""Cancel the running search. The matches found so far remain
+        in the list.
+        """
+        self._search_id += 1
+        if self.search is not None:
+            self.search.cancel()
+    
+    def _add_matches(self, search_id, matches):
+        # Add the matches from a single file to the list.
+        if search_id != self._search_id:
+            return
+        
+        rows = list(range(len(self.matches), len(self.matches) + len(matches)))
+        self.matches.extend(matches)
+        if self.tableview is not None:
+            self.tableview.insert_rows(rows)
+    
+    def _search_done(self, search_id):
+        # Called once the search is complete.
+        if search_id != self._search_id:
+            return
+        
+        console.hud_alert(u"{} lines in {} of {} files".format(
+            len(self.matches), self.search.matched, self.search.files,
+        ))
+    
+    def tableview_number_of_sections(self, tableview):
+        u"""Return the number of sections.
+        """
+        return 1
+    
+    def tableview_number_of_rows(self, tableview, section):
+        u"""Return the number of rows in the given section.
+        """
+        return len(self.matches)
+    
+    def tableview_cell_for_row(self, tableview, section, row):
+        u"""Create and return a cell for the given section/row.
+        """
+        match = self.matches[row]
+        return self.cells.cell(CellModel(
+            "subtitle",
+            match.text,
+            u"{}:{}".format(os.path.relpath(match.path, self.fi.path), match.lineno),
+            named_image(filetypes.classify(os.path.basename(match.path), False)[3]),
+            "detail_button",
+        ))
+    
+    def tableview_title_for_header(self, tableview, section):
+        u"""Return a title for the given section.
+        """
+        pass
+    
+    def tableview_can_delete(self, tableview, section, row):
+        u"""Whether the user should be able to delete the given row.
+        """
+        return False
+    
+    def tableview_can_move(self, tableview, section, row):
+        u"""Whether a reordering control should be shown for the given
+        row (in editing mode).
+        """
+        return False
+    
+    def tableview_delete(self, tableview, section, row):
+        u"""Called when the user confirms deletion of the given row.
+        """
+        pass
+    
+    def tableview_move_row(self, tableview, from_section, from_row, to_section, to_row):
+        u"""Called when the user moves a row with the reordering
+        control (in editing mode).
+        """
+        pass
+    
+    def tableview_did_select(self, tableview, section, row):
+        u"""Called when the user selects a row.
+        """
+        if not tableview.editing:
+            open_path(self.matches[row].path)
+            self.app.close()
+    
+    def tableview_accessory_button_tapped(self, tableview, section, row):
+        u"""Called when the user taps a row's accessory (i) button.
+        """
+        if not tableview.editing:
+            self.app.push_view(self.app.make_stat_view(FileItem(self.matches[row].path, lazy=True)))
+
 class StatDataSource(object):
     u"""ui.TableView data source that shows various file metadata and statistics.
     """
@@ -604,6 +1387,9 @@ class StatDataSource(object):
         self.app = app
         self.fi = fi
         self.tableview = tableview
+        self.cells = CellPool()
+        # The running du.DirSize, if this is a folder
+        self.sizes = None
         self.reload()
         self.lists = [
             ("Actions", self.actions),
@@ -611,27 +1397,43 @@ class StatDataSource(object):
             ("Flags", self.flags)
         ]
     
+    def stop_sizes(self):
+        u"""Stop calculating the total size of a folder.
+        """
+        if self.sizes is not None:
+            self.sizes.cancel()
+            self.sizes = None
+    
     def reload(self):
-        u"""Reload metadata and actions.
+        u"""Reload metadata and actions. For folders, the total size of
+        their contents is calculated in the background.
         """
         
         self.actions = []
+        self.stop_sizes()
         
         if self.fi.stat is not None:
             stres = self.fi.stat
             flint = stres.st_mode
+            user = get_user(stres.st_uid)
+            group = get_group(stres.st_gid)
+            owner = str(stres.st_uid) if user is None else "{udesc} ({uid}={uname})".format(
+                uid=stres.st_uid,
+                uname=user[0],
+                udesc=user[1],
+            )
+            owner_group = str(stres.st_gid) if group is None else "{gid}={gname}".format(
+                gid=stres.st_gid,
+                gname=group,
+            )
             
             self.stats = [
                 ("stat.size", "Size", format_size(stres.st_size), "ionicons-code-working-32"),
                 ("stat.ctime", "Created", format_utc(stres.st_ctime), "ionicons-document-32"),
                 ("stat.atime", "Opened", format_utc(stres.st_atime), "ionicons-folder-32"),
                 ("stat.mtime", "Modified", format_utc(stres.st_mtime), "ionicons-ios7-compose-32"),
-                ("stat.uid", "Owner", "{udesc} ({uid}={uname})".format(
-                    uid=stres.st_uid,
-                    uname=pwd.getpwuid(stres.st_uid)[0],
-                    udesc=pwd.getpwuid(stres.st_uid)[4],
-                ), "ionicons-ios7-person-32"),
-                ("stat.gid", "Owner Group", str(stres.st_gid), "ionicons-ios7-people-32"),
+                ("stat.uid", "Owner", owner, "ionicons-ios7-person-32"),
+                ("stat.gid", "Owner Group", owner_group, "ionicons-ios7-people-32"),
                 ("stat.flags", "Flags", str(bin(stres.st_mode)), "ionicons-ios7-flag-32"),
             ]            
             self.flags = [
@@ -668,6 +1470,15 @@ class StatDataSource(object):
             self.actions += [
                 # None yet
             ]
+            if self.fi.stat is not None:
+                total = size_cache.total(self.fi.path)
+                self._set_size(u"Calculating..." if total is None else self._format_total(total))
+                sizes = self.sizes = du.DirSize(
+                    self.fi.path, size_cache,
+                    lambda dirsize: ui.delay(functools.partial(self._show_size, dirsize), 0),
+                    lambda dirsize: ui.delay(functools.partial(self._show_size, dirsize), 0),
+                )
+                sizes.start()
         elif self.fi.isfile():
             # Actions for files
             self.actions += [
@@ -690,6 +1501,29 @@ class StatDataSource(object):
                     ("sound.play_sound", "Play Sound", "sound", "ionicons-ios7-play-32"),
                 ]
     
+    @staticmethod
+    def _format_total(total):
+        # Format a du.DirTotal for the size row.
+        return u"{} ({} files, {} folders)".format(format_size(total.size, False), total.files, total.dirs)
+    
+    def _set_size(self, text):
+        # Replace the detail text of the size row.
+        for i, (key, name, detail, icon) in enumerate(self.stats):
+            if key == "stat.size":
+                self.stats[i] = (key, name, text, icon)
+    
+    def _show_size(self, dirsize):
+        # Show the current or final total size of a folder.
+        if dirsize is not self.sizes or dirsize.cancelled:
+            return
+        
+        if dirsize.finished:
+            self._set_size(u"Unknown" if dirsize.result is None else self._format_total(dirsize.result))
+        else:
+            self._set_size(u"{} so far ({} files)...".format(format_size(dirsize.size, False), dirsize.files))
+        if self.tableview is not None:
+            self.tableview.reload_data()
+    
     def tableview_number_of_sections(self, tableview):
         u"""Return the number of sections.
         """
@@ -703,14 +1537,12 @@ class StatDataSource(object):
     def tableview_cell_for_row(self, tableview, section, row):
         u"""Create and return a cell for the given section/row.
         """
+        key, text, detail, icon = self.lists[section][1][row]
         if section == 0:
-            cell = ui.TableViewCell("subtitle")
-            cell.image_view.image = ui.Image.named(self.lists[section][1][row][3])
+            model = CellModel("subtitle", text, detail, named_image(icon), "none")
         else:
-            cell = ui.TableViewCell("value2")
-        cell.text_label.text = self.lists[section][1][row][1]
-        cell.detail_text_label.text = self.lists[section][1][row][2]
-        return cell
+            model = CellModel("value2", text, detail, None, "none")
+        return self.cells.cell(model, key)
     
     def tableview_title_for_header(self, tableview, section):
         u"""Return a title for the given section.
@@ -739,11 +1571,17 @@ class StatDataSource(object):
         """
         pass
     
-    @ui.in_background # Necessary to avoid hangs with console module
     def tableview_did_select(self, tableview, section, row):
-        u"""Called when the user selects a row.
+        u"""Called when the user selects a row. The action is looked up
+        here, as reload replaces the lists on the main thread, and then
+        run in the background.
+        """
+        self.run_action(self.lists[section][1][row][0])
+    
+    @ui.in_background # Necessary to avoid hangs with console module
+    def run_action(self, key):
+        u"""Run the action with the given key on self.fi.
         """
-        key = self.lists[section][1][row][0]
         if key == "ios.quick_look":
             # Preview - Quick Look
             self.app.close()
@@ -759,6 +1597,7 @@ class StatDataSource(object):
             if not os.path.exists(destdir):
                 os.mkdir(destdir)
             destfile = full_path(os.path.join(destdir, self.fi.basename().lstrip(u".")))
+            import shutil
             shutil.copy(self.fi.path, destfile)
             editor.reload_files()
             open_path(destfile)
@@ -769,6 +1608,7 @@ class StatDataSource(object):
             if not os.path.exists(destdir):
                 os.mkdir(destdir)
             destfile = full_path(os.path.join(destdir, self.fi.basename().lstrip(u".") + u".txt"))
+            import shutil
             shutil.copy(self.fi.path, destfile)
             editor.reload_files()
             open_path(destfile)
@@ -778,11 +1618,13 @@ class StatDataSource(object):
             console.show_image(self.fi.path)
         elif key == "sound.play_sound":
             # Play Sound - sound
+            import sound
             spath = rel_to_app(self.fi.path.rsplit(u".", 1)[0])
             sound.load_effect(spath)
             sound.play_effect(spath)
         elif key == "webbrowser.open":
             # Open Website - webbrowser
+            import webbrowser
             webbrowser.open(u"file://" + self.fi.path)
             self.app.close()
         elif key == "ios.open_in":
@@ -829,9 +1671,95 @@ class FilenavApp(object):
         self.root = None
     
     def close(self):
-        u"""Close the app's root view.
+        u"""Close the app's root view, stop watching for changes and
+        close the file name index.
         """
         self.root.close()
+        self.stop_watcher()
+        self.stop_index_updates()
+        if getattr(self, "_index", None) is not None:
+            self._index.close()
+            self._index = None
+    
+    def stop_index_updates(self):
+        u"""Stop the running file name index updates started with
+        update_index and wait for them to end. They end after the
+        folder they are working on, so this doesn't take long.
+        """
+        stop = getattr(self, "_index_stop", None)
+        if stop is None:
+            return
+        stop.set()
+        for thread in self._index_threads:
+            thread.join()
+        self._index_stop = None
+        self._index_threads = []
+    
+    def get_index(self):
+        u"""Return the index.FileIndex of this app, opening it on first
+        use. Its roots are the folders in the last favorites list
+        created with make_favs_list, or the ones used last time if
+        there is none.
+        """
+        if getattr(self, "_index", None) is None:
+            from filenav import index
+            favorites = getattr(self, "favorites", None)
+            self._index = index.FileIndex(
+                INDEX_PATH,
+                index.load_roots(favorites) if favorites else None,
+            )
+        return self._index
+    
+    def update_index(self, callback=None):
+        u"""Update the file name index in a background thread. Once
+        done, callback(stats) is called on the main thread with an
+        index.UpdateStats instance, unless the update was stopped with
+        stop_index_updates.
+        """
+        idx = self.get_index()
+        if getattr(self, "_index_stop", None) is None:
+            # Event shared by all running updates, see stop_index_updates
+            self._index_stop = threading.Event()
+            self._index_threads = []
+        stop = self._index_stop
+        
+        def _update():
+            stats = idx.update(stop)
+            if callback is not None and not stop.is_set():
+                ui.delay(functools.partial(callback, stats), 0)
+        
+        thread = threading.Thread(target=_update, name=u"filenav-index")
+        thread.daemon = True
+        self._index_threads = [t for t in self._index_threads if t.is_alive()]
+        self._index_threads.append(thread)
+        thread.start()
+    
+    def query_index(self, text, mode="prefix", group=None, limit=1000):
+        u"""Search the file name index, see index.FileIndex.query for
+        the arguments. Returns a list of lazy FileItems. The index is
+        only as recent as its last update, so some results may not
+        exist anymore.
+        """
+        return [
+            FileItem(entry.path, lazy=True)
+            for entry in self.get_index().query(text, mode, group, limit)
+        ]
+    
+    def get_watcher(self):
+        u"""Return the watcher.Watcher shared by all file lists of this
+        app, creating it on first use.
+        """
+        if getattr(self, "_watcher", None) is None:
+            from filenav import watcher
+            self._watcher = watcher.Watcher()
+        return self._watcher
+    
+    def stop_watcher(self):
+        u"""Stop the app's watcher, if it is running.
+        """
+        if getattr(self, "_watcher", None) is not None:
+            self._watcher.stop()
+            self._watcher = None
     
     def push_view(self, view):
         u"""Push a view onto the navigation stack.
@@ -839,12 +1767,27 @@ class FilenavApp(object):
         raise NotImplementedError
     
     def pop_view(self):
-        u"""Pop the top view from the navigation stack.
+        u"""Pop the top view from the navigation stack. Implementations
+        should pass the popped view to release_view.
         """
         raise NotImplementedError
     
+    def release_view(self, view):
+        u"""Stop the background work of a view that is no longer shown:
+        streaming listings, calculating folder sizes and watching the
+        folder of file lists.
+        """
+        ds = getattr(view, "data_source", None)
+        if isinstance(ds, FileDataSource):
+            ds.stop_stream()
+            if getattr(self, "_watcher", None) is not None:
+                self._watcher.unwatch(ds.fi.path, ds.filesystem_changed)
+        elif isinstance(ds, StatDataSource):
+            ds.stop_sizes()
+    
     def make_favs_list(self, src):
         # Create a ui.TableView containing a favorites list loaded from src
+        self.favorites = src
         lst = ui.TableView(flex="WH")
         # Allow single selection only when not editing
         lst.allows_selection = True
@@ -874,6 +1817,8 @@ class FilenavApp(object):
     
     def make_file_list(self, fi):
         # Create a ui.TableView containing a directory listing of path
+        # Reuse the FileItem from an earlier visit, if still valid
+        fi = item_cache.get(fi)
         lst = ui.TableView(flex="WH")
         # Allow single selection only when not editing
         lst.allows_selection = True
@@ -881,10 +1826,16 @@ class FilenavApp(object):
         lst.allows_selection_during_editing = False
         lst.allows_multiple_selection_during_editing = False
         lst.background_color = 1.0
-        lst.data_source = lst.delegate = FileDataSource(self, fi, lst)
+        lst.data_source = lst.delegate = FileDataSource(self, fi, lst, stream=True)
         lst.name = u"/" if fi.path == u"/" else fi.basename()
         lst.width = 300
         
+        try:
+            self.get_watcher().watch(fi.path, lst.delegate.filesystem_changed)
+        except OSError as err:
+            # Not watchable, can still be refreshed manually
+            pass
+        
         lst.left_button_items = ()
         lst.delegate.other_left_button_items = (
             ui.ButtonItem(
@@ -894,6 +1845,14 @@ class FilenavApp(object):
         )
         lst.right_button_items = (
             ui.ButtonItem(title=u"Edit", action=toggle_edit_proxy(lst)),
+            ui.ButtonItem(
+                image=ui.Image.named(u"ionicons-ios7-refresh-empty-32"),
+                action=(lambda sender: lst.delegate.refresh()),
+            ),
+            ui.ButtonItem(title=u"Sort", action=lst.delegate.next_sort_order),
+            ui.ButtonItem(title=u"Sizes", action=lst.delegate.calculate_sizes),
+            ui.ButtonItem(title=u"Filter", action=lst.delegate.show_filter),
+            ui.ButtonItem(title=u"Search", action=lst.delegate.show_search),
         )
         lst.delegate.other_right_button_items = (
             ui.ButtonItem(title=u"Done", action=toggle_edit_proxy(lst)),
@@ -901,6 +1860,54 @@ class FilenavApp(object):
         
         return lst
     
+    def make_search_list(self, fi, pattern, matcher):
+        # Create a ui.TableView containing the search results for
+        # matcher below fi, titled with pattern
+        lst = ui.TableView(flex="WH")
+        # Allow single selection only when not editing
+        lst.allows_selection = True
+        lst.allows_multiple_selection = False
+        lst.allows_selection_during_editing = False
+        lst.allows_multiple_selection_during_editing = False
+        lst.background_color = 1.0
+        lst.data_source = lst.delegate = SearchDataSource(self, fi, lst, matcher)
+        lst.name = u"Search: {}".format(pattern)
+        lst.width = 300
+        
+        lst.right_button_items = (
+            ui.ButtonItem(
+                image=ui.Image.named(u"ionicons-ios7-refresh-empty-32"),
+                action=(lambda sender: lst.delegate.refresh()),
+            ),
+            ui.ButtonItem(title=u"Sort", action=lst.delegate.next_sort_order),
+            ui.ButtonItem(title=u"Filter", action=lst.delegate.show_filter),
+        )
+        
+        return lst
+    
+    def make_grep_list(self, fi, text):
+        # Create a ui.TableView containing the lines containing text in
+        # the text files below fi
+        lst = ui.TableView(flex="WH")
+        # Allow single selection only when not editing
+        lst.allows_selection = True
+        lst.allows_multiple_selection = False
+        lst.allows_selection_during_editing = False
+        lst.allows_multiple_selection_during_editing = False
+        lst.background_color = 1.0
+        lst.data_source = lst.delegate = GrepDataSource(self, fi, lst, text)
+        lst.name = u"Contents: {}".format(text)
+        lst.width = 300
+        
+        lst.right_button_items = (
+            ui.ButtonItem(
+                image=ui.Image.named(u"ionicons-ios7-refresh-empty-32"),
+                action=(lambda sender: lst.delegate.refresh()),
+            ),
+        )
+        
+        return lst
+    
     def make_stat_view(self, fi):
         # Create a ui.TableView containing stat data on path
         lst = ui.TableView(flex="WH")
@@ -0,0 +1,1201 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+This module contains the headless core of filenav: paths and constants,
+formatting helpers, file metadata (FileItem and get_fileinfo), directory
+scanning, compact listings, sorting and filtering. It does not depend on
+any Pythonista-specific modules, the UI is built on top of it in
+`common.py`.
+
+To run filenav, use either `slim.py` (for iPhone/iPod touch/popover use)
+or `full.py` (for panel view use on iPad).
+"""
+
+from __future__ import division, print_function
+
+import array       # For compact listing columns
+import collections # For namedtuple and OrderedDict
+import datetime    # For timestamp formatting
+import errno       # For OSError codes
+import fnmatch     # For glob filters
+import grp         # For group name resolution
+import os          # For various path operations
+import pwd         # For user information and UID resolution
+import re          # For natural sort keys
+import stat        # To understand stat results and flags
+import sys         # To find the app bundle
+import threading   # To guard shared caches
+
+from filenav import du        # Folder sizes
+from filenav import filetypes # File type names and mappings
+from filenav import scan      # Directory reading
+
+# Public names, which common re-exports with a star import.
+__all__ = [
+    # Constants and Simple Utility Functions
+    "full_path", "SIZE_SUFFIXES", "HOME_DIR", "DOCS_DIR", "TEMP_DIR",
+    "INDEX_PATH", "RESOURCE_DIR", "APP_DIR", "APP_GROUP_DIR", "has_flags",
+    "format_size", "format_utc", "get_user", "get_group", "format_owner",
+    "rel_to_docs", "rel_to_app", "size_cache",
+    # File Metadata Classes
+    "FileType", "get_filetype", "FileInfo", "get_fileinfo", "CellModel",
+    "FileItem",
+    # Directory Scanning
+    "iter_chunks", "scan_dir",
+    # Compact Listings
+    "COMPACT_LISTING_THRESHOLD", "STREAM_CHUNK_SIZE", "LISTING_FILE",
+    "LISTING_LINK", "LISTING_STAT", "FileListing", "ListingSection",
+    "FileRow",
+    # FileItem Cache
+    "ITEM_CACHE_SIZE", "ITEM_CACHE_BYTES", "ITEM_COST", "LISTING_ROW_COST",
+    "FileItemCache", "item_cache",
+    # Sorting and Filtering
+    "SORT_ORDERS", "natural_key", "primary_sort_key", "make_sort_key",
+    "FILTER_MODES", "NameFilter",
+]
+
+def full_path(path):
+    u"""Return absolute path with expanded ~s, envvars and symlinks.
+    Input path is assumed to be relative to cwd.
+    """
+    return os.path.realpath(os.path.expandvars(os.path.expanduser(path)))
+
+# Constants
+########################################################################.......
+
+u"""Tuple of data size suffixes, ranging from bytes to Yottabytes. These
+use IEEE-style naming (e. g. KiB instead of KB) to differentiate real
+sizes (multiples of 1024) from approximates ones (multiples of 1000).
+"""
+SIZE_SUFFIXES = u"bytes KiB MiB GiB TiB PiB EiB ZiB YiB".split()
+
+HOME_DIR = full_path(u"~")
+DOCS_DIR = os.path.join(HOME_DIR, u"Documents")
+# Folder for temporary files. It is not created on import, everything
+# that writes to it creates it when needed.
+TEMP_DIR = os.path.join(DOCS_DIR, u"temp")
+# Location of the file name index database, see index.FileIndex.
+INDEX_PATH = os.path.join(TEMP_DIR, u".filenav-index.sqlite3")
+RESOURCE_DIR = full_path(os.path.join(os.path.dirname(os.__file__), u".."))
+APP_DIR = full_path(os.path.dirname(sys.executable))
+
+APP_GROUP_DIR = (
+    os.path.dirname(HOME_DIR)
+    if os.path.basename(HOME_DIR) == u"Pythonista3"
+    else HOME_DIR
+)
+
+if not "RESOURCEDIR" in os.environ:
+    os.environ["RESOURCEDIR"] = RESOURCE_DIR
+
+if not "APPDIR" in os.environ:
+    os.environ["APPDIR"] = APP_DIR
+
+if not "APPGROUPDIR" in os.environ:
+    os.environ["APPGROUPDIR"] = APP_GROUP_DIR
+
+# Simple Utility Functions
+########################################################################.......
+
+def has_flags(num, flags):
+    u"""Check if all flags are set in num. This only checks "on" bits,
+    any bits that are "off" in flags may have any state in num.
+    """
+    return num & flags == flags
+
+def format_size(size, longf=True):
+    u"""Return the given data size shortened to the smallest unit where
+    size < 1024. If longf is true, the original size in bytes is also
+    appended in parentheses.
+    """
+    if size < 1024:
+        return u"{} bytes".format(size)
+    else:
+        size, bsize = float(size), int(size)
+        for suffix in SIZE_SUFFIXES[1:]:
+            size /= 1024.0
+            if size < 1024.0:
+                break
+        return (
+            u"{size:02.2f} {suffix} ({bsize} bytes)"
+            if longf else
+            u"{size:02.2f} {suffix}"
+        ).format(size=size, suffix=suffix, bsize=bsize)
+
+def format_utc(timestamp):
+    u"""Convert a timestamp to a human-readable UTC date and time.
+    """
+    return u"{} UTC".format(datetime.datetime.fromtimestamp(timestamp))
+
+# Caches for get_user and get_group, map IDs to results. Unknown IDs map
+# to None, so failed lookups aren't repeated either.
+_users = {}
+_groups = {}
+
+def get_user(uid):
+    u"""Return (name, description) of the user with the given UID, or
+    None if there is none. Results are cached, as lookups may be slow.
+    """
+    try:
+        return _users[uid]
+    except KeyError:
+        pass
+    
+    try:
+        pw = pwd.getpwuid(uid)
+    except KeyError:
+        user = None
+    else:
+        user = (pw.pw_name, pw.pw_gecos)
+    _users[uid] = user
+    return user
+
+def get_group(gid):
+    u"""Return the name of the group with the given GID, or None if
+    there is none. Results are cached like with get_user.
+    """
+    try:
+        return _groups[gid]
+    except KeyError:
+        pass
+    
+    try:
+        group = grp.getgrgid(gid).gr_name
+    except KeyError:
+        group = None
+    _groups[gid] = group
+    return group
+
+def format_owner(st):
+    u"""Return the owner and group of a stat result as "user:group",
+    using IDs where names are unknown. This is cheap enough to be
+    called for every row of a list.
+    """
+    user = get_user(st.st_uid)
+    group = get_group(st.st_gid)
+    return u"{}:{}".format(
+        st.st_uid if user is None else user[0],
+        st.st_gid if group is None else group,
+    )
+
+def rel_to_docs(path):
+    u"""Return path relative to script library (~/Documents).
+    """
+    return os.path.relpath(full_path(path), os.path.expanduser(u"~/Documents"))
+
+def rel_to_app(path):
+    u"""Return path relative to app bundle (~/Pythonista.app).
+    """
+    return os.path.relpath(full_path(path), os.path.expanduser(u"~/Pythonista.app"))
+
+# Shared cache of folder sizes, see du.SizeCache. Folder rows show the
+# last known total size from here.
+size_cache = du.SizeCache()
+
+# File Metadata Classes
+########################################################################.......
+
+# namedtuple for the metadata of a file type. Instances are shared by all
+# paths with the same last known extension and base type (see get_filetype).
+FileType = collections.namedtuple("FileType", "ext group desc icon")
+
+# Maps (ext, isdir) to FileType instances, see filetypes.CLASSES.
+_filetypes = {key: FileType(*cls) for key, cls in filetypes.CLASSES.items()}
+
+def get_filetype(ext, isdir):
+    u"""Return the FileType for the given last known file extension
+    (None if there is none) and base type. All paths of the same type
+    share one FileType instance.
+    """
+    return _filetypes[ext, bool(isdir)]
+
+class FileInfo(collections.namedtuple("FileInfo", "dir name type")):
+    u"""namedtuple for quick access to file metadata that is
+    (practically) guaranteed to remain constant for a specific path.
+    Only dir and name are stored per path, the type-dependent fields
+    are read from the shared FileType.
+    """
+    __slots__ = ()
+    
+    @property
+    def nameparts(self):
+        u"""The lowercased name split at extension separators.
+        """
+        return self.name.lower().split(os.extsep)
+    
+    @property
+    def ext(self):
+        u"""The last known file extension, or None.
+        """
+        return self.type.ext
+    
+    @property
+    def group(self):
+        u"""The file type group, see filetypes.TYPE_GROUPS.
+        """
+        return self.type.group
+    
+    @property
+    def desc(self):
+        u"""Human-readable description of the file type.
+        """
+        return self.type.desc
+    
+    @property
+    def icon(self):
+        u"""Name of the icon for the file type.
+        """
+        return self.type.icon
+
+def get_fileinfo(path, isdir=None):
+    u"""Construct a FileInfo instance for path and populate it with
+    appropriate metadata. If isdir is given, it is used instead of
+    checking os.path.isdir(path).
+    """
+    if isdir is None:
+        isdir = os.path.isdir(path)
+    
+    dir, name = os.path.split(path)
+    return FileInfo(dir, name, _filetypes[filetypes.find_ext(name), bool(isdir)])
+
+# namedtuple describing the contents of a table cell, so they can be
+# computed once and then applied to any cell. image is a ui.Image or the
+# name of one.
+CellModel = collections.namedtuple("CellModel", "style text detail image accessory")
+
+# Marker for FileItem attributes that have not been computed yet. None
+# can't be used for this, because it is a valid value for most of them.
+_UNSET = object()
+
+class FileItem(object):
+    u"""Class representing a path and associated properties.
+    All data that should remain constant for a specific path,
+    except the path itself, is stored in self.constants as an
+    instance of FileInfo.
+    
+    If a FileItem is created with lazy=True, the resolved path, stat
+    result, constants and directory contents are only computed when
+    they are first accessed, and then cached until the next reload.
+    """
+    def __new__(cls, path, lazy=False):
+        # Constructor
+        assert issubclass(cls, FileItem)
+        
+        if isinstance(path, FileItem):
+            # Allow efficient "conversion" of a FileItem to its own type
+            return path
+        elif isinstance(path, FileRow):
+            # Wrap a compact listing row
+            return cls.from_row(path)
+        else:
+            # Create a new FileItem from path
+            self = super(FileItem, cls).__new__(cls)
+            # Make the path absolute now, so later cwd changes don't matter
+            self._rawpath = os.path.abspath(os.path.expandvars(os.path.expanduser(path)))
+            self._path = _UNSET
+            self._entry = None
+            self.reload(lazy)
+            return self
+    
+    @classmethod
+    def from_entry(cls, entry):
+        u"""Create a new lazy FileItem from a DirEntry (as returned by
+        scandir). The file type is taken from the entry right away,
+        other data is only looked up once it is needed. The entry's
+        path is assumed to be in an already resolved directory, so
+        only symlinks need to be resolved again.
+        """
+        self = super(FileItem, cls).__new__(cls)
+        self._rawpath = entry.path
+        self._path = _UNSET if entry.is_symlink() else entry.path
+        self._clear()
+        self._entry = entry
+        self._basetype = 0 if entry.is_dir() else 1
+        return self
+    
+    @classmethod
+    def from_row(cls, row):
+        u"""Create a new lazy FileItem from a FileRow of a compact
+        listing. The file type is taken from the listing, other data is
+        looked up when needed, like with from_entry.
+        """
+        self = super(FileItem, cls).__new__(cls)
+        self._rawpath = row.path
+        self._path = _UNSET if row.islink() else row.path
+        self._clear()
+        self._basetype = 0 if row.isdir() else 1
+        self._row = row
+        return self
+    
+    def reload(self, lazy=False):
+        u"""Reload the FileItem's non-constant data by re-
+        examining the location referenced by self.path. If lazy is
+        true, the data is only discarded and will be looked up again
+        when it is next accessed.
+        """
+        self._clear()
+        
+        if not lazy:
+            # Access everything once to fill the caches
+            self.constants, self.contents
+    
+    def _clear(self):
+        # Discard all cached data except the path.
+        self._entry = None
+        self._stat = _UNSET
+        self._identity = _UNSET
+        self._basetype = _UNSET
+        self._constants = _UNSET
+        self._contents = _UNSET
+        self._icon = None
+        self._cell_model = None
+        self._sort_keys = _UNSET
+        self.icon_cached = False
+        # FileRow this was created from, whose size is stored in the
+        # listing and so survives this FileItem
+        self._row = None
+        # FileListing of a large directory, kept by FileDataSource
+        self.listing = None
+    
+    def load_contents(self):
+        u"""(Re-)list the names of the entries in this directory.
+        """
+        try:
+            self._contents = os.listdir(self.path)
+        except OSError as err:
+            self._contents = []
+    
+    def listitems(self):
+        u"""Return the directory's contents as a list of FileItems. The
+        directory is scanned if its contents are not known yet or are
+        only names. Returns None if this is not a directory.
+        """
+        if not self.isdir():
+            return None
+        
+        if not self.has_items():
+            self._contents = scan_dir(self.path)
+        
+        return self._contents
+    
+    def has_items(self):
+        u"""Whether the directory's contents are already known as a
+        list of FileItems.
+        """
+        return (
+            isinstance(self._contents, list)
+            and all(isinstance(name, FileItem) for name in self._contents)
+        )
+    
+    @property
+    def path(self):
+        u"""The absolute path with all symlinks resolved.
+        """
+        if self._path is _UNSET:
+            self._path = os.path.realpath(self._rawpath)
+        return self._path
+    
+    @property
+    def stat(self):
+        u"""The result of os.stat(self.path), or None if it failed.
+        """
+        if self._stat is _UNSET:
+            try:
+                if self._entry is not None:
+                    self._stat = self._entry.stat()
+                else:
+                    self._stat = os.stat(self.path)
+            except OSError as err:
+                self._stat = None
+            # The entry has served its purpose
+            self._entry = None
+        return self._stat
+    
+    @property
+    def basetype(self):
+        u"""0 if this is a directory, 1 otherwise.
+        """
+        if self._basetype is _UNSET:
+            st = self.stat
+            self._basetype = 0 if st is not None and stat.S_ISDIR(st.st_mode) else 1
+        return self._basetype
+    
+    @property
+    def constants(self):
+        u"""The FileInfo for this path.
+        """
+        if self._constants is _UNSET:
+            self._constants = get_fileinfo(self.path, self.isdir())
+        return self._constants
+    
+    @property
+    def contents(self):
+        u"""The directory's contents (either names or FileItems), or
+        None if this is not a directory.
+        """
+        if self._contents is _UNSET:
+            if self.isdir():
+                self.load_contents()
+            else:
+                self._contents = None
+        return self._contents
+    
+    @contents.setter
+    def contents(self, value):
+        self._contents = value
+    
+    @property
+    def icon(self):
+        u"""The icon shown for this path, either a ui.Image (e. g. a
+        thumbnail) or the name of one. By default, this is the name of
+        the icon for its file type.
+        """
+        return self.constants.icon if self._icon is None else self._icon
+    
+    @icon.setter
+    def icon(self, value):
+        self._icon = value
+        self._cell_model = None
+    
+    def __repr__(self):
+        # repr(self) and str(self)
+        return "{}.FileItem({})".format(type(self).__module__, self.path)
+    
+    @property
+    def identity(self):
+        u"""(st_dev, st_ino) of the cached stat result, which identifies
+        the file itself, or (None, path) if it could not be stat'ed.
+        FileItems are compared and hashed by identity, without touching
+        the filesystem once stat has been looked up. It only changes
+        when the FileItem is reloaded or revalidated.
+        """
+        if self._identity is _UNSET:
+            st = self.stat
+            self._identity = (None, self.path) if st is None else (st.st_dev, st.st_ino)
+        return self._identity
+    
+    def __eq__(self, other):
+        # self == other
+        return isinstance(other, FileItem) and self.identity == other.identity
+    
+    def __ne__(self, other):
+        # self != other
+        return not self == other
+    
+    def __hash__(self):
+        # hash(self)
+        return hash(self.identity)
+    
+    def revalidate(self):
+        u"""Stat the path again and return whether it still refers to
+        the same, unchanged file (same identity, size and mtime). If
+        not, the FileItem is reloaded lazily, so its identity and hash
+        change, which must not happen while it is in a set or dict.
+        """
+        try:
+            st = os.stat(self.path)
+        except OSError as err:
+            st = None
+        
+        old = self._stat
+        self._entry = None
+        if old is _UNSET:
+            self._stat = st
+            return True
+        
+        if old is None or st is None:
+            unchanged = old is st
+        else:
+            unchanged = (
+                (old.st_dev, old.st_ino, old.st_size, old.st_mtime)
+                == (st.st_dev, st.st_ino, st.st_size, st.st_mtime)
+            )
+        if unchanged:
+            self._stat = st
+            return True
+        
+        self.reload(lazy=True)
+        self._stat = st
+        return False
+    
+    def basename(self):
+        u"""Like os.path.basename(self.path).
+        """
+        return self.constants.name
+    
+    def entryname(self):
+        u"""The name of this item in its parent directory. Unlike
+        basename(), this is the symlink's name for symlinks.
+        """
+        return os.path.basename(self._rawpath)
+    
+    def same_entry(self, entry):
+        u"""Check whether entry, a DirEntry for the same name, still
+        refers to this item unchanged. If this item has been stat'ed,
+        inode, size and mtime are compared, otherwise only the type.
+        """
+        if self.isdir() != entry.is_dir():
+            return False
+        elif self._stat is _UNSET or self._stat is None:
+            return True
+        
+        try:
+            st = entry.stat()
+        except OSError as err:
+            return False
+        
+        return (
+            (st.st_ino, st.st_mtime, st.st_size)
+            == (self._stat.st_ino, self._stat.st_mtime, self._stat.st_size)
+        )
+    
+    def commonprefix(self, others):
+        u"""Like os.path.commonprefix([self.path] + others).
+        """
+        return os.path.commonprefix([self.path] + [
+            fi.path
+            if isinstance(fi, FileItem)
+            else fi
+            for fi in others
+        ])
+    
+    def dirname(self):
+        u"""Like os.path.dirname(self.path).
+        """
+        return self.constants.dir
+    
+    def isdir(self):
+        u"""Like os.path.isdir(self.path).
+        """
+        return self.basetype == 0
+    
+    def isfile(self):
+        u"""Like os.path.isfile(self.path).
+        """
+        return self.basetype == 1
+    
+    def join(self, *args):
+        u"""Like os.path.join(self.path, *args).
+        """
+        return os.path.join(self.path, *args)
+    
+    def listdir(self):
+        u"""Like os.listdir(self.path).
+        """
+        if self.isdir():
+            return self.contents
+        else:
+            err = OSError()
+            err.errno = errno.ENOTDIR
+            err.strerror = os.strerror(err.errno)
+            err.filename = self.path
+            raise err
+    
+    def relpath(self, start):
+        u"""Like os.path.relpath(self.path, start).
+        """
+        return os.path.relpath(
+            self.path,
+            (start.path if isinstance(start, FileItem) else start),
+        )
+    
+    def samefile(self, other):
+        u"""Like os.path.samefile(self.path, other). other may be
+        a FileItem instance or a string. This FileItem's cached stat
+        result is used, so only a string other needs to be stat'ed.
+        """
+        if isinstance(other, FileItem):
+            return self == other
+        else:
+            st = os.stat(other)
+            return self.identity == (st.st_dev, st.st_ino)
+    
+    def split(self):
+        u"""Like os.path.split(self.path).
+        """
+        return (self.constants.dir, self.constants.name)
+    
+    def sort_key(self, order):
+        u"""Return the key to sort this FileItem by for the given order,
+        one of SORT_ORDERS. Keys are cached until the FileItem is
+        reloaded, so sorting again doesn't need to stat or classify.
+        """
+        if self._sort_keys is _UNSET:
+            self._sort_keys = {}
+        try:
+            return self._sort_keys[order]
+        except KeyError:
+            pass
+        
+        if order == "name":
+            key = natural_key(self.basename())
+        elif order in ("size", "mtime"):
+            st = self.stat
+            key = make_sort_key(
+                order, self.sort_key("name"), self.basename(), self.isdir(),
+                -1 if st is None else st.st_size,
+                0.0 if st is None else st.st_mtime,
+            )
+        else:
+            key = make_sort_key(order, self.sort_key("name"), self.basename(), self.isdir())
+        
+        self._sort_keys[order] = key
+        return key
+    
+    def cell_model(self):
+        u"""Return the CellModel for this FileItem's table cell. It
+        includes the name, icon (or thumbnail if an image), type, size,
+        info button, and a disclosure arrow if a directory. Directories
+        show their total size from size_cache, if it is known. The model
+        is cached until the icon changes, reset_cell_model is called or
+        the FileItem is reloaded.
+        """
+        if self._cell_model is None:
+            detail = self.constants.desc
+            if self.isdir():
+                total = size_cache.total(self.path)
+                if total is not None:
+                    detail += " ({})".format(format_size(total.size, False))
+            elif self._stat is _UNSET and self._row is not None:
+                # Compact listing row, its size is only looked up once
+                size = self._row.size
+                if size is not None:
+                    detail += " ({})".format(format_size(size, False))
+            elif self.stat is not None: # If available, add size to subtitle
+                detail += " ({})".format(format_size(self.stat.st_size, False))
+            
+            self._cell_model = CellModel(
+                "subtitle",
+                self.basename(),
+                detail,
+                self.icon,
+                "detail_disclosure_button" if self.isdir() else "detail_button",
+            )
+        return self._cell_model
+    
+    def reset_cell_model(self):
+        u"""Make cell_model create a new CellModel next time, e. g.
+        because the total size of this directory is known now.
+        """
+        self._cell_model = None
+    
+    def set_thumbnail(self, thumb):
+        u"""Use thumb as the icon, if there is one. Returns whether it
+        was set.
+        """
+        if thumb:
+            self.icon = thumb
+            self.icon_cached = True
+        return bool(thumb)
+
+# Directory Scanning
+########################################################################.......
+
+def iter_chunks(iterable, size):
+    u"""Yield lists of up to size consecutive items from iterable.
+    """
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def scan_dir(path):
+    u"""Return a list of FileItems for the contents of the directory at
+    path, which should already be resolved (e. g. a FileItem's path).
+    Subdirectories are not listed. If the directory cannot be read, an
+    empty list is returned.
+    """
+    try:
+        return [FileItem.from_entry(entry) for entry in scan.iter_entries(path)]
+    except OSError as err:
+        return []
+
+# Compact Listings
+########################################################################.......
+
+# Directories with at least this many entries are shown using a compact
+# FileListing instead of a FileItem per entry.
+COMPACT_LISTING_THRESHOLD = 5000
+
+# Number of entries read at once when a listing is streamed. The first
+# chunk is shown right away, the others are added as they are read.
+STREAM_CHUNK_SIZE = 256
+
+# Bits used in FileListing.types.
+LISTING_FILE = 1 # Not a directory, like FileItem.basetype
+LISTING_LINK = 2 # The entry is a symlink
+LISTING_STAT = 4 # The entry's size and mtime have been looked up
+
+# array.array("q") is only supported on Python 3.3 and up.
+try:
+    array.array("q")
+except ValueError:
+    _INT64 = "l"
+else:
+    _INT64 = "q"
+
+class FileListing(object):
+    u"""Compact, columnar store for the contents of a single directory.
+    Names, type bits, sizes and mtimes are kept in parallel sequences
+    instead of one object per entry. Sizes and mtimes are only looked
+    up for entries that need them, a size of -1 means that it is not
+    known (yet). Individual entries can be accessed as FileRows.
+    """
+    
+    def __init__(self, dir):
+        # Init
+        self.dir = dir
+        self.names = []
+        self.types = array.array("b")
+        self.sizes = array.array(_INT64)
+        self.mtimes = array.array("d")
+        # Maps sort orders to lists of sort keys, see sort_keys
+        self._sort_keys = {}
+    
+    @classmethod
+    def scan(cls, path):
+        u"""Create a FileListing for the contents of the directory at
+        path, which should already be resolved. Only the type
+        information from the directory read is used. If the directory
+        cannot be read, the listing is empty.
+        """
+        self = cls(path)
+        try:
+            self.add_entries(scan.iter_entries(path))
+        except OSError as err:
+            pass
+        return self
+    
+    def add_entries(self, entries):
+        u"""Add the given DirEntry-like objects to the listing, using
+        only their type information. Returns a range of the new
+        entries' indices.
+        """
+        start = len(self)
+        for entry in entries:
+            self.append(
+                entry.name,
+                (0 if entry.is_dir() else LISTING_FILE)
+                | (LISTING_LINK if entry.is_symlink() else 0)
+            )
+        return range(start, len(self))
+    
+    def append(self, name, type, size=-1, mtime=0.0):
+        u"""Add an entry to the listing.
+        """
+        self.names.append(name)
+        self.types.append(type)
+        self.sizes.append(size)
+        self.mtimes.append(mtime)
+    
+    def __len__(self):
+        # len(self)
+        return len(self.names)
+    
+    def join(self, index):
+        u"""Return the path of the entry at index.
+        """
+        return os.path.join(self.dir, self.names[index])
+    
+    def load_stat(self, index):
+        u"""Look up the size and mtime of the entry at index, unless
+        that has been done already.
+        """
+        if not self.types[index] & LISTING_STAT:
+            try:
+                st = os.stat(self.join(index))
+            except OSError as err:
+                pass
+            else:
+                self.sizes[index] = st.st_size
+                self.mtimes[index] = st.st_mtime
+            self.types[index] |= LISTING_STAT
+    
+    def sort_keys(self, order):
+        u"""Return a list of the sort keys of all entries for the given
+        order, one of SORT_ORDERS. Unlike make_sort_key, the keys for
+        orders other than "name" don't include the name, ties are broken
+        by ListingSection.sort. The keys are computed once and cached,
+        entries added later get their keys on the next call.
+        """
+        keys = self._sort_keys.setdefault(order, [])
+        start = len(keys)
+        if start < len(self):
+            if order == "name":
+                keys.extend(natural_key(name) for name in self.names[start:])
+            elif order in ("size", "mtime"):
+                for index in range(start, len(self)):
+                    self.load_stat(index)
+                keys.extend((self.sizes if order == "size" else self.mtimes)[start:])
+            else:
+                names = self.names
+                types = self.types
+                keys.extend(
+                    primary_sort_key(order, names[index], not types[index] & LISTING_FILE)
+                    for index in range(start, len(self))
+                )
+        return keys
+    
+    def sections(self):
+        u"""Return a (folders, files) tuple of ListingSections.
+        """
+        folders = array.array("i")
+        files = array.array("i")
+        for index, type in enumerate(self.types):
+            (files if type & LISTING_FILE else folders).append(index)
+        return ListingSection(self, folders), ListingSection(self, files)
+    
+    def items(self):
+        u"""Return a list of lazy FileItems for all entries.
+        """
+        return [FileItem.from_row(FileRow(self, i)) for i in range(len(self))]
+
+class ListingSection(object):
+    u"""Sequence of FileRows for a subset of a FileListing's entries,
+    given as an array of indices. Rows are only created when accessed.
+    """
+    __slots__ = ("listing", "indices")
+    
+    def __init__(self, listing, indices):
+        # Init
+        self.listing = listing
+        self.indices = indices
+    
+    def __len__(self):
+        # len(self)
+        return len(self.indices)
+    
+    def __getitem__(self, i):
+        # self[i]
+        return FileRow(self.listing, self.indices[i])
+    
+    def sort(self, order, reverse=False):
+        u"""Sort the rows in place, using the listing's cached sort keys
+        for the given order. Rows are sorted by name first, and then by
+        the order's own keys if it isn't "name". Python's sort is
+        stable, so this gives the same result as sorting by
+        make_sort_key, but comparing plain keys is much faster than
+        comparing tuples.
+        """
+        indices = sorted(self.indices, key=self.listing.sort_keys("name").__getitem__, reverse=reverse)
+        if order != "name":
+            indices.sort(key=self.listing.sort_keys(order).__getitem__, reverse=reverse)
+        self.indices = array.array(self.indices.typecode, indices)
+
+class FileRow(object):
+    u"""Lightweight view of a single entry in a FileListing. It supports
+    the parts of the FileItem interface needed to lay out a list, and
+    can be wrapped in a full FileItem using FileItem(row).
+    """
+    __slots__ = ("listing", "index")
+    
+    def __init__(self, listing, index):
+        # Init
+        self.listing = listing
+        self.index = index
+    
+    def __repr__(self):
+        # repr(self) and str(self)
+        return "{}.FileRow({})".format(type(self).__module__, self.path)
+    
+    @property
+    def path(self):
+        u"""The entry's path. Symlinks are not resolved.
+        """
+        return self.listing.join(self.index)
+    
+    @property
+    def size(self):
+        u"""The entry's size in bytes, or None if it cannot be stat'ed.
+        """
+        self.listing.load_stat(self.index)
+        size = self.listing.sizes[self.index]
+        return None if size < 0 else size
+    
+    @property
+    def mtime(self):
+        u"""The entry's modification timestamp, or None if it cannot be
+        stat'ed.
+        """
+        return None if self.size is None else self.listing.mtimes[self.index]
+    
+    def basename(self):
+        u"""Like os.path.basename(self.path).
+        """
+        return self.listing.names[self.index]
+    
+    def isdir(self):
+        u"""Like os.path.isdir(self.path).
+        """
+        return not self.listing.types[self.index] & LISTING_FILE
+    
+    def isfile(self):
+        u"""Like os.path.isfile(self.path).
+        """
+        return not self.isdir()
+    
+    def islink(self):
+        u"""Like os.path.islink(self.path).
+        """
+        return bool(self.listing.types[self.index] & LISTING_LINK)
+
+# FileItem Cache
+########################################################################.......
+
+# Maximum number of directories kept by item_cache.
+ITEM_CACHE_SIZE = 256
+
+# Approximate memory budget of item_cache in bytes, and rough estimates
+# of the memory used by a FileItem and a compact listing row.
+ITEM_CACHE_BYTES = 32*1024*1024
+ITEM_COST = 1024
+LISTING_ROW_COST = 160
+
+class FileItemCache(object):
+    u"""LRU cache of directory FileItems, keyed by resolved path, so
+    that revisiting a directory reuses its FileItem along with its
+    listed contents (or compact listing) and their cached data.
+    
+    A cached FileItem is only reused while the directory's mtime is
+    unchanged, otherwise it is reloaded. A hit costs a single stat.
+    Files changed in place don't change the mtime, so their rows may
+    show outdated sizes until the file list is refreshed. The
+    least recently used directories are dropped once there are more
+    than max_items, or their estimated memory use exceeds max_bytes.
+    """
+    
+    def __init__(self, max_items=ITEM_CACHE_SIZE, max_bytes=ITEM_CACHE_BYTES):
+        # Init
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        # Numbers of lookups that found a valid FileItem or not, for
+        # statistics. Reloaded FileItems count as misses.
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Maps resolved paths to [FileItem, mtime], oldest first
+        self._items = collections.OrderedDict()
+        # Maps unresolved absolute paths to resolved ones
+        self._aliases = {}
+    
+    def __len__(self):
+        return len(self._items)
+    
+    @staticmethod
+    def cost(fi):
+        u"""Return a rough estimate of the memory used by fi and its
+        listed contents in bytes.
+        """
+        cost = ITEM_COST
+        if fi.listing is not None:
+            cost += len(fi.listing) * LISTING_ROW_COST
+        if isinstance(fi._contents, list):
+            cost += len(fi._contents) * ITEM_COST
+        return cost
+    
+    def get(self, path):
+        u"""Return the FileItem for path, which may be a path or a
+        FileItem. If there is a valid cached FileItem for the same
+        resolved path, it is returned, otherwise path is converted to a
+        lazy FileItem (if it isn't one already) and stored.
+        """
+        if isinstance(path, FileItem):
+            fi = path
+            key = fi.path
+        else:
+            fi = None
+            raw = os.path.abspath(os.path.expandvars(os.path.expanduser(path)))
+            key = self._aliases.get(raw) or os.path.realpath(raw)
+        
+        try:
+            st = os.stat(key)
+        except OSError as err:
+            st = None
+        
+        with self._lock:
+            cached = self._items.pop(key, None)
+            if cached is not None and st is not None and cached[1] == st.st_mtime:
+                self.hits += 1
+                self._items[key] = cached
+                return cached[0]
+            
+            self.misses += 1
+            if cached is not None:
+                # Keep the FileItem, but forget its outdated data
+                fi = cached[0]
+                fi.reload(lazy=True)
+            elif fi is None:
+                fi = FileItem(raw, lazy=True)
+                if raw != key:
+                    self._aliases[raw] = key
+            elif fi._stat not in (_UNSET, None) and st is not None and fi._stat.st_mtime != st.st_mtime:
+                # Contents that were listed before may be outdated too
+                fi.reload(lazy=True)
+            
+            if st is not None:
+                self._items[key] = [fi, st.st_mtime]
+                self._evict()
+        return fi
+    
+    def _evict(self):
+        # Drop the oldest FileItems until the cache is within its limits.
+        # The newest one is always kept.
+        total = sum(self.cost(fi) for fi, mtime in self._items.values())
+        while len(self._items) > 1 and (len(self._items) > self.max_items or total > self.max_bytes):
+            key, (fi, mtime) = self._items.popitem(last=False)
+            total -= self.cost(fi)
+            for raw in [raw for raw, target in self._aliases.items() if target == key]:
+                del self._aliases[raw]
+    
+    def clear(self):
+        u"""Remove all FileItems from the cache.
+        """
+        with self._lock:
+            self._items.clear()
+            self._aliases.clear()
+
+# Shared cache of the FileItems of visited directories.
+item_cache = FileItemCache()
+
+# Sorting
+########################################################################.......
+
+# Orders that file lists can be sorted by, mapped to their titles.
+SORT_ORDERS = collections.OrderedDict([
+    ("name", u"Name"),
+    ("size", u"Size"),
+    ("mtime", u"Date Modified"),
+    ("group", u"Kind"),
+    ("ext", u"Extension"),
+])
+
+# Splits names into runs of digits and everything else.
+_NATURAL_SPLIT = re.compile(r"(\d+)")
+
+# Numbers in names are padded to this many digits by natural_key.
+_NATURAL_DIGITS = 20
+
+def natural_key(name):
+    u"""Return a key that sorts names case-insensitively and with
+    numbers in numeric order, so u"File2" comes before u"file10". The
+    key is a string with all numbers zero-padded, as strings compare
+    much faster than tuples of strings and numbers.
+    """
+    parts = _NATURAL_SPLIT.split(name.lower())
+    # Every odd part is a number
+    parts[1::2] = [num.zfill(_NATURAL_DIGITS) for num in parts[1::2]]
+    return u"".join(parts)
+
+def primary_sort_key(order, name, isdir, size=-1, mtime=0.0):
+    u"""Return the sort key for an entry for the given order, one of
+    SORT_ORDERS, without breaking ties by name. size and mtime are only
+    needed for the respective orders.
+    """
+    if order == "name":
+        return natural_key(name)
+    elif order == "size":
+        return size
+    elif order == "mtime":
+        return mtime
+    elif order == "group":
+        return filetypes.classify(name, isdir)[1]
+    elif order == "ext":
+        return name.rpartition(u".")[2].lower() if u"." in name else u""
+    else:
+        raise ValueError(u"Unknown sort order: {!r}".format(order))
+
+def make_sort_key(order, namekey, name, isdir, size=-1, mtime=0.0):
+    u"""Return the sort key for an entry for the given order, one of
+    SORT_ORDERS. namekey is natural_key(name), which is used to break
+    ties. size and mtime are only needed for the respective orders.
+    """
+    if order == "name":
+        return namekey
+    return (primary_sort_key(order, name, isdir, size, mtime), namekey)
+
+# Filtering
+########################################################################.......
+
+# Ways that file lists can be filtered, mapped to their titles.
+FILTER_MODES = collections.OrderedDict([
+    ("substring", u"Contains"),
+    ("glob", u"Pattern"),
+    ("fuzzy", u"Fuzzy"),
+])
+
+class NameFilter(object):
+    u"""Finds the names in a fixed sequence that match a query. The
+    names are lowercased once up front, so matching is
+    case-insensitive.
+    
+    The results of recent queries are kept. If a new query extends one
+    of them (as when typing, or after deleting a character), only that
+    query's results are searched, except in glob mode, where a longer
+    pattern can match more names.
+    """
+    
+    # Number of recent results kept
+    HISTORY_SIZE = 32
+    
+    def __init__(self, names):
+        # Init
+        self.names = [name.lower() for name in names]
+        # (mode, query, positions) tuples, most recent last
+        self._history = []
+    
+    def _candidates(self, query, mode):
+        # Return the positions that can match query, based on the
+        # longest recent query that it extends.
+        best = None
+        if mode != "glob":
+            for old_mode, old_query, positions in self._history:
+                if (
+                    old_mode == mode and query.startswith(old_query)
+                    and (best is None or len(old_query) > len(best[0]))
+                ):
+                    best = (old_query, positions)
+        return range(len(self.names)) if best is None else best[1]
+    
+    def match(self, query, mode="substring"):
+        u"""Return a list of the positions of all names that match
+        query, in order. mode is one of FILTER_MODES: "substring"
+        matches names containing query, "glob" matches the whole name
+        against a shell-style pattern, and "fuzzy" matches names that
+        contain the characters of query in the same order.
+        """
+        query = query.lower()
+        names = self.names
+        candidates = self._candidates(query, mode)
+        
+        if mode == "substring":
+            positions = [i for i in candidates if query in names[i]]
+        elif mode == "glob":
+            pattern = re.compile(fnmatch.translate(query)).match
+            # Parts without wildcards must appear in the name, which is
+            # much cheaper to check first
+            if u"[" not in query:
+                for part in re.split(u"[*?]", query):
+                    if part:
+                        candidates = [i for i in candidates if part in names[i]]
+            positions = [i for i in candidates if pattern(names[i])]
+        elif mode == "fuzzy":
+            if len(query) <= 1:
+                positions = [i for i in candidates if query in names[i]]
+            else:
+                # Between two characters, skip anything that isn't the
+                # second one, so the regex never needs to backtrack
+                pattern = re.compile(re.escape(query[0]) + u"".join(
+                    u"[^{0}]*{0}".format(re.escape(c)) for c in query[1:]
+                )).search
+                first = query[0]
+                positions = [i for i in candidates if first in names[i] and pattern(names[i])]
+        else:
+            raise ValueError(u"Unknown filter mode: {!r}".format(mode))
+        
+        self._history.append((mode, query, positions))
+        del self._history[:-self.HISTORY_SIZE]
+        return positions
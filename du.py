@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+This module contains the folder size calculation, which adds up the
+sizes of all files below a folder. Folders are scanned in parallel by a
+pool of worker threads, partial totals are reported while the
+calculation is still running, and the results are cached per folder, so
+unchanged folders aren't scanned again. It does not depend on any UI
+modules.
+
+To run filenav, use either `slim.py` (for iPhone/iPod touch/popover use)
+or `full.py` (for panel view use on iPad).
+"""
+
+from __future__ import division, print_function
+
+import collections # For namedtuple and OrderedDict
+import os          # For stat and path operations
+import threading   # For worker threads
+import time        # For reporting partial totals
+
+from filenav import scan # For list_entries
+
+# Contents of a single folder, not including its subfolders. mtime is
+# the folder's own mtime when it was scanned, size and files are the
+# total size and number of the files directly in it, and subdirs is a
+# tuple of the paths of its subfolders.
+DirInfo = collections.namedtuple("DirInfo", "mtime size files subdirs")
+
+# Total size and number of files and folders below a folder.
+DirTotal = collections.namedtuple("DirTotal", "size files dirs")
+
+# Default maximum number of folders whose DirInfos and DirTotals are
+# kept by a SizeCache.
+SIZE_CACHE_DIRS = 50000
+
+class SizeCache(object):
+    u"""Cache of DirInfos for DirSize, and of the totals of the last
+    complete calculation for every folder.
+    
+    A folder's mtime changes whenever an entry is added to, removed from
+    or renamed in it, so a DirInfo is reused as long as the folder's
+    mtime is unchanged. A file that is changed in place doesn't change
+    the mtime of its folder, so its old size is used until something
+    else in the folder changes.
+    
+    At most max_dirs DirInfos and DirTotals are kept each, the least
+    recently used ones are dropped first. Folders whose DirInfo was
+    dropped are simply scanned again.
+    """
+    
+    def __init__(self, max_dirs=SIZE_CACHE_DIRS):
+        # Init
+        self.max_dirs = max_dirs
+        self._lock = threading.Lock()
+        # Maps folder paths to DirInfos, oldest first
+        self._dirs = collections.OrderedDict()
+        # Maps folder paths to DirTotals, oldest first
+        self._totals = collections.OrderedDict()
+    
+    def __len__(self):
+        return len(self._dirs)
+    
+    @staticmethod
+    def _touch(cache, path):
+        # Return the value for path in the OrderedDict cache, or None,
+        # and mark it as recently used.
+        value = cache.pop(path, None)
+        if value is not None:
+            cache[path] = value
+        return value
+    
+    def _trim(self, cache):
+        # Drop the oldest values from cache until it is small enough.
+        while len(cache) > self.max_dirs:
+            cache.popitem(last=False)
+    
+    def get(self, path, mtime):
+        u"""Return the DirInfo for the folder at path, or None if there
+        is none or it was scanned with a different mtime.
+        """
+        with self._lock:
+            info = self._touch(self._dirs, path)
+        return info if info is not None and info.mtime == mtime else None
+    
+    def put(self, path, info):
+        u"""Store the DirInfo for the folder at path. Folders below
+        subfolders that no longer exist are forgotten.
+        """
+        with self._lock:
+            old = self._dirs.pop(path, None)
+            self._dirs[path] = info
+            if old is not None:
+                gone = list(set(old.subdirs) - set(info.subdirs))
+                while gone:
+                    sub = self._dirs.pop(gone.pop(), None)
+                    if sub is not None:
+                        gone.extend(sub.subdirs)
+            self._trim(self._dirs)
+    
+    def total(self, path):
+        u"""Return the DirTotal of the last complete calculation that
+        included the folder at path, or None if there is none. It may
+        be out of date.
+        """
+        with self._lock:
+            return self._touch(self._totals, path)
+    
+    def set_totals(self, totals):
+        u"""Store the DirTotals in the dict totals, keyed by path.
+        """
+        with self._lock:
+            for path, total in totals.items():
+                self._totals.pop(path, None)
+                self._totals[path] = total
+            self._trim(self._totals)
+    
+    def clear(self):
+        u"""Remove everything from the cache.
+        """
+        with self._lock:
+            self._dirs.clear()
+            self._totals.clear()
+
+class DirSize(object):
+    u"""Calculation of the total size of all files below root.
+    
+    Folders are scanned by up to workers threads at once. Folders whose
+    DirInfo in cache (a SizeCache) is still valid are only stat'ed, not
+    scanned, so repeated calculations are much faster. Symlinks are not
+    followed, and count with their own size.
+    
+    While the calculation is running, callback(dirsize) is called at
+    most every interval seconds, with the totals so far in size, files
+    and dirs. Once it is complete or cancelled, done(dirsize) is
+    called. Both are called from worker threads. When complete, the
+    totals for root and every folder below it are stored in cache and
+    result is set to root's DirTotal.
+    """
+    
+    def __init__(
+        self, root, cache=None, callback=None, done=None,
+        workers=4, interval=0.1,
+    ):
+        # Init
+        self.root = root
+        self.cache = SizeCache() if cache is None else cache
+        self.callback = callback
+        self.done = done
+        self.workers = workers
+        self.interval = interval
+        
+        # Totals so far, and the final DirTotal for root
+        self.size = 0
+        self.files = 0
+        self.dirs = 0
+        self.result = None
+        # Numbers of folders scanned (not taken from the cache) and
+        # folders that couldn't be read, for statistics
+        self.scanned = 0
+        self.failed = 0
+        
+        self._cond = threading.Condition(threading.Lock())
+        # Paths of folders waiting to be scanned
+        self._queue = []
+        # Number of folders queued or being scanned
+        self._pending = 0
+        # DirInfos of all folders scanned so far
+        self._infos = {}
+        self._cancelled = False
+        self._finished = False
+        self._threads = []
+        # Number of worker threads still running
+        self._running = 0
+        
+        # Time of the last callback, and a lock held while calling it
+        self._last = time.time()
+        self._report_lock = threading.Lock()
+    
+    def start(self):
+        u"""Start calculating in the background.
+        """
+        with self._cond:
+            self._queue.append(self.root)
+            self._pending = 1
+            self._running = self.workers
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=u"filenav-du")
+                thread.daemon = True
+                self._threads.append(thread)
+                thread.start()
+    
+    def cancel(self):
+        u"""Stop calculating. The cache keeps the folders scanned so
+        far, but no totals are stored.
+        """
+        with self._cond:
+            self._cancelled = True
+            del self._queue[:]
+            self._cond.notify_all()
+    
+    @property
+    def cancelled(self):
+        u"""Whether cancel has been called.
+        """
+        return self._cancelled
+    
+    @property
+    def finished(self):
+        u"""Whether the calculation is complete or cancelled, and done
+        has been called.
+        """
+        return self._finished
+    
+    def wait(self, timeout=None):
+        u"""Wait until all worker threads have stopped, or timeout
+        seconds have passed. Returns whether the calculation is
+        finished.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0, deadline - time.time()))
+        return self._finished
+    
+    def _work(self):
+        # Worker thread main loop.
+        while True:
+            with self._cond:
+                while not self._queue and self._pending and not self._cancelled:
+                    self._cond.wait()
+                if self._cancelled or not self._pending:
+                    break
+                # Newest first, so the queue stays short (depth first)
+                path = self._queue.pop()
+            
+            info = self._scan(path)
+            
+            with self._cond:
+                if info is not None:
+                    self._infos[path] = info
+                    self._queue.extend(info.subdirs)
+                    self._pending += len(info.subdirs)
+                    self.size += info.size
+                    self.files += info.files
+                    self.dirs += len(info.subdirs)
+                self._pending -= 1
+                self._cond.notify_all()
+                report = self.callback is not None and time.time() - self._last >= self.interval
+                if report:
+                    self._last = time.time()
+            
+            if report:
+                with self._report_lock:
+                    if not self._cancelled:
+                        self.callback(self)
+        
+        with self._cond:
+            self._running -= 1
+            last = self._running == 0
+        if last:
+            self._finish()
+    
+    def _scan(self, path):
+        # Return the DirInfo for a single folder, from the cache if it
+        # is unchanged, or None if it can't be read.
+        try:
+            mtime = os.stat(path).st_mtime
+            info = self.cache.get(path, mtime)
+            if info is not None:
+                return info
+            entries = scan.list_entries(path)
+        except OSError as err:
+            with self._cond:
+                self.failed += 1
+            return None
+        
+        size = 0
+        files = 0
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_symlink():
+                    size += os.lstat(entry.path).st_size
+                    files += 1
+                elif entry.is_dir():
+                    subdirs.append(entry.path)
+                else:
+                    size += entry.stat().st_size
+                    files += 1
+            except OSError as err:
+                pass
+        
+        info = DirInfo(mtime, size, files, tuple(subdirs))
+        self.cache.put(path, info)
+        with self._cond:
+            self.scanned += 1
+        return info
+    
+    def _finish(self):
+        # Store the totals of all folders, deepest first, and call done.
+        if not self._cancelled:
+            totals = {}
+            for path in sorted(self._infos, key=lambda p: p.count(os.sep), reverse=True):
+                info = self._infos[path]
+                subs = [totals[sub] for sub in info.subdirs if sub in totals]
+                totals[path] = DirTotal(
+                    info.size + sum(sub.size for sub in subs),
+                    info.files + sum(sub.files for sub in subs),
+                    sum(sub.dirs + 1 for sub in subs),
+                )
+            self.cache.set_totals(totals)
+            self.result = totals.get(self.root)
+        
+        self._finished = True
+        if self.done is not None:
+            self.done(self)
@@ -12,8 +12,6 @@ from __future__ import division, print_function
 # Can't be bothered to properly prefix every string with an u
 from __future__ import unicode_literals
 
-import ui # Required to pre-load file icons
-
 # Maps file extensions to short human-readable names.
 FILE_EXTS = {
     "aac":           "Apple Audio",
@@ -166,7 +164,9 @@ TYPE_GROUPS = {}
 for group, exts in _TYPE_GROUPS.items():
     TYPE_GROUPS.update({ext: group for ext in exts.split()})
 
-# Maps major type groups to names and icon paths.
+# Maps major type groups to names and icon names. The icons themselves are
+# only loaded when they are first shown (see common.named_image), so this
+# module doesn't need the ui module and imports quickly.
 GROUP_ICONS = {
     "app":       ("Application",     "ionicons-ios7-browsers-32"),
     "archive":   ("Archive",         "ionicons-ios7-briefcase-32"),
@@ -186,6 +186,56 @@ GROUP_ICONS = {
 
 FOLDERS_WITH_ICONS = {"app", "bundle", "framework", "git", "trash"}
 
-# Replace icon paths with ui.Image instances.
-GROUP_ICONS = {k: (v[0], ui.Image.named(v[1]))
-               for k, v in GROUP_ICONS.items()}
\ No newline at end of file
+def _classify(ext, isdir):
+    # Return the (ext, group, desc, icon) tuple for ext (which may be
+    # None) and the given base type.
+    group = basegroup = "folder" if isdir else "file"
+    desc, icon = GROUP_ICONS[group]
+    
+    if ext:
+        group = TYPE_GROUPS.get(ext, group)
+        desc = FILE_EXTS.get(ext, GROUP_ICONS[group][0])
+        icon = GROUP_ICONS[group][1]
+        
+        # Special case - if desc is None, use default file/folder description
+        if desc is None:
+            desc = GROUP_ICONS[basegroup][0]
+    
+    # Folders should only get certain file types applied
+    if basegroup == "folder" and ext not in FOLDERS_WITH_ICONS:
+        desc, icon = GROUP_ICONS[basegroup]
+    
+    return ext, group, desc, icon
+
+# Maps (ext, isdir) to (ext, group, desc, icon) for every known extension
+# and for None (no known extension). Built once at import and not meant to
+# be modified afterwards.
+CLASSES = {
+    (ext, isdir): _classify(ext, isdir)
+    for ext in list(TYPE_GROUPS) + [None]
+    for isdir in (False, True)
+}
+
+def find_ext(name):
+    """Return the last known file extension in name (case-insensitive),
+    or None. The name is scanned from right to left, so the search
+    stops at the first known extension from the end.
+    """
+    name = name.lower()
+    end = len(name)
+    while True:
+        start = name.rfind(".", 0, end)
+        # If there is no dot left, this checks the part before the first dot
+        part = name[start+1:end]
+        if part in TYPE_GROUPS:
+            return part
+        elif start < 0:
+            return None
+        end = start
+
+def classify(name, isdir):
+    """Return the (ext, group, desc, icon) tuple for a file or folder
+    with the given name, where icon is the name of the icon image.
+    Drop-in for the type fields of core.get_fileinfo.
+    """
+    return CLASSES[find_ext(name), bool(isdir)]
@@ -42,7 +42,7 @@ class FullFilenavApp(common.FilenavApp):
         self.nav_stack = []
     
     def close(self):
-        self.root.close()
+        common.FilenavApp.close(self)
         console.hide_output()
     
     def push_view(self, view):
@@ -77,6 +77,7 @@ class FullFilenavApp(common.FilenavApp):
         nav = self.nav_stack.pop()
         self.scroll.remove_subview(nav)
         self.scroll.content_size = nav.x, self.scroll.height
+        self.release_view(view)
         if len(self.view_stack) <= 0:
             self.close()
         return view
@@ -95,7 +96,7 @@ def main(args):
     fnapp.push_view(fnapp.make_favs_list(common.full_path("./favorites.json")))
     
     if ns.dir:
-        fnapp.push_view(fnapp.make_file_list(common.FileItem(ns.dir)))
+        fnapp.push_view(fnapp.make_file_list(common.FileItem(ns.dir, lazy=True)))
     
     sys.exit(0)
 
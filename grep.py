@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+This module contains the content search, which finds lines matching a
+pattern in the code and text files below a folder. Files are read in
+fixed-size blocks by a pool of worker threads, and matches are
+reported file by file while the search is still running. It does not
+depend on any UI modules.
+
+To run filenav, use either `slim.py` (for iPhone/iPod touch/popover use)
+or `full.py` (for panel view use on iPad).
+"""
+
+from __future__ import division, print_function
+
+import collections # For namedtuple and deque
+import os          # For file sizes
+import re          # For patterns
+import threading   # For worker threads
+
+from filenav import filetypes # To find text files
+from filenav import search    # To find the files to search
+
+# Type groups of the files that are searched.
+TEXT_GROUPS = ("code", "code_tags", "text")
+
+# Size of the blocks files are read in. Lines longer than this are split.
+BLOCK_SIZE = 256*1024
+
+# Files with a NUL byte in their first this many bytes are skipped.
+BINARY_CHECK_SIZE = 8*1024
+
+# Maximum length of the line excerpts in results.
+EXCERPT_LENGTH = 160
+
+# A matching line. lineno starts at 1, text is an excerpt of the line.
+GrepMatch = collections.namedtuple("GrepMatch", "path lineno text")
+
+class GrepPattern(object):
+    u"""Compiled content search pattern, see compile_pattern. search
+    works like a bytes regex's search method. For literal patterns,
+    blocks that can't contain a match are ruled out with a plain
+    substring check first, which is much faster than any regex.
+    """
+    
+    def __init__(self, regex, literal=None, ignore_case=False):
+        # Init
+        self.regex = regex
+        self.search = regex.search
+        self.literal = literal.lower() if literal and ignore_case else literal
+        self.ignore_case = ignore_case
+    
+    def could_match(self, block):
+        u"""Whether block might contain a match.
+        """
+        if self.literal is None:
+            return True
+        return self.literal in (block.lower() if self.ignore_case else block)
+
+def compile_pattern(pattern, regex=False, ignore_case=True):
+    u"""Return a GrepPattern for pattern, which is matched literally
+    unless regex is true. The pattern is encoded as UTF-8, and
+    ignore_case only applies to ASCII letters.
+    """
+    if not isinstance(pattern, bytes):
+        pattern = pattern.encode("utf-8")
+    flags = re.IGNORECASE if ignore_case else 0
+    if regex:
+        return GrepPattern(re.compile(pattern, flags))
+    else:
+        return GrepPattern(re.compile(re.escape(pattern), flags), pattern, ignore_case)
+
+def _iter_blocks(f, size):
+    # Yield blocks of about size bytes read from f. Every block except
+    # the last ends with a newline, unless a single line is longer than
+    # size, in which case it is split.
+    rest = b""
+    while True:
+        data = f.read(size)
+        if not data:
+            if rest:
+                yield rest
+            return
+        data = rest + data
+        cut = data.rfind(b"\n") + 1
+        if cut == 0:
+            cut = len(data)
+        yield data[:cut]
+        rest = data[cut:]
+
+def _excerpt(line, start, end):
+    # Return the decoded line, shortened to about EXCERPT_LENGTH
+    # characters around the match at start:end.
+    if len(line) > EXCERPT_LENGTH:
+        begin = max(0, min(start - EXCERPT_LENGTH // 4, len(line) - EXCERPT_LENGTH))
+        line = line[begin:begin + EXCERPT_LENGTH]
+    return line.decode("utf-8", "replace").strip()
+
+def grep_file(path, pattern, max_matches=None, block_size=BLOCK_SIZE):
+    u"""Return a list of GrepMatches for the lines in the file at path
+    that match pattern (a GrepPattern), at most max_matches if given.
+    Returns None for binary files. Only one block of the file is in
+    memory at a time.
+    """
+    matches = []
+    with open(path, "rb") as f:
+        lineno = 1
+        first = True
+        for block in _iter_blocks(f, block_size):
+            if first and b"\0" in block[:BINARY_CHECK_SIZE]:
+                return None
+            first = False
+            
+            if not pattern.could_match(block):
+                lineno += block.count(b"\n")
+                continue
+            
+            # Lines before counted have been added to lineno already
+            counted = 0
+            pos = 0
+            while True:
+                m = pattern.search(block, pos)
+                if m is None:
+                    break
+                start = block.rfind(b"\n", 0, m.start()) + 1
+                end = block.find(b"\n", m.end())
+                if end < 0:
+                    end = len(block)
+                
+                lineno += block.count(b"\n", counted, start)
+                counted = start
+                matches.append(GrepMatch(
+                    path, lineno,
+                    _excerpt(block[start:end], m.start() - start, m.end() - start),
+                ))
+                if max_matches is not None and len(matches) >= max_matches:
+                    return matches
+                # Only report every line once
+                pos = end + 1
+            
+            lineno += block.count(b"\n", counted)
+    return matches
+
+def is_text_file(name, isdir):
+    u"""Whether an entry is a file in one of TEXT_GROUPS.
+    """
+    return not isdir and filetypes.classify(name, isdir)[1] in TEXT_GROUPS
+
+class ContentSearch(object):
+    u"""Search for lines matching a GrepPattern (see compile_pattern)
+    in all text files below root.
+    
+    Text files (see is_text_file) are found by a search.Search, and
+    searched by up to workers threads at once. For every file with
+    matches, callback(matches) is called with a list of GrepMatches,
+    from a worker thread, one call at a time. Once the search is
+    complete or cancelled, done(search) is called. At most
+    max_matches lines are reported per file.
+    """
+    
+    def __init__(
+        self, root, pattern, callback, done=None,
+        workers=4, max_depth=None, max_matches=100,
+    ):
+        # Init
+        self.root = root
+        self.pattern = pattern
+        self.callback = callback
+        self.done = done
+        self.workers = workers
+        self.max_matches = max_matches
+        
+        # Numbers of files searched, skipped as binary or unreadable and
+        # with matches, and bytes searched, for statistics
+        self.files = 0
+        self.binary = 0
+        self.failed = 0
+        self.matched = 0
+        self.bytes = 0
+        
+        self._cond = threading.Condition(threading.Lock())
+        # Paths of files waiting to be searched
+        self._queue = collections.deque()
+        self._walking = True
+        self._cancelled = False
+        self._finished = False
+        self._threads = []
+        # Number of worker threads still running
+        self._running = 0
+        # Held while calling callback, so calls don't overlap
+        self._deliver_lock = threading.Lock()
+        
+        self.walk = search.Search(
+            root, is_text_file, self._add_files, self._walk_done,
+            max_depth=max_depth,
+        )
+    
+    def start(self):
+        u"""Start searching in the background.
+        """
+        with self._cond:
+            self._running = self.workers
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=u"filenav-grep")
+                thread.daemon = True
+                self._threads.append(thread)
+                thread.start()
+        self.walk.start()
+    
+    def cancel(self):
+        u"""Stop searching. Files that haven't been searched yet are
+        skipped.
+        """
+        self.walk.cancel()
+        with self._cond:
+            self._cancelled = True
+            self._queue.clear()
+            self._cond.notify_all()
+    
+    @property
+    def cancelled(self):
+        u"""Whether cancel has been called.
+        """
+        return self._cancelled
+    
+    @property
+    def finished(self):
+        u"""Whether the search is complete or cancelled, and done has
+        been called.
+        """
+        return self._finished
+    
+    def wait(self, timeout=None):
+        u"""Wait until all worker threads have stopped, or timeout
+        seconds have passed. Returns whether the search is finished.
+        """
+        self.walk.wait(timeout)
+        for thread in self._threads:
+            thread.join(timeout)
+        return self._finished
+    
+    def _add_files(self, entries):
+        # Called by the walk with batches of text files.
+        with self._cond:
+            self._queue.extend(entry.path for entry in entries)
+            self._cond.notify_all()
+    
+    def _walk_done(self, walk):
+        # Called once the walk is complete.
+        with self._cond:
+            self._walking = False
+            self._cond.notify_all()
+    
+    def _work(self):
+        # Worker thread main loop.
+        while True:
+            with self._cond:
+                while not self._queue and self._walking and not self._cancelled:
+                    self._cond.wait()
+                if self._cancelled or not self._queue:
+                    break
+                path = self._queue.popleft()
+            
+            try:
+                matches = grep_file(path, self.pattern, self.max_matches)
+                size = os.path.getsize(path)
+            except (IOError, OSError) as err:
+                with self._cond:
+                    self.failed += 1
+                continue
+            
+            with self._cond:
+                if matches is None:
+                    self.binary += 1
+                    continue
+                self.files += 1
+                self.bytes += size
+                if matches:
+                    self.matched += 1
+            
+            if matches:
+                with self._deliver_lock:
+                    if not self._cancelled:
+                        self.callback(matches)
+        
+        with self._cond:
+            self._running -= 1
+            last = self._running == 0
+        if last:
+            self._finished = True
+            if self.done is not None:
+                self.done(self)
@@ -0,0 +1,487 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+This module maintains a persistent index of file names below a set of
+root folders (by default the ones in the favorites list), stored in an
+SQLite database. The index can be queried by name prefix, substring and
+type group without walking the filesystem, and is updated
+incrementally by only rescanning folders whose mtime has changed. It
+does not depend on any UI modules.
+
+Run this module directly to rebuild, update, verify or query the index
+from the command line. To run filenav, use either `slim.py` (for
+iPhone/iPod touch/popover use) or `full.py` (for panel view use on
+iPad).
+"""
+
+from __future__ import division, print_function
+
+import argparse    # For runtime argument parsing
+import collections # For namedtuple
+import json        # To read the favorites list
+import os          # For stat and path operations
+import sqlite3     # To store the index
+import stat        # To understand stat results
+import sys         # For runtime arguments
+import threading   # To share the database between threads
+
+from filenav import core      # For INDEX_PATH and full_path
+from filenav import filetypes # To classify entries
+from filenav import scan      # For list_entries
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+try:
+    unichr
+except NameError:
+    unichr = chr
+
+# Version of the database layout. Databases with a different version
+# are recreated.
+SCHEMA_VERSION = 1
+
+_SCHEMA = u"""
+CREATE TABLE meta (key TEXT PRIMARY KEY, value);
+CREATE TABLE roots (path TEXT PRIMARY KEY);
+CREATE TABLE dirs (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    root TEXT NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE TABLE entries (
+    dir INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    lname TEXT NOT NULL,
+    isdir INTEGER NOT NULL,
+    islink INTEGER NOT NULL,
+    grp TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    PRIMARY KEY (dir, name)
+);
+CREATE INDEX entries_lname ON entries (lname);
+CREATE INDEX entries_grp ON entries (grp, lname);
+CREATE INDEX dirs_root ON dirs (root);
+"""
+
+# Query modes for names, mapped to their titles.
+QUERY_MODES = collections.OrderedDict([
+    ("prefix", u"Starts With"),
+    ("substring", u"Contains"),
+])
+
+# A single indexed entry. path is the full path, isdir is true for
+# folders and symlinks to folders.
+IndexEntry = collections.namedtuple("IndexEntry", "path name isdir group size mtime")
+
+# Counts of folders visited and rescanned, and entries added and removed
+# during an update.
+UpdateStats = collections.namedtuple("UpdateStats", "dirs scanned added removed")
+
+# Paths that differ between the index and the filesystem: missing from
+# the index, in the index but gone, and indexed with an outdated type.
+VerifyResult = collections.namedtuple("VerifyResult", "missing extra stale")
+
+def load_roots(favorites):
+    u"""Return the folders listed in the favorites JSON file at
+    favorites, as resolved paths. Folders that don't exist are
+    skipped, as are folders inside other listed folders, since those
+    are indexed already.
+    """
+    with open(favorites) as f:
+        paths = [entry[0] for entry in json.load(f)]
+    return [root for root in normalize_roots(paths) if os.path.isdir(root)]
+
+def normalize_roots(paths):
+    u"""Return the given folders as a sorted list of resolved paths,
+    without duplicates or folders inside other listed folders.
+    """
+    roots = []
+    for path in sorted(set(core.full_path(path) for path in paths)):
+        if any(path.startswith(root.rstrip(os.sep) + os.sep) for root in roots):
+            continue
+        roots.append(path)
+    return roots
+
+def _prefix_end(prefix):
+    # Return the smallest string that is greater than all strings
+    # starting with prefix, or None if there is none.
+    chars = list(prefix)
+    while chars:
+        code = ord(chars.pop()) + 1
+        if 0xd800 <= code <= 0xdfff:
+            # Surrogates can't be encoded, skip them
+            code = 0xe000
+        if code <= sys.maxunicode:
+            return u"".join(chars) + unichr(code)
+    return None
+
+def _read_dir(path):
+    # Return a dict mapping the names of the entries in the folder at
+    # path to (isdir, islink, group, size, mtime) tuples.
+    rows = {}
+    for entry in scan.list_entries(path):
+        try:
+            # Names that SQLite can't store are not indexed
+            entry.name.encode("utf-8")
+            islink = entry.is_symlink()
+            st = entry.stat()
+        except (UnicodeError, OSError) as err:
+            continue
+        
+        isdir = stat.S_ISDIR(st.st_mode)
+        rows[entry.name] = (
+            isdir,
+            islink,
+            filetypes.classify(entry.name, isdir)[1],
+            st.st_size,
+            st.st_mtime,
+        )
+    return rows
+
+class FileIndex(object):
+    u"""Index of the names, type groups, sizes and mtimes of all
+    entries below a set of root folders, stored in the SQLite database
+    at path.
+    
+    update() walks the roots, but only rescans folders whose mtime has
+    changed since the last update, so unchanged trees cost one stat
+    per folder. Changing a file in place doesn't change the mtime of
+    its folder, so the size and mtime of an entry are those from the
+    last time its folder was rescanned. Symlinks are indexed, but not
+    followed. A FileIndex can be used from several threads, updates
+    lock the database for one folder at a time, so queries aren't
+    blocked for long.
+    """
+    
+    # Number of rescanned folders after which an update is committed
+    COMMIT_INTERVAL = 200
+    
+    def __init__(self, path=core.INDEX_PATH, roots=None):
+        # Init
+        self.path = path
+        self._lock = threading.RLock()
+        
+        folder = os.path.dirname(path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(u"PRAGMA synchronous = NORMAL")
+        self._setup()
+        
+        if roots is not None:
+            self.set_roots(roots)
+    
+    def _setup(self):
+        # Create the tables, or recreate them if their layout is old.
+        with self._lock:
+            try:
+                row = self._db.execute(u"SELECT value FROM meta WHERE key = 'version'").fetchone()
+            except sqlite3.DatabaseError as err:
+                row = None
+            if row is not None and row[0] == SCHEMA_VERSION:
+                return
+            
+            for table in (u"meta", u"roots", u"dirs", u"entries"):
+                self._db.execute(u"DROP TABLE IF EXISTS {}".format(table))
+            self._db.executescript(_SCHEMA)
+            self._db.execute(u"INSERT INTO meta VALUES ('version', ?)", (SCHEMA_VERSION,))
+            self._db.commit()
+    
+    def close(self):
+        u"""Close the database.
+        """
+        with self._lock:
+            self._db.close()
+    
+    @property
+    def roots(self):
+        u"""List of the indexed root folders.
+        """
+        with self._lock:
+            return [row[0] for row in self._db.execute(u"SELECT path FROM roots ORDER BY path")]
+    
+    def set_roots(self, roots):
+        u"""Change the indexed root folders. Entries of folders that are
+        not roots anymore are removed, new roots are only indexed by
+        the next update. Roots are normalized with normalize_roots, as
+        every folder can only be indexed once.
+        """
+        roots = normalize_roots(roots)
+        with self._lock:
+            for root in set(self.roots) - set(roots):
+                self._remove_dirs([
+                    row[0] for row in
+                    self._db.execute(u"SELECT id FROM dirs WHERE root = ?", (root,))
+                ])
+            self._db.execute(u"DELETE FROM roots")
+            self._db.executemany(u"INSERT INTO roots VALUES (?)", [(root,) for root in roots])
+            self._db.commit()
+    
+    def _remove_dirs(self, ids):
+        # Remove the folders with the given ids and their entries.
+        params = [(id,) for id in ids]
+        self._db.executemany(u"DELETE FROM entries WHERE dir = ?", params)
+        self._db.executemany(u"DELETE FROM dirs WHERE id = ?", params)
+    
+    def rebuild(self, stop=None):
+        u"""Clear the index and index all roots again. Returns an
+        UpdateStats instance. stop is passed on to update.
+        """
+        with self._lock:
+            self._db.execute(u"DELETE FROM entries")
+            self._db.execute(u"DELETE FROM dirs")
+            self._db.commit()
+        return self.update(stop)
+    
+    def update(self, stop=None):
+        u"""Bring the index up to date with the filesystem, rescanning
+        only folders whose mtime has changed. Returns an UpdateStats
+        instance. If stop is given, a threading.Event, the update ends
+        early once it is set, after the folder it is working on.
+        Folders that weren't reached by then keep their entries.
+        """
+        stats = [0, 0, 0, 0]
+        for root in self.roots:
+            if stop is not None and stop.is_set():
+                break
+            self._update_root(root, stats, stop)
+        with self._lock:
+            self._db.commit()
+        return UpdateStats(*stats)
+    
+    def _update_root(self, root, stats, stop=None):
+        # Update the index for a single root. stats is a list of
+        # counters in the order of UpdateStats, stop is as in update.
+        seen = set()
+        stack = [root]
+        pending = 0
+        
+        while stack:
+            if stop is not None and stop.is_set():
+                # Folders that weren't seen may still exist, so they
+                # must not be removed below
+                return
+            
+            path = stack.pop()
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError as err:
+                continue
+            
+            with self._lock:
+                row = self._db.execute(u"SELECT id, mtime FROM dirs WHERE path = ?", (path,)).fetchone()
+                if row is not None and row[1] == mtime:
+                    # Unchanged, but subfolders may have changed
+                    dirid = row[0]
+                    names = [
+                        name for (name,) in self._db.execute(
+                            u"SELECT name FROM entries WHERE dir = ? AND isdir AND NOT islink",
+                            (dirid,),
+                        )
+                    ]
+                else:
+                    dirid, names = self._rescan(path, root, mtime, row, stats)
+                    pending += 1
+                    if pending >= self.COMMIT_INTERVAL:
+                        self._db.commit()
+                        pending = 0
+            
+            seen.add(dirid)
+            stats[0] += 1
+            stack.extend(os.path.join(path, name) for name in names)
+        
+        with self._lock:
+            # Remove folders that weren't found anymore
+            self._remove_dirs([
+                id for (id,) in self._db.execute(u"SELECT id FROM dirs WHERE root = ?", (root,))
+                if id not in seen
+            ])
+    
+    def _rescan(self, path, root, mtime, row, stats):
+        # Read the folder at path and replace its entries. row is its
+        # (id, mtime) row, or None if it is new. Returns its id and the
+        # names of the subfolders to descend into.
+        try:
+            entries = _read_dir(path)
+        except OSError as err:
+            entries = {}
+        
+        if row is None:
+            dirid = self._db.execute(
+                u"INSERT INTO dirs (path, root, mtime) VALUES (?, ?, ?)",
+                (path, root, mtime),
+            ).lastrowid
+            old = set()
+        else:
+            dirid = row[0]
+            self._db.execute(u"UPDATE dirs SET mtime = ? WHERE id = ?", (mtime, dirid))
+            old = {name for (name,) in self._db.execute(u"SELECT name FROM entries WHERE dir = ?", (dirid,))}
+            self._db.execute(u"DELETE FROM entries WHERE dir = ?", (dirid,))
+        
+        self._db.executemany(
+            u"INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (dirid, name, name.lower(), isdir, islink, group, size, emtime)
+                for name, (isdir, islink, group, size, emtime) in entries.items()
+            ],
+        )
+        
+        stats[1] += 1
+        stats[2] += len(set(entries) - old)
+        stats[3] += len(old - set(entries))
+        return dirid, [name for name, info in entries.items() if info[0] and not info[1]]
+    
+    def query(self, text=u"", mode="prefix", group=None, limit=1000):
+        u"""Return a list of IndexEntries whose names match text
+        (case-insensitively), sorted by name. mode is one of
+        QUERY_MODES: "prefix" matches names starting with text, which
+        uses an index, "substring" matches names containing text. If
+        group is given, only entries of that type group match. At most
+        limit entries are returned, all if limit is None.
+        """
+        clauses = []
+        params = []
+        text = text.lower()
+        if text:
+            if mode == "prefix":
+                clauses.append(u"e.lname >= ?")
+                params.append(text)
+                end = _prefix_end(text)
+                if end is not None:
+                    clauses.append(u"e.lname < ?")
+                    params.append(end)
+            elif mode == "substring":
+                clauses.append(u"instr(e.lname, ?) > 0")
+                params.append(text)
+            else:
+                raise ValueError(u"Unknown query mode: {!r}".format(mode))
+        if group is not None:
+            clauses.append(u"e.grp = ?")
+            params.append(group)
+        
+        sql = (
+            u"SELECT d.path, e.name, e.isdir, e.grp, e.size, e.mtime"
+            u" FROM entries e JOIN dirs d ON d.id = e.dir"
+        )
+        if clauses:
+            sql += u" WHERE " + u" AND ".join(clauses)
+        sql += u" ORDER BY e.lname"
+        if limit is not None:
+            sql += u" LIMIT ?"
+            params.append(limit)
+        
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [
+            IndexEntry(os.path.join(dir, name), name, bool(isdir), group, size, mtime)
+            for dir, name, isdir, group, size, mtime in rows
+        ]
+    
+    def count(self):
+        u"""Return the number of indexed entries.
+        """
+        with self._lock:
+            return self._db.execute(u"SELECT count(*) FROM entries").fetchone()[0]
+    
+    def verify(self):
+        u"""Compare the index to the filesystem by walking all roots.
+        Returns a VerifyResult, which is all empty if the index is up
+        to date. Sizes and mtimes are not compared, as update doesn't
+        track them for files that are changed in place.
+        """
+        result = VerifyResult([], [], [])
+        indexed = set()
+        
+        for root in self.roots:
+            stack = [root]
+            while stack:
+                path = stack.pop()
+                try:
+                    actual = _read_dir(path)
+                except OSError as err:
+                    continue
+                
+                with self._lock:
+                    stored = {
+                        name: (bool(isdir), bool(islink), group)
+                        for name, isdir, islink, group in self._db.execute(
+                            u"SELECT e.name, e.isdir, e.islink, e.grp"
+                            u" FROM entries e JOIN dirs d ON d.id = e.dir WHERE d.path = ?",
+                            (path,),
+                        )
+                    }
+                indexed.add(path)
+                
+                for name, info in actual.items():
+                    if name not in stored:
+                        result.missing.append(os.path.join(path, name))
+                    elif stored[name] != info[:3]:
+                        result.stale.append(os.path.join(path, name))
+                    if info[0] and not info[1]:
+                        stack.append(os.path.join(path, name))
+                result.extra.extend(os.path.join(path, name) for name in set(stored) - set(actual))
+        
+        with self._lock:
+            result.extra.extend(
+                path for (path,) in self._db.execute(u"SELECT path FROM dirs")
+                if path not in indexed
+            )
+        return result
+
+def main(args):
+    ap = argparse.ArgumentParser(description=u"Maintain and query the filenav file name index.")
+    ap.add_argument(u"--db", type=unicode, default=core.INDEX_PATH,
+                    help=u"index database, defaults to " + core.INDEX_PATH)
+    ap.add_argument(u"--favorites", type=unicode,
+                    help=u"favorites list to take the roots from")
+    ap.add_argument(u"--root", type=unicode, action=u"append",
+                    help=u"root folder to index instead of the favorites (repeatable)")
+    sub = ap.add_subparsers(dest=u"command")
+    sub.add_parser(u"update", help=u"rescan folders that have changed")
+    sub.add_parser(u"rebuild", help=u"index everything from scratch")
+    sub.add_parser(u"verify", help=u"compare the index to the filesystem")
+    qp = sub.add_parser(u"query", help=u"search the index")
+    qp.add_argument(u"text", type=unicode, nargs=u"?", default=u"")
+    qp.add_argument(u"--substring", action=u"store_true",
+                    help=u"match anywhere in the name instead of the start")
+    qp.add_argument(u"--group", type=unicode, help=u"only match this type group")
+    qp.add_argument(u"--limit", type=int, default=100)
+    ns = ap.parse_args(args)
+    
+    idx = FileIndex(ns.db)
+    if ns.root:
+        idx.set_roots(ns.root)
+    elif ns.favorites:
+        idx.set_roots(load_roots(ns.favorites))
+    
+    if ns.command in (u"update", u"rebuild"):
+        stats = idx.rebuild() if ns.command == u"rebuild" else idx.update()
+        print(u"{} folders, {} rescanned, {} entries added, {} removed, {} total".format(
+            stats.dirs, stats.scanned, stats.added, stats.removed, idx.count()
+        ))
+    elif ns.command == u"verify":
+        result = idx.verify()
+        for kind in VerifyResult._fields:
+            for path in sorted(getattr(result, kind)):
+                print(u"{}: {}".format(kind, path))
+        if any(result):
+            idx.close()
+            return 1
+        print(u"Index is up to date ({} entries)".format(idx.count()))
+    elif ns.command == u"query":
+        mode = "substring" if ns.substring else "prefix"
+        for entry in idx.query(ns.text, mode, ns.group, ns.limit):
+            print(entry.path + (os.sep if entry.isdir else u""))
+    else:
+        ap.print_usage()
+    
+    idx.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+This module contains the directory reading shared by file lists, the
+recursive search, the file name index and the folder size calculation.
+It uses scandir where available, and has no dependencies on other
+filenav modules, so any of them can import it.
+
+To run filenav, use either `slim.py` (for iPhone/iPod touch/popover use)
+or `full.py` (for panel view use on iPad).
+"""
+
+from __future__ import division, print_function
+
+import os # For listdir and path operations
+
+try:
+    from os import scandir # Python 3.5 and up
+except ImportError:
+    try:
+        from scandir import scandir # Backport module for older versions
+    except ImportError:
+        scandir = None
+
+class _ListdirEntry(object):
+    u"""Minimal stand-in for os.DirEntry, used when no scandir
+    implementation is available. Every method call costs a syscall.
+    """
+    def __init__(self, dir, name):
+        # Init
+        self.name = name
+        self.path = os.path.join(dir, name)
+    
+    def is_dir(self):
+        u"""Like os.path.isdir(self.path).
+        """
+        return os.path.isdir(self.path)
+    
+    def is_symlink(self):
+        u"""Like os.path.islink(self.path).
+        """
+        return os.path.islink(self.path)
+    
+    def stat(self):
+        u"""Like os.stat(self.path).
+        """
+        return os.stat(self.path)
+
+def iter_entries(path):
+    u"""Iterate over DirEntry-like objects for the contents of the
+    directory at path. This uses scandir if available, which gets type
+    information from the directory read itself instead of one or more
+    syscalls per entry. The directory is closed once the iteration
+    is done or the generator is closed.
+    """
+    if scandir is None:
+        for name in os.listdir(path):
+            yield _ListdirEntry(path, name)
+        return
+    
+    # Close the iterator even if this generator is abandoned, otherwise
+    # the directory stays open until it is garbage collected.
+    it = scandir(path)
+    if hasattr(it, "__exit__"):
+        with it:
+            for entry in it:
+                yield entry
+    else:
+        try:
+            for entry in it:
+                yield entry
+        finally:
+            if hasattr(it, "close"):
+                it.close()
+
+def list_entries(path):
+    u"""Like iter_entries, but return a list, so that errors while
+    reading the directory are raised right away.
+    """
+    return list(iter_entries(path))
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+This module contains the recursive file search. Directory trees are
+walked in parallel by a pool of worker threads, and matches are
+reported in batches while the search is still running. It does not
+depend on any UI modules.
+
+To run filenav, use either `slim.py` (for iPhone/iPod touch/popover use)
+or `full.py` (for panel view use on iPad).
+"""
+
+from __future__ import division, print_function
+
+import collections # For OrderedDict
+import fnmatch     # For glob patterns
+import os          # For stat and path operations
+import re          # For regex patterns
+import threading   # For worker threads
+import time        # For batching results
+
+from filenav import filetypes # To match type groups
+from filenav import scan      # To read directories
+
+# Kinds of search patterns, mapped to their titles.
+PATTERN_KINDS = collections.OrderedDict([
+    ("glob", u"Pattern"),
+    ("regex", u"Regex"),
+    ("group", u"Kind"),
+])
+
+def make_matcher(pattern, kind="glob"):
+    u"""Return a function matcher(name, isdir) that checks whether an
+    entry matches pattern. kind is one of PATTERN_KINDS: "glob" matches
+    the whole name against a shell-style pattern, "regex" searches the
+    name for a regular expression, and "group" matches entries whose
+    type group (e. g. "image", see filetypes.TYPE_GROUPS) is pattern.
+    Glob and regex patterns are case-insensitive.
+    """
+    if kind == "glob":
+        match = re.compile(fnmatch.translate(pattern), re.IGNORECASE).match
+        return lambda name, isdir: match(name) is not None
+    elif kind == "regex":
+        search = re.compile(pattern, re.IGNORECASE).search
+        return lambda name, isdir: search(name) is not None
+    elif kind == "group":
+        if pattern not in set(filetypes.TYPE_GROUPS.values()) | {"file", "folder"}:
+            raise ValueError(u"Unknown type group: {!r}".format(pattern))
+        return lambda name, isdir: filetypes.classify(name, isdir)[1] == pattern
+    else:
+        raise ValueError(u"Unknown pattern kind: {!r}".format(kind))
+
+class Search(object):
+    u"""Recursive search for entries below root whose names match.
+    
+    Directories are scanned by up to workers threads at once. Matching
+    entries are passed to callback(entries) as lists of DirEntry-like
+    objects, in batches of up to batch_size entries, or sooner if
+    interval seconds have passed since the last batch. Callbacks are
+    called from worker threads, one at a time. Once the search is
+    complete or cancelled, done(search) is called.
+    
+    Subdirectories deeper than max_depth levels below root (root's
+    contents are at depth 1) are not searched. Symlinks to directories
+    are followed if follow_symlinks is true, but every directory is
+    only searched once, identified by (st_dev, st_ino), so symlink
+    loops cannot cause endless searches.
+    """
+    
+    def __init__(
+        self, root, matcher, callback, done=None,
+        workers=4, max_depth=None, follow_symlinks=True,
+        batch_size=256, interval=0.1,
+    ):
+        # Init
+        self.root = root
+        self.matcher = matcher
+        self.callback = callback
+        self.done = done
+        self.workers = workers
+        self.max_depth = max_depth
+        self.follow_symlinks = follow_symlinks
+        self.batch_size = batch_size
+        self.interval = interval
+        
+        # Number of directories and matches found, for statistics
+        self.dirs = 0
+        self.matches = 0
+        
+        self._cond = threading.Condition(threading.Lock())
+        # (path, depth) of directories waiting to be scanned
+        self._queue = []
+        # Number of directories queued or being scanned
+        self._pending = 0
+        # (st_dev, st_ino) of all directories queued so far
+        self._visited = set()
+        self._cancelled = False
+        self._finished = False
+        self._threads = []
+        # Number of worker threads still running
+        self._running = 0
+        
+        # Matches not delivered yet, and the time of the last delivery
+        self._batch = []
+        self._last = time.time()
+        # Held while calling callback, so calls don't overlap
+        self._deliver_lock = threading.Lock()
+    
+    def start(self):
+        u"""Start searching in the background.
+        """
+        try:
+            st = os.stat(self.root)
+        except OSError as err:
+            self._finish()
+            return
+        
+        with self._cond:
+            self._visited.add((st.st_dev, st.st_ino))
+            self._queue.append((self.root, 1))
+            self._pending = 1
+            self._running = self.workers
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=u"filenav-search")
+                thread.daemon = True
+                self._threads.append(thread)
+                thread.start()
+    
+    def cancel(self):
+        u"""Stop searching. Matches that haven't been delivered yet are
+        discarded.
+        """
+        with self._cond:
+            self._cancelled = True
+            del self._queue[:]
+            self._cond.notify_all()
+    
+    @property
+    def cancelled(self):
+        u"""Whether cancel has been called.
+        """
+        return self._cancelled
+    
+    @property
+    def finished(self):
+        u"""Whether the search is complete or cancelled, and done has
+        been called.
+        """
+        return self._finished
+    
+    def wait(self, timeout=None):
+        u"""Wait until all worker threads have stopped, or timeout
+        seconds have passed. Returns whether the search is finished.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0, deadline - time.time()))
+        return self._finished
+    
+    def _work(self):
+        # Worker thread main loop.
+        while True:
+            with self._cond:
+                while not self._queue and self._pending and not self._cancelled:
+                    self._cond.wait()
+                if self._cancelled or not self._pending:
+                    break
+                # Newest first, so the queue stays short (depth first)
+                path, depth = self._queue.pop()
+            
+            subdirs = self._scan(path, depth)
+            
+            with self._cond:
+                for subpath, key in subdirs:
+                    if key not in self._visited:
+                        self._visited.add(key)
+                        self._queue.append((subpath, depth + 1))
+                        self._pending += 1
+                self._pending -= 1
+                self.dirs += 1
+                self._cond.notify_all()
+        
+        with self._cond:
+            self._running -= 1
+            last = self._running == 0
+        if last:
+            self._finish()
+    
+    def _scan(self, path, depth):
+        # Scan a single directory. Matches are added to the current
+        # batch, and a list of (path, (st_dev, st_ino)) tuples for the
+        # subdirectories to search is returned.
+        try:
+            entries = scan.list_entries(path)
+        except OSError as err:
+            return []
+        
+        descend = self.max_depth is None or depth < self.max_depth
+        matches = []
+        subdirs = []
+        for entry in entries:
+            try:
+                isdir = entry.is_dir()
+            except OSError as err:
+                isdir = False
+            
+            if self.matcher(entry.name, isdir):
+                matches.append(entry)
+            
+            if isdir and descend and (self.follow_symlinks or not entry.is_symlink()):
+                try:
+                    st = entry.stat()
+                except OSError as err:
+                    continue
+                subdirs.append((entry.path, (st.st_dev, st.st_ino)))
+        
+        if matches:
+            self._add_matches(matches)
+        return subdirs
+    
+    def _add_matches(self, matches):
+        # Add matches to the current batch, and deliver it if it is
+        # large or old enough.
+        with self._cond:
+            if self._cancelled:
+                return
+            self._batch.extend(matches)
+            self.matches += len(matches)
+            if len(self._batch) < self.batch_size and time.time() - self._last < self.interval:
+                return
+        self._deliver()
+    
+    def _deliver(self):
+        # Pass the current batch to callback.
+        with self._deliver_lock:
+            with self._cond:
+                batch = self._batch
+                self._batch = []
+                self._last = time.time()
+                if self._cancelled:
+                    return
+            if batch:
+                self.callback(batch)
+    
+    def _finish(self):
+        # Deliver the remaining matches and call done.
+        self._deliver()
+        self._finished = True
+        if self.done is not None:
+            self.done(self)
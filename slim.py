@@ -27,11 +27,21 @@ MODE = "panel"
 ##MODE = "popover" # For testing on iPad
 
 class SlimFilenavApp(common.FilenavApp):
+    def __init__(self):
+        common.FilenavApp.__init__(self)
+        # Views pushed with push_view, so pop_view can release them
+        self.view_stack = []
+    
     def push_view(self, view):
+        self.view_stack.append(view)
         return self.root.push_view(view)
     
     def pop_view(self):
-        return self.root.pop_view()
+        self.root.pop_view()
+        if self.view_stack:
+            view = self.view_stack.pop()
+            self.release_view(view)
+            return view
 
 def main(args):
     global fnapp # Technically not necessary, but useful for testing
@@ -58,7 +68,7 @@ def main(args):
         fnapp.root.height = 1000
     
     if ns.dir:
-        fnapp.push_view(fnapp.make_file_list(common.FileItem(ns.dir)))
+        fnapp.push_view(fnapp.make_file_list(common.FileItem(ns.dir, lazy=True)))
     
     fnapp.root.present(MODE, hide_title_bar=True)
     
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Tests for file type classification. core.get_fileinfo is compared with
+a copy of the original implementation, which built a complete FileInfo
+for every path, on a large number of random names.
+
+Run it with `python -m unittest discover tests` from the package
+folder, or as a script.
+"""
+
+from __future__ import division, print_function
+
+import os       # For path operations
+import random   # For random names
+import sys      # To make the filenav package importable
+import unittest # Test framework
+
+# The filenav package folder is the parent of this folder, so its own
+# parent needs to be on sys.path for "from filenav import ..." to work.
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if os.path.dirname(PACKAGE_DIR) not in sys.path:
+    sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+
+try:
+    from filenav import core
+except ImportError:
+    # The package folder has another name (e. g. a differently named
+    # clone), so load it as filenav explicitly
+    try:
+        import importlib.util
+    except ImportError:
+        import imp
+        imp.load_package("filenav", PACKAGE_DIR)
+    else:
+        spec = importlib.util.spec_from_file_location(
+            "filenav", os.path.join(PACKAGE_DIR, "__init__.py"),
+            submodule_search_locations=[PACKAGE_DIR],
+        )
+        sys.modules["filenav"] = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(sys.modules["filenav"])
+    from filenav import core
+from filenav import filetypes
+
+# Number of random names to compare.
+COUNT = 100000
+
+def legacy_get_fileinfo(path, isdir):
+    # The original get_fileinfo, minus the os.path.isdir call.
+    dir, name = os.path.split(path)
+    nameparts = name.lower().split(os.extsep)
+    ext = None
+    group = basegroup = "folder" if isdir else "file"
+    desc, icon = filetypes.GROUP_ICONS[group]
+    
+    for part in nameparts:
+        if part in filetypes.TYPE_GROUPS:
+            ext = part
+    
+    if ext:
+        group = filetypes.TYPE_GROUPS.get(ext, group)
+        desc = filetypes.FILE_EXTS.get(ext, filetypes.GROUP_ICONS[group][0])
+        icon = filetypes.GROUP_ICONS[group][1]
+        if desc is None:
+            desc = filetypes.GROUP_ICONS[basegroup][0]
+    
+    if basegroup == "folder" and ext not in filetypes.FOLDERS_WITH_ICONS:
+        desc, icon = filetypes.GROUP_ICONS[basegroup]
+    
+    return (dir, name, nameparts, ext, group, desc, icon)
+
+def random_name(rng):
+    u"""Return a random file name made of known and unknown extensions
+    in random case, with occasional leading, trailing or double dots.
+    """
+    parts = [
+        rng.choice(sorted(filetypes.TYPE_GROUPS) + [u"", u"x", u"unknown", u"Name"])
+        for i in range(rng.randint(1, 4))
+    ]
+    name = u".".join(
+        u"".join(c.upper() if rng.random() < 0.3 else c for c in part)
+        for part in parts
+    )
+    return rng.choice([u"", u"."]) + name + rng.choice([u"", u"", u"."])
+
+class GetFileInfoTest(unittest.TestCase):
+    def assertSameInfo(self, path, isdir):
+        fi = core.get_fileinfo(path, isdir)
+        new = (fi.dir, fi.name, fi.nameparts, fi.ext, fi.group, fi.desc, fi.icon)
+        self.assertEqual(new, legacy_get_fileinfo(path, isdir), (path, isdir))
+    
+    def test_random_names(self):
+        rng = random.Random(0)
+        for i in range(COUNT):
+            self.assertSameInfo(u"/synthetic/" + random_name(rng), rng.random() < 0.3)
+    
+    def test_special_names(self):
+        for name in (u"", u".", u"..", u"...", u".py", u"py.", u"a..py", u"A.TAR.GZ", u"x.app", u"x.py.bak"):
+            for isdir in (False, True):
+                self.assertSameInfo(u"/synthetic/" + name, isdir)
+
+if __name__ == "__main__":
+    unittest.main()
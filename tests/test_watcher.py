@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+Tests for the watcher module, run against temporary folders. The
+backend tests run for PollingBackend and, where available,
+InotifyBackend.
+
+Run it with `python -m unittest discover tests` from the package
+folder, or as a script.
+"""
+
+from __future__ import division, print_function
+
+import os        # For path operations
+import shutil    # To remove temporary folders
+import sys       # To make the filenav package importable
+import tempfile  # To create temporary folders
+import threading # To wait for callbacks
+import time      # For timeouts
+import unittest  # Test framework
+
+try:
+    import queue # Python 3
+except ImportError:
+    import Queue as queue # Python 2
+
+# The filenav package folder is the parent of this folder, so its own
+# parent needs to be on sys.path for "from filenav import ..." to work.
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if os.path.dirname(PACKAGE_DIR) not in sys.path:
+    sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+
+try:
+    from filenav import watcher
+except ImportError:
+    # The package folder has another name (e. g. a differently named
+    # clone), so load it as filenav explicitly
+    try:
+        import importlib.util
+    except ImportError:
+        import imp
+        imp.load_package("filenav", PACKAGE_DIR)
+    else:
+        spec = importlib.util.spec_from_file_location(
+            "filenav", os.path.join(PACKAGE_DIR, "__init__.py"),
+            submodule_search_locations=[PACKAGE_DIR],
+        )
+        sys.modules["filenav"] = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(sys.modules["filenav"])
+    from filenav import watcher
+
+# Seconds to wait for a change to be reported before failing.
+TIMEOUT = 5.0
+
+# Interval of the polling backends used in the tests.
+POLL_INTERVAL = 0.05
+
+class TempDirTestCase(unittest.TestCase):
+    u"""Test case with a temporary folder in self.root.
+    """
+    
+    def setUp(self):
+        self.root = os.path.realpath(tempfile.mkdtemp(prefix=u"filenav-test-"))
+        self.addCleanup(shutil.rmtree, self.root, True)
+    
+    def make_dir(self, name):
+        u"""Create a folder in self.root and return its path.
+        """
+        path = os.path.join(self.root, name)
+        os.mkdir(path)
+        return path
+    
+    def touch(self, *parts):
+        u"""Create an empty file and return its path.
+        """
+        path = os.path.join(*parts)
+        open(path, "w").close()
+        return path
+
+class BackendTests(object):
+    u"""Tests shared by all backends. Subclasses set make_backend.
+    """
+    
+    def setUp(self):
+        super(BackendTests, self).setUp()
+        self.dir = self.make_dir(u"watched")
+        self.events = queue.Queue()
+        self.backend = self.make_backend()
+        self.backend.add(self.dir)
+        self.backend.start(self.events.put)
+        self.addCleanup(self.backend.stop)
+    
+    def assertChanged(self, path):
+        try:
+            self.assertEqual(self.events.get(timeout=TIMEOUT), path)
+        except queue.Empty:
+            self.fail(u"No change reported for {}".format(path))
+    
+    def assertQuiet(self, wait=0.3):
+        time.sleep(wait)
+        self.assertTrue(self.events.empty(), u"Unexpected change reported")
+    
+    def drain(self, wait=0.3):
+        # Discard the events of the last change, as some backends
+        # report one change as several events.
+        time.sleep(wait)
+        while not self.events.empty():
+            self.events.get()
+    
+    def test_create(self):
+        self.touch(self.dir, u"new.txt")
+        self.assertChanged(self.dir)
+    
+    def test_create_folder(self):
+        os.mkdir(os.path.join(self.dir, u"sub"))
+        self.assertChanged(self.dir)
+    
+    def test_delete(self):
+        path = self.touch(self.dir, u"old.txt")
+        self.drain()
+        os.remove(path)
+        self.assertChanged(self.dir)
+    
+    def test_rename(self):
+        path = self.touch(self.dir, u"old.txt")
+        self.drain()
+        os.rename(path, os.path.join(self.dir, u"new.txt"))
+        self.assertChanged(self.dir)
+    
+    def test_unrelated(self):
+        self.touch(self.root, u"outside.txt")
+        self.assertQuiet()
+    
+    def test_remove(self):
+        self.backend.remove(self.dir)
+        self.touch(self.dir, u"new.txt")
+        self.assertQuiet()
+
+class PollingBackendTest(BackendTests, TempDirTestCase):
+    def make_backend(self):
+        return watcher.PollingBackend(POLL_INTERVAL)
+
+@unittest.skipUnless(watcher.InotifyBackend.available(), u"inotify is not available")
+class InotifyBackendTest(BackendTests, TempDirTestCase):
+    def make_backend(self):
+        return watcher.InotifyBackend()
+
+@unittest.skipUnless(watcher.InotifyBackend.available(), u"inotify is not available")
+class InotifyStopTest(unittest.TestCase):
+    def assertClosed(self, fd):
+        self.assertRaises(OSError, os.fstat, fd)
+    
+    def test_stop_unstarted(self):
+        # A Watcher that was never started still releases its backend
+        backend = watcher.InotifyBackend()
+        fds = [backend._fd] + list(backend._wakeup)
+        watcher.Watcher(backend).stop()
+        for fd in fds:
+            self.assertClosed(fd)
+    
+    def test_stop_started(self):
+        backend = watcher.InotifyBackend()
+        fds = [backend._fd] + list(backend._wakeup)
+        backend.start(lambda path: None)
+        backend.stop()
+        backend._thread.join(TIMEOUT)
+        for fd in fds:
+            self.assertClosed(fd)
+        # Stopping again does nothing
+        backend.stop()
+
+class Listener(object):
+    u"""Records the calls of its changed method. Watcher only keeps weak
+    references to bound methods, so tests need to keep it alive.
+    """
+    
+    def __init__(self):
+        # Init
+        self.calls = []
+        self.event = threading.Event()
+    
+    def changed(self, paths):
+        self.calls.append(set(paths))
+        self.event.set()
+    
+    def wait(self, timeout=TIMEOUT):
+        u"""Wait for a call and return whether there was one.
+        """
+        called = self.event.wait(timeout)
+        self.event.clear()
+        return called
+
+class WatcherTest(TempDirTestCase):
+    def setUp(self):
+        super(WatcherTest, self).setUp()
+        self.backend = watcher.PollingBackend(POLL_INTERVAL)
+        self.watcher = watcher.Watcher(self.backend, debounce=0.3, max_delay=5.0)
+        self.addCleanup(self.watcher.stop)
+        self.listener = Listener()
+    
+    def test_change(self):
+        path = self.make_dir(u"a")
+        self.watcher.watch(path, self.listener.changed)
+        self.touch(path, u"new.txt")
+        self.assertTrue(self.listener.wait())
+        self.assertEqual(self.listener.calls, [{path}])
+    
+    def test_debounce(self):
+        # A burst of changes is delivered as a single call
+        path = self.make_dir(u"a")
+        self.watcher.watch(path, self.listener.changed)
+        for i in range(5):
+            self.touch(path, u"file{}.txt".format(i))
+            time.sleep(POLL_INTERVAL * 2)
+        self.assertTrue(self.listener.wait())
+        time.sleep(0.5)
+        self.assertEqual(self.listener.calls, [{path}])
+    
+    def test_coalesce_paths(self):
+        # Changes to several folders are delivered together
+        paths = [self.make_dir(u"a"), self.make_dir(u"b")]
+        for path in paths:
+            self.watcher.watch(path, self.listener.changed)
+        for path in paths:
+            self.touch(path, u"new.txt")
+        self.assertTrue(self.listener.wait())
+        time.sleep(0.5)
+        self.assertEqual(self.listener.calls, [set(paths)])
+    
+    def test_unwatch(self):
+        path = self.make_dir(u"a")
+        self.watcher.watch(path, self.listener.changed)
+        self.watcher.unwatch(path, self.listener.changed)
+        self.assertNotIn(path, self.backend._signatures)
+        self.touch(path, u"new.txt")
+        self.assertFalse(self.listener.wait(1.0))
+    
+    def test_unwatch_other_callback(self):
+        # The folder stays watched while other callbacks are registered
+        path = self.make_dir(u"a")
+        other = Listener()
+        self.watcher.watch(path, self.listener.changed)
+        self.watcher.watch(path, other.changed)
+        self.watcher.unwatch(path, other.changed)
+        self.assertIn(path, self.backend._signatures)
+        self.touch(path, u"new.txt")
+        self.assertTrue(self.listener.wait())
+        self.assertFalse(other.event.is_set())
+
+if __name__ == "__main__":
+    unittest.main()
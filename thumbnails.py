@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+This module contains the background thumbnail pipeline and the on-disk
+thumbnail cache used by file lists. It does not depend on any
+Pythonista-specific modules, the actual thumbnail generation is done by
+a loader function passed in by the caller.
+
+To run filenav, use either `slim.py` (for iPhone/iPod touch/popover use)
+or `full.py` (for panel view use on iPad).
+"""
+
+from __future__ import division, print_function
+
+import collections # For OrderedDict, used as a request queue
+import errno       # For OSError codes
+import os          # For cache file operations
+import threading   # For worker threads
+
+class ThumbnailPipeline(object):
+    u"""Generates thumbnails on a bounded pool of background threads.
+    
+    Requests are deduplicated per path, and the most recent request is
+    served first, which suits a scrolling list best. If more than
+    max_pending requests are waiting, the oldest ones are dropped, as
+    their rows have most likely scrolled off already.
+    """
+    
+    def __init__(self, loader, workers=2, max_pending=64):
+        # Init
+        # Function that takes a path and returns a thumbnail or None
+        self.loader = loader
+        self.workers = workers
+        self.max_pending = max_pending
+        
+        self._cond = threading.Condition(threading.Lock())
+        # Paths waiting to be loaded, oldest first
+        self._pending = collections.OrderedDict()
+        # Callbacks for all pending or running paths
+        self._callbacks = {}
+        self._threads = []
+        self._idle = 0
+    
+    def request(self, path, callback):
+        u"""Schedule a thumbnail to be loaded for path. Once it is done,
+        callback(path, thumbnail) is called from a worker thread. The
+        thumbnail is None if none could be created.
+        """
+        with self._cond:
+            if path in self._callbacks:
+                # Already requested, only add the callback
+                self._callbacks[path].append(callback)
+                if path in self._pending:
+                    # Move it to the front of the queue
+                    del self._pending[path]
+                    self._pending[path] = True
+                return
+            
+            self._callbacks[path] = [callback]
+            self._pending[path] = True
+            
+            while len(self._pending) > self.max_pending:
+                oldest, _ = self._pending.popitem(last=False)
+                del self._callbacks[oldest]
+            
+            if self._idle > 0:
+                self._cond.notify()
+            elif len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=u"filenav-thumbnails")
+                thread.daemon = True
+                self._threads.append(thread)
+                thread.start()
+    
+    def cancel(self, path):
+        u"""Cancel the request for path. If it is waiting, it is
+        removed from the queue, if it is already being loaded, the
+        result is discarded.
+        """
+        with self._cond:
+            self._pending.pop(path, None)
+            self._callbacks.pop(path, None)
+    
+    def cancel_all(self):
+        u"""Cancel all requests.
+        """
+        with self._cond:
+            self._pending.clear()
+            self._callbacks.clear()
+    
+    def _work(self):
+        # Worker thread main loop.
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._idle += 1
+                    self._cond.wait()
+                    self._idle -= 1
+                path, _ = self._pending.popitem(last=True)
+            
+            try:
+                thumb = self.loader(path)
+            except Exception as err:
+                thumb = None
+            
+            with self._cond:
+                callbacks = self._callbacks.pop(path, ())
+            
+            for callback in callbacks:
+                callback(path, thumb)
+
+class ThumbnailCache(object):
+    u"""Persistent cache of thumbnail data, stored as one file per path
+    in the folder root.
+    
+    Every cache file starts with a header containing the size and mtime
+    of the source file, so entries become invalid as soon as the source
+    changes. Once the cache grows beyond max_size bytes, the least
+    recently used files are removed. Files are written to a temporary
+    name first and then renamed, so readers never see partial data.
+    """
+    
+    # First line of every cache file, followed by size and mtime
+    MAGIC = b"filenav-thumbnail 1"
+    
+    def __init__(self, root, max_size=16*1024*1024):
+        # Init
+        self.root = root
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # Total size of the cache files, None until first needed
+        self._size = None
+    
+    def _cache_path(self, path):
+        # Return the cache file path for the source path. hashlib and
+        # tempfile (in put) are only imported when the cache is first
+        # used, as they are slow to import.
+        import hashlib
+        if not isinstance(path, bytes):
+            path = path.encode("utf-8")
+        return os.path.join(self.root, hashlib.sha1(path).hexdigest())
+    
+    def _header(self, st):
+        # Return the header line for a source with stat result st.
+        return self.MAGIC + u" {} {!r}\n".format(st.st_size, st.st_mtime).encode("ascii")
+    
+    def get(self, path, st):
+        u"""Return the cached data for path, or None if there is no
+        valid entry. st is the current stat result of path.
+        """
+        cpath = self._cache_path(path)
+        try:
+            with open(cpath, "rb") as f:
+                header = f.readline()
+                if header != self._header(st):
+                    return None
+                data = f.read()
+        except (IOError, OSError) as err:
+            return None
+        
+        try:
+            # Mark as recently used
+            os.utime(cpath, None)
+        except OSError as err:
+            pass
+        return data
+    
+    def put(self, path, st, data):
+        u"""Store data as the cache entry for path, whose current stat
+        result is st.
+        """
+        import tempfile
+        header = self._header(st)
+        tmp = None
+        try:
+            if not os.path.isdir(self.root):
+                os.makedirs(self.root)
+            fd, tmp = tempfile.mkstemp(dir=self.root, prefix=u".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(header)
+                f.write(data)
+            cpath = self._cache_path(path)
+            try:
+                oldsize = os.path.getsize(cpath)
+            except OSError as err:
+                oldsize = 0
+            os.rename(tmp, cpath)
+        except (IOError, OSError) as err:
+            if tmp is not None:
+                try:
+                    os.remove(tmp)
+                except OSError as err:
+                    pass
+            return
+        
+        with self._lock:
+            if self._size is None:
+                self._size = self._total_size()
+            else:
+                # Same as the size on disk, like _total_size counts
+                self._size += len(header) + len(data) - oldsize
+            if self._size > self.max_size:
+                self._evict()
+    
+    def invalidate(self, path):
+        u"""Remove the cache entry for path, if any.
+        """
+        try:
+            os.remove(self._cache_path(path))
+        except OSError as err:
+            pass
+    
+    def clear(self):
+        u"""Remove all cache entries.
+        """
+        with self._lock:
+            for name, cpath, st in self._entries():
+                try:
+                    os.remove(cpath)
+                except OSError as err:
+                    pass
+            self._size = 0
+    
+    def _entries(self):
+        # Return (name, path, stat) tuples for all cache files.
+        entries = []
+        try:
+            names = os.listdir(self.root)
+        except OSError as err:
+            return entries
+        for name in names:
+            cpath = os.path.join(self.root, name)
+            try:
+                entries.append((name, cpath, os.stat(cpath)))
+            except OSError as err:
+                pass
+        return entries
+    
+    def _total_size(self):
+        # Return the total size of all cache files.
+        return sum(st.st_size for name, cpath, st in self._entries())
+    
+    def _evict(self):
+        # Remove least recently used files until the cache is at most
+        # three quarters full, so eviction doesn't happen on every put.
+        entries = sorted(self._entries(), key=lambda entry: entry[2].st_mtime)
+        size = sum(st.st_size for name, cpath, st in entries)
+        for name, cpath, st in entries:
+            if size <= self.max_size * 3 // 4:
+                break
+            try:
+                os.remove(cpath)
+            except OSError as err:
+                if err.errno != errno.ENOENT:
+                    continue
+            size -= st.st_size
+        self._size = size
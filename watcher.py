@@ -0,0 +1,416 @@
+#!/usr/bin/env python
+########################################################################.......
+u"""filenav for Pythonista, version 2, by dgelessus.
+This module watches directories for changes, so open file lists can be
+updated automatically. inotify is used where available (Linux),
+otherwise directories are polled for mtime changes.
+
+To run filenav, use either `slim.py` (for iPhone/iPod touch/popover use)
+or `full.py` (for panel view use on iPad).
+"""
+
+from __future__ import division, print_function
+
+import ctypes      # To call inotify functions
+import ctypes.util # To find libc
+import errno       # For OSError codes
+import os          # For stat and reading from inotify
+import select      # To wait for inotify events
+import struct      # To parse inotify events
+import threading   # For the backend and dispatch threads
+import time        # For debouncing
+import weakref     # To not keep listeners alive
+
+# inotify event bits, from <sys/inotify.h>
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+
+# Events that change what a directory listing shows.
+IN_LISTING_EVENTS = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+)
+
+# struct inotify_event, without the trailing name
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+class PollingBackend(object):
+    u"""Watcher backend that stats every watched directory periodically.
+    A directory counts as changed when its mtime, inode or link count
+    changes, which covers entries being created, deleted or renamed,
+    but not files being modified in place.
+    """
+    
+    def __init__(self, interval=1.0):
+        # Init
+        self.interval = interval
+        self._lock = threading.Lock()
+        # Maps watched paths to their last signature
+        self._signatures = {}
+        self._notify = None
+        self._stop = threading.Event()
+        self._thread = None
+    
+    @staticmethod
+    def _signature(path):
+        # Return the data that is compared to detect changes.
+        try:
+            st = os.stat(path)
+        except OSError as err:
+            return None
+        return (st.st_mtime, st.st_ino, st.st_nlink)
+    
+    def add(self, path):
+        u"""Start watching path.
+        """
+        with self._lock:
+            self._signatures[path] = self._signature(path)
+    
+    def remove(self, path):
+        u"""Stop watching path.
+        """
+        with self._lock:
+            self._signatures.pop(path, None)
+    
+    def start(self, notify):
+        u"""Start polling in a background thread. notify(path) is called
+        for every change that is detected.
+        """
+        self._notify = notify
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=u"filenav-watcher-poll")
+        self._thread.daemon = True
+        self._thread.start()
+    
+    def stop(self):
+        u"""Stop polling.
+        """
+        self._stop.set()
+    
+    def poll(self):
+        u"""Check all watched directories once and call notify for the
+        ones that changed.
+        """
+        with self._lock:
+            paths = list(self._signatures)
+        
+        for path in paths:
+            sig = self._signature(path)
+            with self._lock:
+                if path not in self._signatures or self._signatures[path] == sig:
+                    continue
+                self._signatures[path] = sig
+            self._notify(path)
+    
+    def _run(self):
+        # Polling thread main loop.
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+class InotifyBackend(object):
+    u"""Watcher backend using Linux's inotify API through ctypes.
+    """
+    
+    def __init__(self):
+        # Init
+        self._libc = self._load_libc()
+        if self._libc is None:
+            raise OSError(errno.ENOSYS, u"inotify is not available")
+        
+        self._fd = self._libc.inotify_init()
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        
+        self._lock = threading.Lock()
+        # Maps watch descriptors to paths and back
+        self._paths = {}
+        self._wds = {}
+        self._notify = None
+        self._thread = None
+        self._stopped = False
+        # Pipe used to wake up the reader thread when stopping
+        self._wakeup = os.pipe()
+    
+    @staticmethod
+    def _load_libc():
+        # Return libc as a ctypes library if it has inotify, else None.
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            libc.inotify_init, libc.inotify_add_watch, libc.inotify_rm_watch
+        except (OSError, AttributeError, TypeError) as err:
+            return None
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    
+    @classmethod
+    def available(cls):
+        u"""Whether inotify can be used on this system.
+        """
+        return cls._load_libc() is not None
+    
+    def add(self, path):
+        u"""Start watching path.
+        """
+        bpath = path.encode("utf-8") if not isinstance(path, bytes) else path
+        with self._lock:
+            wd = self._libc.inotify_add_watch(self._fd, bpath, IN_LISTING_EVENTS)
+            if wd < 0:
+                err = ctypes.get_errno()
+                raise OSError(err, os.strerror(err), path)
+            self._paths[wd] = path
+            self._wds[path] = wd
+    
+    def remove(self, path):
+        u"""Stop watching path.
+        """
+        with self._lock:
+            wd = self._wds.pop(path, None)
+            if wd is not None:
+                self._paths.pop(wd, None)
+                self._libc.inotify_rm_watch(self._fd, wd)
+    
+    def start(self, notify):
+        u"""Start reading events in a background thread. notify(path) is
+        called for every event in a watched directory.
+        """
+        self._notify = notify
+        self._thread = threading.Thread(target=self._run, name=u"filenav-watcher-inotify")
+        self._thread.daemon = True
+        self._thread.start()
+    
+    def stop(self):
+        u"""Stop reading events and release the inotify instance. This
+        also works if the backend was never started, and does nothing
+        if it was stopped before.
+        """
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+        
+        if self._thread is None:
+            self._close()
+        else:
+            # The reader thread closes everything once it wakes up
+            os.write(self._wakeup[1], b"x")
+    
+    def _close(self):
+        # Release the inotify instance and the wake-up pipe.
+        os.close(self._fd)
+        os.close(self._wakeup[0])
+        os.close(self._wakeup[1])
+    
+    def _run(self):
+        # Reader thread main loop.
+        try:
+            while True:
+                ready, _, _ = select.select([self._fd, self._wakeup[0]], [], [])
+                if self._wakeup[0] in ready:
+                    break
+                self._handle(os.read(self._fd, 64*1024))
+        finally:
+            self._close()
+    
+    def _handle(self, data):
+        # Parse a buffer of inotify events and notify about their paths.
+        paths = set()
+        pos = 0
+        while pos + _INOTIFY_EVENT.size <= len(data):
+            wd, mask, cookie, length = _INOTIFY_EVENT.unpack_from(data, pos)
+            pos += _INOTIFY_EVENT.size + length
+            with self._lock:
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost, so anything may have changed
+                    paths.update(self._wds)
+                elif wd in self._paths:
+                    paths.add(self._paths[wd])
+                    if mask & IN_IGNORED:
+                        # The watch was removed by the kernel
+                        del self._wds[self._paths.pop(wd)]
+        
+        for path in paths:
+            self._notify(path)
+
+def default_backend():
+    u"""Return a new instance of the best backend for this system.
+    """
+    if InotifyBackend.available():
+        try:
+            return InotifyBackend()
+        except OSError as err:
+            pass
+    return PollingBackend()
+
+class _WeakCallback(object):
+    # Holds a callback without keeping the object of a bound method alive.
+    def __init__(self, callback):
+        self_ = getattr(callback, "__self__", None)
+        if self_ is None:
+            self._ref = None
+            self._func = callback
+        else:
+            self._ref = weakref.ref(self_)
+            self._func = callback.__func__
+    
+    def get(self):
+        # Return the callable, or None if its object is gone.
+        if self._ref is None:
+            return self._func
+        obj = self._ref()
+        return None if obj is None else self._func.__get__(obj, type(obj))
+    
+    def __eq__(self, other):
+        return (
+            isinstance(other, _WeakCallback)
+            and (self._ref, self._func) == (other._ref, other._func)
+        )
+    
+    def __ne__(self, other):
+        return not self == other
+
+class Watcher(object):
+    u"""Watches directories and reports changes to registered callbacks
+    in coalesced batches.
+    
+    Changes are collected until no new ones have arrived for debounce
+    seconds (but at most max_delay seconds after the first one), so a
+    burst of changes results in a single call per callback. Callbacks
+    are called from a background thread with the set of changed paths
+    they registered for. Bound methods are only weakly referenced, so
+    registering doesn't keep e. g. a data source alive. A Watcher
+    cannot be used anymore after stop() has been called.
+    """
+    
+    def __init__(self, backend=None, debounce=0.3, max_delay=2.0):
+        # Init
+        self.backend = default_backend() if backend is None else backend
+        self.debounce = debounce
+        self.max_delay = max_delay
+        
+        self._cond = threading.Condition(threading.Lock())
+        # Maps paths to lists of _WeakCallbacks
+        self._callbacks = {}
+        # Changed paths not delivered yet, and the time of the first one
+        self._changed = set()
+        self._first = None
+        self._last = None
+        self._running = False
+        self._stopped = False
+    
+    def watch(self, path, callback):
+        u"""Call callback(paths) whenever the directory at path changes.
+        """
+        callback = _WeakCallback(callback)
+        with self._cond:
+            if path not in self._callbacks:
+                self.backend.add(path)
+                self._callbacks[path] = []
+            if callback not in self._callbacks[path]:
+                self._callbacks[path].append(callback)
+            
+            if not self._running:
+                self._running = True
+                self.backend.start(self._notify)
+                thread = threading.Thread(target=self._dispatch, name=u"filenav-watcher")
+                thread.daemon = True
+                thread.start()
+    
+    def unwatch(self, path, callback=None):
+        u"""Remove callback for path, or all callbacks for path if
+        callback is None.
+        """
+        with self._cond:
+            callbacks = self._callbacks.get(path, [])
+            if callback is not None:
+                callback = _WeakCallback(callback)
+                callbacks[:] = [cb for cb in callbacks if cb != callback]
+            if callback is None or not callbacks:
+                self._callbacks.pop(path, None)
+                self.backend.remove(path)
+    
+    def stop(self):
+        u"""Stop watching everything and shut down all threads.
+        """
+        with self._cond:
+            for path in self._callbacks:
+                self.backend.remove(path)
+            self._callbacks.clear()
+            if not self._stopped:
+                # Also if it was never started, so that it releases
+                # resources such as the inotify instance
+                self.backend.stop()
+                self._stopped = True
+            if self._running:
+                self._running = False
+                self._cond.notify_all()
+    
+    def _notify(self, path):
+        # Called by the backend for every change.
+        with self._cond:
+            now = time.time()
+            if self._first is None:
+                self._first = now
+            self._last = now
+            self._changed.add(path)
+            self._cond.notify_all()
+    
+    def _dispatch(self):
+        # Dispatch thread main loop. Waits for changes to settle, then
+        # delivers them.
+        while True:
+            with self._cond:
+                while not self._changed and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                
+                # Wait until things have been quiet for a while
+                while not self._stopped:
+                    now = time.time()
+                    deadline = min(self._last + self.debounce, self._first + self.max_delay)
+                    if now >= deadline:
+                        break
+                    self._cond.wait(deadline - now)
+                if self._stopped:
+                    return
+                
+                changed = self._changed
+                self._changed = set()
+                self._first = self._last = None
+                
+                # Group the changed paths by callback
+                batches = []
+                for path in changed:
+                    for cb in list(self._callbacks.get(path, ())):
+                        if cb.get() is None:
+                            self._callbacks[path].remove(cb)
+                            continue
+                        for other, paths in batches:
+                            if other == cb:
+                                paths.add(path)
+                                break
+                        else:
+                            batches.append((cb, {path}))
+                
+                for path in [p for p, cbs in self._callbacks.items() if not cbs]:
+                    del self._callbacks[path]
+                    self.backend.remove(path)
+            
+            for cb, paths in batches:
+                func = cb.get()
+                if func is not None:
+                    func(paths)
+                # Don't keep the last listener alive while waiting
+                func = None
+            batches = None